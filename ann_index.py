@@ -0,0 +1,188 @@
+"""
+Approximate nearest-neighbour indexes over normalized chunk embeddings.
+
+The exact path in embedding.search_many is a full scan, which is fine for a
+policy PDF but not for multi-thousand-page tender packs. An index is built
+once per document set (see doc_cache) and passed to search_many.
+
+Backends:
+  - "ivf":   pure-NumPy inverted file (spherical k-means + nprobe scan)
+  - "faiss": faiss HNSW over inner product, if faiss is installed
+
+Configuration via environment:
+  ANN_INDEX       auto | exact | ivf | faiss   (default: auto)
+  ANN_MIN_CHUNKS  smallest document set that gets an index (default: 10000)
+  ANN_NPROBE      IVF lists scanned per query (default: 8)
+  ANN_EF_SEARCH   faiss HNSW search breadth (default: 64)
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:  # optional backend
+    faiss = None
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.argmax(vectors @ centroids.T, axis=1)
+
+
+class IVFIndex:
+    """
+    Inverted-file index: vectors are clustered with spherical k-means and only
+    the ``nprobe`` clusters closest to a query are scanned exactly.
+
+    Args:
+        embeddings: (n, d) L2-normalized float32 matrix
+        nlist: Number of clusters (default: ~sqrt(n))
+        nprobe: Clusters scanned per query
+        n_iter: k-means iterations
+        seed: RNG seed for reproducible builds
+    """
+
+    kind = "ivf"
+
+    def __init__(self, embeddings: np.ndarray, nlist: Optional[int] = None, nprobe: int = 8,
+                 n_iter: int = 10, seed: int = 0):
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        n = vectors.shape[0]
+        self.nlist = max(1, min(n, nlist or int(np.sqrt(n))))
+        self.nprobe = nprobe
+
+        self.centroids = self._train(vectors, n_iter, np.random.default_rng(seed))
+        assign = _assign(vectors, self.centroids)
+
+        # Store each list contiguously so a probe is a single slice
+        order = np.argsort(assign, kind="stable")
+        self.ids = order.astype(np.int64)
+        self.vectors = vectors[order]
+        counts = np.bincount(assign, minlength=self.nlist)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self.ids.nbytes + self.centroids.nbytes
+
+    def _train(self, vectors: np.ndarray, n_iter: int, rng: np.random.Generator) -> np.ndarray:
+        # Train on a sample; 256 points per centroid is plenty for assignment quality
+        sample_size = min(len(vectors), 256 * self.nlist)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, self.nlist, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assign = _assign(sample, centroids)
+            counts = np.bincount(assign, minlength=self.nlist)
+
+            # Per-cluster sums via one sort + reduceat (np.add.at is far slower)
+            sums = np.zeros_like(centroids)
+            filled = counts > 0
+            starts = np.cumsum(counts) - counts
+            sums[filled] = np.add.reduceat(sample[np.argsort(assign, kind="stable")], starts[filled], axis=0)
+
+            # Re-seed empty clusters from random sample points
+            empty = ~filled
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+
+        return centroids
+
+    def search(self, query_embeddings: np.ndarray, top_k: int) -> list[np.ndarray]:
+        """Return, per query, up to top_k chunk indices ordered best first."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if len(queries) == 0:
+            return []
+        if top_k <= 0:
+            return [np.empty(0, dtype=np.int64) for _ in queries]
+        nprobe = min(self.nprobe, self.nlist)
+        coarse = queries @ self.centroids.T
+        probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+
+        # Each query's candidates get a contiguous segment of one flat score buffer,
+        # probe by probe; position[i, j] is where probe j of query i starts
+        sizes = self.offsets[probes + 1] - self.offsets[probes]
+        totals = sizes.sum(axis=1)
+        position = (np.cumsum(sizes.ravel()) - sizes.ravel()).reshape(sizes.shape)
+        scores = np.empty(int(totals.sum()), dtype=np.float32)
+        rows = np.empty(len(scores), dtype=np.int64)
+
+        # Scan every probed list once for all queries probing it: one GEMM on a contiguous
+        # slice, so a batch of questions reads each list once instead of once per query
+        pairs = np.argsort(probes.ravel(), kind="stable")
+        lists, first = np.unique(probes.ravel()[pairs], return_index=True)
+        for c, group in zip(lists, np.split(pairs, first[1:])):
+            start, stop = self.offsets[c], self.offsets[c + 1]
+            if start == stop:
+                continue
+            query_ids, slots = np.divmod(group, nprobe)
+            dest = position[query_ids, slots][None, :] + np.arange(stop - start)[:, None]
+            scores[dest] = self.vectors[start:stop] @ queries[query_ids].T
+            rows[dest] = np.arange(start, stop)[:, None]
+
+        # Ragged top-k: pad the segments into a (queries, widest) matrix of scores
+        width = int(totals.max())
+        if width == 0:
+            return [np.empty(0, dtype=np.int64) for _ in queries]
+        owner = np.repeat(np.arange(len(queries)), totals)
+        column = np.arange(len(scores)) - np.repeat(np.cumsum(totals) - totals, totals)
+        padded = np.full((len(queries), width), -np.inf, dtype=np.float32)
+        padded[owner, column] = scores
+        padded_rows = np.zeros((len(queries), width), dtype=np.int64)
+        padded_rows[owner, column] = rows
+
+        k = min(top_k, width)
+        best = np.argpartition(-padded, k - 1, axis=1)[:, :k]
+        best = np.take_along_axis(best, np.argsort(-np.take_along_axis(padded, best, axis=1), axis=1), axis=1)
+        ids = self.ids[np.take_along_axis(padded_rows, best, axis=1)]
+        # Queries whose lists hold fewer than k vectors get only their real candidates
+        return [row[:min(k, total)] for row, total in zip(ids, totals)]
+
+
+class FaissHNSWIndex:
+    """faiss HNSW graph over inner product (== cosine for normalized vectors)."""
+
+    kind = "faiss"
+
+    def __init__(self, embeddings: np.ndarray, m: int = 32, ef_search: int = 64):
+        if faiss is None:
+            raise ImportError("faiss is not installed; pip install faiss-cpu to use the faiss backend")
+
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.index = faiss.IndexHNSWFlat(vectors.shape[1], m, faiss.METRIC_INNER_PRODUCT)
+        self.index.hnsw.efSearch = ef_search
+        self.index.add(vectors)
+        # Graph links are roughly 2*m int32 neighbours per vector on the base layer
+        self.nbytes = vectors.nbytes + vectors.shape[0] * m * 2 * 4
+
+    def search(self, query_embeddings: np.ndarray, top_k: int) -> list[np.ndarray]:
+        _, ids = self.index.search(np.ascontiguousarray(query_embeddings, dtype=np.float32), top_k)
+        return [row[row >= 0] for row in ids]
+
+
+def build_index(embeddings: np.ndarray, kind: Optional[str] = None):
+    """
+    Build the configured index for a document set, or return None when the
+    exact scan should be used (index disabled or too few chunks).
+    """
+    kind = kind or os.environ.get("ANN_INDEX", "auto")
+    if kind == "exact":
+        return None
+    if kind == "auto":
+        # Below ~10k chunks the exact scan is as fast at the top_k * 4 depth search_hybrid
+        # asks for, and IVF loses recall (benchmarks/bench_ann.py --top-k 20)
+        if len(embeddings) < int(os.environ.get("ANN_MIN_CHUNKS", "10000")):
+            return None
+        kind = "faiss" if faiss is not None else "ivf"
+
+    if kind == "ivf":
+        return IVFIndex(embeddings, nprobe=int(os.environ.get("ANN_NPROBE", "8")))
+    if kind == "faiss":
+        return FaissHNSWIndex(embeddings, ef_search=int(os.environ.get("ANN_EF_SEARCH", "64")))
+    raise ValueError(f"Unknown ANN_INDEX backend: {kind}")
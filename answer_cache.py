@@ -0,0 +1,262 @@
+"""
+Per-question answer cache, so repeated questions on the same document are
+answered without an LLM call.
+
+Entries are keyed by the document key (content hash + chunker + encoder,
+see doc_cache.digest_key), the prompt/model namespace and the normalized
+question text. Optionally a question that is not an exact match is served
+from the most similar cached question of the same document when the
+cosine similarity of their embeddings reaches a threshold.
+
+Configuration via environment:
+  ANSWER_CACHE              memory | sqlite | off   (default: memory)
+  ANSWER_CACHE_PATH         SQLite file for the sqlite backend (default: answer_cache.sqlite3)
+  ANSWER_CACHE_TTL          entry lifetime in seconds, 0 = no expiry (default: 86400)
+  ANSWER_CACHE_MAX_ENTRIES  LRU bound on stored answers (default: 10000)
+  ANSWER_CACHE_SIMILARITY   cosine threshold for semantic matches, 0 = exact only (default: 0)
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+def normalize_question(question: str) -> str:
+    # Case, spacing and trailing punctuation do not change what is being asked
+    question = re.sub(r"\s+", " ", question).strip().casefold()
+    return question.rstrip(" ?.!")
+
+
+class CachedAnswer:
+    __slots__ = ("answer", "embedding", "created")
+
+    def __init__(self, answer: str, embedding: Optional[np.ndarray], created: float):
+        self.answer = answer
+        self.embedding = embedding
+        self.created = created
+
+
+class MemoryAnswerBackend:
+    """In-process LRU of answers; lost on restart, not shared between workers."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, CachedAnswer]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, scope: str, question: str, min_created: float) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get((scope, question))
+            if entry is None:
+                return None
+            if entry.created < min_created:
+                del self._entries[(scope, question)]
+                return None
+            self._entries.move_to_end((scope, question))
+            return entry.answer
+
+    def candidates(self, scope: str, min_created: float) -> list[tuple[np.ndarray, str]]:
+        # Linear in the cache size; fine for the few thousand entries this holds
+        with self._lock:
+            return [
+                (entry.embedding, entry.answer)
+                for (entry_scope, _), entry in self._entries.items()
+                if entry_scope == scope and entry.embedding is not None and entry.created >= min_created
+            ]
+
+    def put(self, scope: str, question: str, answer: str, embedding: Optional[np.ndarray]) -> None:
+        with self._lock:
+            self._entries[(scope, question)] = CachedAnswer(answer, embedding, time.time())
+            self._entries.move_to_end((scope, question))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteAnswerBackend:
+    """
+    Answers in a SQLite file, shared by all workers on the host and kept
+    across restarts. LRU order is tracked with a last_used timestamp.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                scope TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                embedding BLOB,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (scope, question)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+
+    def get(self, scope: str, question: str, min_created: float) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer, created FROM answers WHERE scope = ? AND question = ?", (scope, question)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < min_created:
+                self._conn.execute("DELETE FROM answers WHERE scope = ? AND question = ?", (scope, question))
+                return None
+            self._conn.execute(
+                "UPDATE answers SET last_used = ? WHERE scope = ? AND question = ?", (time.time(), scope, question)
+            )
+            return row[0]
+
+    def candidates(self, scope: str, min_created: float) -> list[tuple[np.ndarray, str]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT embedding, answer FROM answers WHERE scope = ? AND embedding IS NOT NULL AND created >= ?",
+                (scope, min_created),
+            ).fetchall()
+        return [(np.frombuffer(blob, dtype=np.float32), answer) for blob, answer in rows]
+
+    def put(self, scope: str, question: str, answer: str, embedding: Optional[np.ndarray]) -> None:
+        blob = None if embedding is None else np.asarray(embedding, dtype=np.float32).tobytes()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)", (scope, question, answer, blob, now, now)
+            )
+            excess = self._count() - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM answers WHERE rowid IN (SELECT rowid FROM answers ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+
+class AnswerCache:
+    """
+    Exact (and optionally semantic) per-question answer lookup.
+
+    Args:
+        backend: MemoryAnswerBackend or SQLiteAnswerBackend
+        ttl: Entry lifetime in seconds; 0 keeps entries until evicted
+        similarity: Cosine threshold for semantic matches; 0 disables them
+    """
+
+    def __init__(self, backend, ttl: float = 86400, similarity: float = 0.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _min_created(self) -> float:
+        return time.time() - self.ttl if self.ttl > 0 else 0.0
+
+    def lookup(self, doc_key: str, namespace: str, questions: list[str],
+               embeddings: Optional[np.ndarray] = None) -> list[Optional[str]]:
+        """
+        Cached answer for each question, or None where there is none.
+
+        Args:
+            doc_key: Document cache key of the document asked about
+            namespace: Prompt/model version the answers were produced with
+            questions: Questions as asked
+            embeddings: Normalized question embeddings, needed for semantic matches
+        """
+        scope = f"{namespace}|{doc_key}"
+        min_created = self._min_created()
+        answers = [self.backend.get(scope, normalize_question(q), min_created) for q in questions]
+        exact = sum(answer is not None for answer in answers)
+
+        semantic = 0
+        if self.similarity > 0 and embeddings is not None and exact < len(questions):
+            candidates = self.backend.candidates(scope, min_created)
+            if candidates:
+                matrix = np.stack([vector for vector, _ in candidates])
+                for i, answer in enumerate(answers):
+                    if answer is not None:
+                        continue
+                    scores = matrix @ embeddings[i]
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity:
+                        answers[i] = candidates[best][1]
+                        semantic += 1
+
+        with self._lock:
+            self.hits += exact + semantic
+            self.semantic_hits += semantic
+            self.misses += len(questions) - exact - semantic
+        return answers
+
+    def store(self, doc_key: str, namespace: str, questions: list[str], answers: list[str],
+              embeddings: Optional[np.ndarray] = None) -> None:
+        scope = f"{namespace}|{doc_key}"
+        for i, (question, answer) in enumerate(zip(questions, answers)):
+            vector = embeddings[i] if embeddings is not None else None
+            self.backend.put(scope, normalize_question(question), answer, vector)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self.backend).__name__,
+                "entries": len(self.backend),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def open_default_cache() -> Optional[AnswerCache]:
+    kind = os.environ.get("ANSWER_CACHE", "memory")
+    max_entries = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+    if kind == "off":
+        return None
+    if kind == "memory":
+        backend = MemoryAnswerBackend(max_entries)
+    elif kind == "sqlite":
+        backend = SQLiteAnswerBackend(os.environ.get("ANSWER_CACHE_PATH", "answer_cache.sqlite3"), max_entries)
+    else:
+        raise ValueError(f"Unknown ANSWER_CACHE: {kind}. Expected one of memory, sqlite, off")
+    return AnswerCache(
+        backend,
+        ttl=float(os.environ.get("ANSWER_CACHE_TTL", "86400")),
+        similarity=float(os.environ.get("ANSWER_CACHE_SIMILARITY", "0")),
+    )
+
+
+answer_cache = open_default_cache()
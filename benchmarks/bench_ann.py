@@ -0,0 +1,100 @@
+"""
+Recall-vs-latency benchmark of the ANN backends in ann_index against the
+exact cosine scan used by embedding.search_many.
+
+Runs on synthetic clustered unit vectors by default, or on the real chunk
+embeddings of a PDF with --pdf (needs the embedding model).
+
+Usage:
+  python -m benchmarks.bench_ann --chunks 20000 --queries 200
+  python -m benchmarks.bench_ann --pdf tender_pack.pdf
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from ann_index import FaissHNSWIndex, IVFIndex, faiss
+
+
+def synthetic_embeddings(n: int, dim: int, n_topics: int, seed: int = 0) -> np.ndarray:
+    # Chunks of a long document cluster around topics; mimic that with noisy topic centres
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    vectors = topics[rng.integers(0, n_topics, n)] + rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(queries: np.ndarray, embeddings: np.ndarray, top_k: int) -> list[np.ndarray]:
+    scores = queries @ embeddings.T
+    part = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    return list(part)
+
+
+def recall(truth: list[np.ndarray], found: list[np.ndarray]) -> float:
+    hits = sum(len(np.intersect1d(t, f)) for t, f in zip(truth, found))
+    return hits / sum(len(t) for t in truth)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN recall vs latency benchmark")
+    parser.add_argument("--chunks", type=int, default=20000, help="Synthetic chunk count")
+    parser.add_argument("--dim", type=int, default=384, help="Synthetic embedding size (MiniLM: 384)")
+    parser.add_argument("--topics", type=int, default=200, help="Synthetic topic clusters")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--pdf", help="Benchmark on the chunk embeddings of this PDF instead")
+    args = parser.parse_args()
+
+    if args.pdf:
+        from embedding import embed_chunks
+        from parse_chunks import parse_chunk
+
+        with open(args.pdf, "rb") as f:
+            _, embeddings = embed_chunks(parse_chunk(f.read()))
+    else:
+        embeddings = synthetic_embeddings(args.chunks, args.dim, args.topics)
+
+    # Queries are perturbed chunks, like questions paraphrasing a passage
+    rng = np.random.default_rng(1)
+    queries = embeddings[rng.integers(0, len(embeddings), args.queries)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    truth, exact_s = timed(exact_top_k, queries, embeddings, args.top_k)
+    print(f"{len(embeddings)} chunks, {len(queries)} queries, top_k={args.top_k}\n")
+    print(f"{'backend':<28}{'build (s)':>12}{'ms/query':>12}{'recall':>10}")
+    print(f"{'exact':<28}{'-':>12}{1000 * exact_s / len(queries):>12.3f}{1.0:>10.3f}")
+
+    nlists = sorted({max(1, int(np.sqrt(len(embeddings)) * f)) for f in (0.5, 1, 2)})
+    for nlist in nlists:
+        index, build_s = timed(IVFIndex, embeddings, nlist)
+        for nprobe in (1, 2, 4, 8, 16, 32):
+            if nprobe > nlist:
+                break
+            index.nprobe = nprobe
+            found, search_s = timed(index.search, queries, args.top_k)
+            label = f"ivf nlist={nlist} nprobe={nprobe}"
+            print(f"{label:<28}{build_s:>12.2f}{1000 * search_s / len(queries):>12.3f}{recall(truth, found):>10.3f}")
+
+    if faiss is None:
+        print("\nfaiss not installed; skipping HNSW backend")
+        return
+
+    index, build_s = timed(FaissHNSWIndex, embeddings)
+    for ef in (16, 32, 64, 128):
+        index.index.hnsw.efSearch = ef
+        found, search_s = timed(index.search, queries, args.top_k)
+        label = f"faiss hnsw ef={ef}"
+        print(f"{label:<28}{build_s:>12.2f}{1000 * search_s / len(queries):>12.3f}{recall(truth, found):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
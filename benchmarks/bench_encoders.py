@@ -0,0 +1,100 @@
+"""
+Throughput and retrieval-agreement benchmark of the embedding backends in
+encoders.py against the stock PyTorch fp32 model.
+
+For every backend it reports chunks/s for encoding, the mean cosine between
+its vectors and the fp32 reference, and the top-k overlap of search results
+for a set of queries.
+
+Usage:
+  python -m benchmarks.bench_encoders --pdf policy.pdf
+  python -m benchmarks.bench_encoders --backends torch int8
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from encoders import BACKENDS, load_encoder
+
+SAMPLE_SENTENCES = [
+    "The policy covers hospitalisation expenses for a minimum period of 24 hours.",
+    "A grace period of thirty days is provided for premium payment after the due date.",
+    "Pre-existing diseases are covered after thirty-six months of continuous coverage.",
+    "The bid bond shall be five percent of the total bid amount.",
+    "Payment terms are net thirty days from receipt of a valid invoice.",
+    "Maternity expenses are covered after the insured has been continuously covered for 24 months.",
+    "Cataract surgery has a waiting period of two years.",
+    "All submissions must be received before the due date via the electronic portal.",
+]
+
+SAMPLE_QUERIES = [
+    "What is the grace period for premium payment?",
+    "What is the waiting period for pre-existing diseases?",
+    "Does the policy cover maternity expenses?",
+    "What is the bid bond requirement?",
+    "What are the payment terms?",
+]
+
+
+def load_texts(pdf_path: str, n_chunks: int) -> list[str]:
+    if pdf_path:
+        from parse_chunks import parse_chunk
+
+        with open(pdf_path, "rb") as f:
+            return parse_chunk(f.read()).texts()
+
+    # Synthetic chunks: shuffled combinations of policy-like sentences
+    rng = np.random.default_rng(0)
+    return [" ".join(rng.choice(SAMPLE_SENTENCES, 4)) for _ in range(n_chunks)]
+
+
+def top_k(queries: np.ndarray, embeddings: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-(queries @ embeddings.T), axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend benchmark")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--pdf", help="Use the chunks of this PDF instead of synthetic text")
+    parser.add_argument("--chunks", type=int, default=1000, help="Synthetic chunk count")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = load_texts(args.pdf, args.chunks)
+    print(f"{len(texts)} chunks, {len(SAMPLE_QUERIES)} queries, top_k={args.top_k}\n")
+    print(f"{'backend':<10}{'load (s)':>10}{'chunks/s':>12}{'mean cos':>10}{'top-k overlap':>15}")
+
+    reference = None
+    for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+        start = time.perf_counter()
+        try:
+            model = load_encoder(args.model, backend)
+        except Exception as e:
+            print(f"{backend:<10}  unavailable: {e}")
+            continue
+        load_s = time.perf_counter() - start
+
+        # Warm-up so one-time graph/kernel setup is not counted as throughput
+        model.encode(texts[:args.batch_size], batch_size=args.batch_size)
+
+        start = time.perf_counter()
+        embeddings = model.encode(texts, batch_size=args.batch_size, normalize_embeddings=True)
+        encode_s = time.perf_counter() - start
+        queries = model.encode(SAMPLE_QUERIES, normalize_embeddings=True)
+        hits = top_k(queries, embeddings, args.top_k)
+
+        if reference is None:
+            reference = embeddings, hits
+        ref_embeddings, ref_hits = reference
+        mean_cos = float(np.mean(np.sum(embeddings * ref_embeddings, axis=1)))
+        overlap = np.mean([len(np.intersect1d(a, b)) / args.top_k for a, b in zip(hits, ref_hits)])
+
+        print(f"{backend:<10}{load_s:>10.2f}{len(texts) / encode_s:>12.1f}{mean_cos:>10.4f}{overlap:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
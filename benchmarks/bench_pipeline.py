@@ -0,0 +1,278 @@
+"""
+Offline micro-benchmarks of the ingestion and retrieval hot paths.
+
+Generates a synthetic RFP-like PDF and HTML page of configurable size and
+times, per stage: PDF text extraction, chunking, parse_chunk (extraction,
+chunking and BM25 index), embedding, single-query search, HTML text
+extraction and RFPExtractor.process_document with a stubbed LLM. Every
+stage reports the median wall time, throughput and peak Python heap
+(tracemalloc, measured in a separate untimed run).
+
+Nothing leaves the machine: the Hugging Face hub is put in offline mode
+(the embedding model must already be in the local cache), the embedding
+store and answer cache are disabled, and the LLM client of the extractor
+is replaced by a stub returning a fixed JSON object.
+
+Results can be saved as a baseline and later runs compared against it;
+a stage slower (or heavier) than the baseline by more than --tolerance is
+reported as a regression and makes the run exit with status 1. Baselines
+are only comparable on the same machine and with the same sizes.
+
+Usage:
+  python -m benchmarks.bench_pipeline
+  python -m benchmarks.bench_pipeline --pages 200 --html-kb 2000 --repeats 7
+  python -m benchmarks.bench_pipeline --save-baseline
+  python -m benchmarks.bench_pipeline --compare --tolerance 0.3
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import fitz
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "bench_pipeline.json")
+
+FILLER = [
+    "The contractor shall provide all labor, materials and equipment required for the work.",
+    "Proposals received after the stated deadline will not be considered.",
+    "The agency reserves the right to reject any or all proposals in whole or in part.",
+    "Pricing shall remain firm for a period of {n} days from the opening date.",
+    "Delivery shall be made within {n} calendar days after receipt of the purchase order.",
+    "Questions regarding this solicitation must be submitted in writing by {n} March.",
+    "Insurance coverage of at least ${n},000 per occurrence is required.",
+    "Vendors must be registered with the state procurement portal prior to award.",
+]
+
+
+def synthetic_paragraphs(n: int, seed: int = 0) -> list[str]:
+    # Imported here: bench_encoders loads sentence-transformers, which must see the offline env of main()
+    from benchmarks.bench_encoders import SAMPLE_SENTENCES
+
+    rng = random.Random(seed)
+    sentences = SAMPLE_SENTENCES + FILLER
+    return [
+        " ".join(rng.choice(sentences).format(n=rng.randint(2, 365)) for _ in range(rng.randint(3, 7)))
+        for _ in range(n)
+    ]
+
+
+def synthetic_pdf(pages: int, seed: int = 0) -> bytes:
+    """PDF with a running header/footer (exercises repeated-line removal) and ~6 paragraphs per page."""
+    doc = fitz.open()
+    paragraphs = iter(synthetic_paragraphs(pages * 6, seed))
+    for number in range(1, pages + 1):
+        page = doc.new_page()
+        page.insert_text((72, 40), "REQUEST FOR PROPOSAL - CITY OF SPRINGFIELD", fontsize=9)
+        box = fitz.Rect(72, 60, page.rect.width - 72, page.rect.height - 60)
+        page.insert_textbox(box, "\n\n".join(next(paragraphs) for _ in range(6)), fontsize=10)
+        page.insert_text((72, page.rect.height - 30), f"Page {number} of {pages}", fontsize=9)
+    pdf = doc.tobytes()
+    doc.close()
+    return pdf
+
+
+def synthetic_html(kilobytes: int, seed: int = 0) -> str:
+    """HTML page of roughly the given size, with tables, scripts and styles like scraped bid pages."""
+    parts = ["<html><head><style>td { padding: 2px; }</style><script>var x = 1;</script></head><body>"]
+    size = 0
+    paragraphs = synthetic_paragraphs(max(1, kilobytes * 3), seed)
+    for i, paragraph in enumerate(paragraphs):
+        if size >= kilobytes * 1024:
+            break
+        part = (f"<h3>Section {i}</h3><p>{paragraph}</p>"
+                f"<table><tr><td>Item {i}</td><td>  Qty {i % 17}  </td></tr></table>")
+        parts.append(part)
+        size += len(part)
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+class StubLLMClient:
+    """Stands in for llm_client.LLMClient: returns every expected field without a network call."""
+
+    def __init__(self, fields: list[str]):
+        self.content = json.dumps({field: "Not specified" for field in fields})
+
+    def create(self, messages, model=None, label="chat", **kwargs):
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def measure(fn, repeats: int):
+    """Median seconds over `repeats` runs, and the peak traced heap of one extra run."""
+    fn()  # warm-up: lazy imports, model and tokenizer loading
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(seconds), peak
+
+
+def use_offline_env() -> None:
+    # Offline and uncached: no hub downloads, every repeat does the full work. Set by main(),
+    # not at import, so importing this module (load_test does) leaves the caller's env alone
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ["EMBEDDING_STORE_DIR"] = ""
+    os.environ["ANSWER_CACHE"] = "off"
+
+
+def run_cases(args) -> dict:
+    # The env is read when these modules are first imported; see use_offline_env
+    from benchmarks.bench_encoders import SAMPLE_QUERIES
+    from embedding import embed_chunks, search
+    from extract_chunk_support import _extract_pdf_text_from_bytes, chunk_text
+    from parse_chunks import parse_chunk
+    from rfp_extractor import RFPExtractor
+
+    pdf = synthetic_pdf(args.pages)
+    html = synthetic_html(args.html_kb)
+    text = _extract_pdf_text_from_bytes(pdf, workers=1)
+    chunks = parse_chunk(pdf)
+    chunks, embeddings = embed_chunks(chunks)
+    queries = SAMPLE_QUERIES
+
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    pdf_path = os.path.join(workdir, "rfp.pdf")
+    html_path = os.path.join(workdir, "rfp.html")
+    with open(pdf_path, "wb") as f:
+        f.write(pdf)
+    with open(html_path, "w", encoding="utf-8") as f:
+        f.write(html)
+
+    extractor = RFPExtractor(api_key="offline")
+    extractor.client = StubLLMClient(RFPExtractor.EXPECTED_FIELDS)
+
+    def search_all():
+        for query in queries:
+            search(query, chunks, embeddings)
+
+    def process_quietly():
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            extractor.process_document(pdf_path)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    # (name, callable, work units per call, unit)
+    cases = [
+        ("extract_pdf", lambda: _extract_pdf_text_from_bytes(pdf, workers=1), args.pages, "pages"),
+        ("chunk_text", lambda: chunk_text(text), len(text) / 1e6, "MB"),
+        ("parse_chunk", lambda: parse_chunk(pdf), args.pages, "pages"),
+        ("embed_chunks", lambda: embed_chunks(chunks), len(chunks), "chunks"),
+        ("search", search_all, len(queries), "queries"),
+        ("extract_html", lambda: extractor.extract_text_from_html(html_path), len(html) / 1e6, "MB"),
+        ("process_document", process_quietly, 1, "docs"),
+    ]
+
+    print(f"{args.pages} PDF pages ({len(pdf) / 1e6:.1f} MB, {len(text)} chars, {len(chunks)} chunks), "
+          f"{len(html) / 1e6:.1f} MB HTML, {args.repeats} repeats\n")
+    results = {}
+    try:
+        for name, fn, units, unit in cases:
+            if args.only and name not in args.only:
+                continue
+            seconds, peak = measure(fn, args.repeats)
+            results[name] = {
+                "seconds": seconds,
+                "throughput": units / seconds if seconds else float("inf"),
+                "unit": f"{unit}/s",
+                "peak_bytes": peak,
+            }
+    finally:
+        for path in (pdf_path, html_path):
+            os.remove(path)
+        os.rmdir(workdir)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            if base[metric] and result[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {base[metric]:.4g} -> {result[metric]:.4g} "
+                                   f"(+{100 * (result[metric] / base[metric] - 1):.0f}%)")
+    return regressions
+
+
+def report(results: dict, baseline: dict = None) -> None:
+    print(f"{'stage':<18}{'median (ms)':>13}{'throughput':>22}{'peak heap (MB)':>16}{'vs baseline':>13}")
+    for name, result in results.items():
+        change = ""
+        if baseline and name in baseline and baseline[name]["seconds"]:
+            change = f"{100 * (result['seconds'] / baseline[name]['seconds'] - 1):+.0f}%"
+        throughput = f"{result['throughput']:.1f} {result['unit']}"
+        print(f"{name:<18}{1000 * result['seconds']:>13.2f}{throughput:>22}"
+              f"{result['peak_bytes'] / 1e6:>16.2f}{change:>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline ingestion/retrieval micro-benchmarks")
+    parser.add_argument("--pages", type=int, default=40, help="Pages of the synthetic PDF")
+    parser.add_argument("--html-kb", type=int, default=500, help="Size of the synthetic HTML page")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per stage (median is reported)")
+    parser.add_argument("--only", nargs="+", help="Run only these stages")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Fail on regressions against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown/growth, e.g. 0.25 = 25%%")
+    args = parser.parse_args()
+    use_offline_env()
+
+    params = {"pages": args.pages, "html_kb": args.html_kb}
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            stored = json.load(f)
+        if stored.get("params") == params:
+            baseline = stored["results"]
+        elif args.compare:
+            print(f"Baseline {args.baseline} was recorded with {stored.get('params')}, not {params}")
+            sys.exit(2)
+    elif args.compare:
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        sys.exit(2)
+
+    results = run_cases(args)
+    report(results, baseline)
+
+    if args.save_baseline:
+        if baseline is not None and args.only:
+            results = {**baseline, **results}
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"params": params, "results": results}, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if args.compare:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressions beyond {100 * args.tolerance:.0f}%:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {100 * args.tolerance:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
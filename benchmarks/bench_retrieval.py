@@ -0,0 +1,134 @@
+"""
+Latency and answer-agreement benchmark of the retrieval modes in query.py:
+the two-call "keywords" flow (LLM keyword extraction, then answering)
+against the one-call "fast" flow (hybrid BM25 + embedding search on the
+questions, then answering).
+
+The retrieval-only section (search latency of dense, BM25 and fused
+search, and overlap of their results) runs offline. The end-to-end
+section calls Groq and needs GROQ_API_KEY; it reports per-stage latency
+and how often both flows give the same answer (token F1 per question).
+
+Usage:
+  python -m benchmarks.bench_retrieval --pdf policy.pdf
+  python -m benchmarks.bench_retrieval --pdf policy.pdf --questions questions.txt --repeats 3
+  python -m benchmarks.bench_retrieval --pdf policy.pdf --offline
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import time
+from collections import Counter
+
+# Every call must reach the LLM, otherwise the second flow is served from the cache
+os.environ["ANSWER_CACHE"] = "off"
+
+from benchmarks.bench_encoders import SAMPLE_QUERIES  # noqa: E402
+from embedding import embed_chunks, search_hits, search_hybrid  # noqa: E402
+from parse_chunks import parse_chunk  # noqa: E402
+
+
+def token_f1(a: str, b: str) -> float:
+    a_tokens = re.findall(r"\w+", a.lower())
+    b_tokens = re.findall(r"\w+", b.lower())
+    common = sum((Counter(a_tokens) & Counter(b_tokens)).values())
+    if not a_tokens or not b_tokens or not common:
+        return float(a_tokens == b_tokens)
+    precision, recall = common / len(a_tokens), common / len(b_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+def overlap(a, b) -> float:
+    return sum(len(set(x.tolist()) & set(y.tolist())) for (x, _), (y, _) in zip(a, b)) / max(
+        1, sum(len(x) for x, _ in a)
+    )
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_search(chunks, embeddings, questions, top_k):
+    dense, dense_s = timed(search_hits, questions, embeddings, top_k)
+    lexical, lexical_s = timed(chunks.bm25.search, questions, top_k)
+    fused, fused_s = timed(search_hybrid, questions, chunks, embeddings, top_k)
+
+    print(f"{'search':<12}{'ms/query':>10}{'overlap w/ dense':>18}")
+    for name, hits, seconds in (("dense", dense, dense_s), ("bm25", lexical, lexical_s), ("hybrid", fused, fused_s)):
+        print(f"{name:<12}{1000 * seconds / len(questions):>10.3f}{overlap(hits, dense):>18.3f}")
+
+
+async def run_flow(query, client, chunks, embeddings, questions, mode):
+    # Same steps as query.answer_questions_async, timed per stage
+    start = time.perf_counter()
+    context = await query._retrieve_context(client, chunks, embeddings, questions, mode=mode)
+    retrieved = time.perf_counter()
+    completion = await query._answer_completion(client, context, questions)
+    done = time.perf_counter()
+
+    answers = [a.strip() for a in completion.choices[0].message.content.split("|") if a.strip()]
+    if answers and answers[0] == "-":
+        answers = answers[1:]
+    return answers, retrieved - start, done - start
+
+
+async def bench_flows(chunks, embeddings, questions, repeats):
+    import query
+    from llm_client import get_client
+
+    client = get_client()
+    timings = {mode: ([], []) for mode in query.RETRIEVAL_MODES}
+    f1s = []
+    for _ in range(repeats):
+        results = {}
+        for mode in query.RETRIEVAL_MODES:
+            answers, retrieval_s, total_s = await run_flow(query, client, chunks, embeddings, questions, mode)
+            timings[mode][0].append(retrieval_s)
+            timings[mode][1].append(total_s)
+            results[mode] = answers
+        keywords, fast = results["keywords"], results["fast"]
+        f1s.extend(token_f1(a, b) for a, b in zip(keywords, fast))
+        f1s.extend(0.0 for _ in range(abs(len(keywords) - len(fast))))
+
+    print(f"\n{'flow':<12}{'retrieval p50 (s)':>20}{'total p50 (s)':>16}{'total max (s)':>16}")
+    for mode, (retrieval, total) in timings.items():
+        print(f"{mode:<12}{statistics.median(retrieval):>20.3f}{statistics.median(total):>16.3f}{max(total):>16.3f}")
+    print(f"\nanswer agreement: mean token F1 {statistics.mean(f1s):.3f}, "
+          f"{sum(f >= 0.5 for f in f1s)}/{len(f1s)} answers with F1 >= 0.5")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword-LLM vs fast hybrid retrieval benchmark")
+    parser.add_argument("--pdf", required=True, help="Document to ask about")
+    parser.add_argument("--questions", help="Text file with one question per line (default: built-in samples)")
+    parser.add_argument("--repeats", type=int, default=3, help="End-to-end runs per flow")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--offline", action="store_true", help="Only benchmark search (no LLM calls)")
+    args = parser.parse_args()
+
+    questions = SAMPLE_QUERIES
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    with open(args.pdf, "rb") as f:
+        chunks, embeddings = embed_chunks(parse_chunk(f.read()))
+    print(f"{len(chunks)} chunks, {len(questions)} questions, top_k={args.top_k}\n")
+
+    if chunks.bm25 is not None:
+        bench_search(chunks, embeddings, questions, args.top_k)
+    else:
+        print("BM25_INDEX=0: no lexical index, skipping search comparison")
+
+    if args.offline:
+        return
+    asyncio.run(bench_flows(chunks, embeddings, questions, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
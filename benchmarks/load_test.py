@@ -0,0 +1,339 @@
+"""
+End-to-end load test of /hackrx/run-file against a local Groq stand-in.
+
+By default it starts benchmarks.mock_groq and the API (uvicorn main:app)
+as subprocesses, with GROQ_BASE_URL pointing the service at the mock and
+the answer cache off, then uploads PDFs with questions at a fixed
+concurrency. It reports latency percentiles, throughput, status codes,
+the median server-side stage timings (from the Server-Timing header),
+the document- and answer-cache hits of the run (from /hackrx/cache), and
+the RSS and CPU use of the server process and its worker pools. Resource
+sampling reads /proc, so it is Linux only.
+
+Documents are synthetic RFP PDFs (see bench_pipeline) unless --pdf is
+given. Repeated uploads of a document hit the document cache; --cold
+makes every upload byte-distinct so each request parses and embeds. A
+started API has the answer cache off; a --url server may not, and then
+warm runs are mostly answered from it without LLM calls, which the
+reported answer-cache hits show.
+
+Usage:
+  python -m benchmarks.load_test --requests 200 --concurrency 16
+  python -m benchmarks.load_test --pdf policy.pdf --cold --llm-latency 1.0 --llm-rate-limit-rate 0.1
+  python -m benchmarks.load_test --url http://127.0.0.1:8000 --server-pid 1234 --api-key $HACKRX_API_KEY
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+from benchmarks.mock_groq import add_arguments
+
+LOAD_TEST_API_KEY = "load-test"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _proc_stat(pid: int) -> list[str]:
+    with open(f"/proc/{pid}/stat") as f:
+        # Fields after the parenthesised command name, starting with the state
+        return f.read().rsplit(")", 1)[1].split()
+
+
+def process_tree(pid: int) -> list[int]:
+    """pid and all its live descendants (uvicorn worker plus parse/encode pools)."""
+    children: dict[int, list[int]] = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                children.setdefault(int(_proc_stat(int(entry))[1]), []).append(int(entry))
+            except (OSError, IndexError):
+                continue
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+class ResourceSampler(threading.Thread):
+    """Samples RSS of a process tree at a fixed interval and its CPU time at start/stop."""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.rss: list[int] = []
+        self._done = threading.Event()
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+        self._ticks = os.sysconf("SC_CLK_TCK")
+        self.cpu_start = self.cpu_seconds()
+        self.wall_start = time.perf_counter()
+
+    def cpu_seconds(self) -> float:
+        total = 0
+        for pid in process_tree(self.pid):
+            try:
+                fields = _proc_stat(pid)
+            except OSError:
+                continue
+            total += int(fields[11]) + int(fields[12])  # utime + stime
+        return total / self._ticks
+
+    def rss_bytes(self) -> int:
+        total = 0
+        for pid in process_tree(self.pid):
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    total += int(f.read().split()[1]) * self._page_size
+            except OSError:
+                continue
+        return total
+
+    def run(self) -> None:
+        while not self._done.wait(self.interval):
+            self.rss.append(self.rss_bytes())
+
+    def stop(self) -> dict:
+        self._done.set()
+        self.join()
+        wall = time.perf_counter() - self.wall_start
+        cpu = self.cpu_seconds() - self.cpu_start
+        rss = self.rss or [self.rss_bytes()]
+        return {"rss_peak": max(rss), "rss_mean": statistics.mean(rss), "cpu_percent": 100 * cpu / wall}
+
+
+def sample_documents(args) -> list[tuple[str, bytes]]:
+    if args.pdf:
+        documents = []
+        for path in args.pdf:
+            with open(path, "rb") as f:
+                documents.append((os.path.basename(path), f.read()))
+        return documents
+    from benchmarks.bench_pipeline import synthetic_pdf
+
+    return [(f"synthetic-{seed}.pdf", synthetic_pdf(args.pages, seed)) for seed in range(args.documents)]
+
+
+def sample_questions(args) -> list[str]:
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    from benchmarks.bench_encoders import SAMPLE_QUERIES
+
+    return SAMPLE_QUERIES
+
+
+def _server_timing(header: str) -> dict:
+    stages = {}
+    for entry in filter(None, (part.strip() for part in header.split(","))):
+        name, _, params = entry.partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                stages[name] = float(value)
+    return stages
+
+
+async def run_load(url: str, api_key: str, documents, questions, total: int, concurrency: int, cold: bool):
+    results = []
+    counter = iter(range(total))
+
+    async def worker(client: httpx.AsyncClient):
+        for i in counter:
+            name, pdf = documents[i % len(documents)]
+            if cold:
+                # Bytes after %%EOF are ignored by PDF readers but change the document's hash
+                pdf = pdf + f"\n% load-test {i}\n".encode()
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    f"{url}/hackrx/run-file",
+                    files={"file": (name, pdf, "application/pdf")},
+                    data={"questions_json": json.dumps(questions)},
+                    headers={"Authorization": api_key},
+                )
+                status, timing = response.status_code, response.headers.get("server-timing", "")
+            except httpx.HTTPError as e:
+                status, timing = type(e).__name__, ""
+            results.append((status, time.perf_counter() - start, _server_timing(timing)))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(300.0), limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return results
+
+
+def cache_stats(url: str):
+    # Counters since server start; None if the API does not expose them
+    try:
+        return httpx.get(f"{url}/hackrx/cache", timeout=10.0).json()
+    except (httpx.HTTPError, ValueError):
+        return None
+
+
+def cache_delta(before, after) -> dict:
+    """Document- and answer-cache counters accumulated between two /hackrx/cache snapshots."""
+    if not before or not after:
+        return {}
+    delta = {"documents": {key: after[key] - before[key] for key in ("hits", "misses")}}
+    if after.get("answers") and before.get("answers"):
+        delta["answers"] = {
+            key: after["answers"][key] - before["answers"][key] for key in ("hits", "semantic_hits", "misses")
+        }
+    else:
+        delta["answers"] = None
+    return delta
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else 0.0
+
+
+def report(results, seconds: float, resources: dict = None, llm: dict = None, caches: dict = None) -> None:
+    latencies = [latency for status, latency, _ in results if status == 200]
+    statuses = {}
+    for status, _, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    print(f"\n{len(results)} requests in {seconds:.1f}s: {len(results) / seconds:.2f} req/s, "
+          f"{len(latencies) / seconds:.2f} ok/s")
+    print("status codes: " + ", ".join(f"{status}={n}" for status, n in sorted(statuses.items(), key=str)))
+    if latencies:
+        print(f"latency (s): p50 {percentile(latencies, 0.50):.3f}  p95 {percentile(latencies, 0.95):.3f}  "
+              f"p99 {percentile(latencies, 0.99):.3f}  max {max(latencies):.3f}")
+
+    stages = {}
+    for status, _, timing in results:
+        if status == 200:
+            for name, ms in timing.items():
+                stages.setdefault(name, []).append(ms)
+    if stages:
+        print("\nserver stages (Server-Timing, successful requests):")
+        print(f"  {'stage':<16}{'p50 (ms)':>10}{'p95 (ms)':>10}")
+        for name, values in stages.items():
+            print(f"  {name:<16}{statistics.median(values):>10.1f}{percentile(values, 0.95):>10.1f}")
+
+    if resources:
+        print(f"\nserver RSS peak {resources['rss_peak'] / 1e6:.0f} MB, mean {resources['rss_mean'] / 1e6:.0f} MB; "
+              f"CPU {resources['cpu_percent']:.0f}% (100% = one core)")
+    if llm:
+        print("mock LLM: " + ", ".join(f"{key}={value}" for key, value in llm.items()))
+    if caches:
+        documents, answers = caches["documents"], caches["answers"]
+        print(f"document cache: {documents['hits']} hits, {documents['misses']} misses")
+        if answers is None:
+            print("answer cache: off")
+        else:
+            print(f"answer cache: {answers['hits']} hits ({answers['semantic_hits']} semantic), "
+                  f"{answers['misses']} misses")
+            if answers["hits"]:
+                print("  answers served from the answer cache made no LLM call; the throughput above is not "
+                      "LLM-bound (use --cold, or run the API with ANSWER_CACHE=off)")
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 300) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with status {process.returncode}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def start_servers(args) -> tuple[list[subprocess.Popen], str, str]:
+    """Start the mock LLM and the API; returns (processes, API URL, mock URL)."""
+    mock_port, api_port = _free_port(), _free_port()
+    mock_args = []
+    for name in ("latency", "jitter", "tokens_per_second", "error_rate", "rate_limit_rate", "rpm", "retry_after"):
+        mock_args += [f"--{name.replace('_', '-')}", str(getattr(args, f"llm_{name}"))]
+    mock = subprocess.Popen([sys.executable, "-m", "benchmarks.mock_groq", "--port", str(mock_port), *mock_args])
+    mock_url = f"http://127.0.0.1:{mock_port}"
+
+    env = {
+        **os.environ,
+        "GROQ_BASE_URL": mock_url,
+        "GROQ_API_KEY": "mock",
+        "HACKRX_API_KEY": args.api_key,
+    }
+    env["ANSWER_CACHE"] = os.environ.get("ANSWER_CACHE", "memory") if args.answer_cache else "off"
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(api_port), "--log-level", "warning"], env=env
+    )
+    api_url = f"http://127.0.0.1:{api_port}"
+    try:
+        wait_ready(mock_url + "/stats", mock)
+        wait_ready(api_url + "/", api)
+    except Exception:
+        for process in (api, mock):
+            process.terminate()
+        raise
+    return [api, mock], api_url, mock_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /hackrx/run-file against a mock Groq server")
+    parser.add_argument("--requests", type=int, default=100, help="Total requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--pdf", nargs="+", help="PDFs to upload (default: synthetic documents)")
+    parser.add_argument("--documents", type=int, default=4, help="Synthetic documents to cycle through")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per synthetic document")
+    parser.add_argument("--questions", help="Text file with one question per line (default: built-in samples)")
+    parser.add_argument("--cold", action="store_true", help="Make every upload unique (no document cache hits)")
+    parser.add_argument("--answer-cache", action="store_true", help="Keep the answer cache on in the started API")
+    parser.add_argument("--url", help="Test a running API instead of starting one (and the mock)")
+    parser.add_argument("--server-pid", type=int, help="PID of the running API, for RSS/CPU sampling with --url")
+    parser.add_argument("--api-key", default=os.environ.get("HACKRX_API_KEY", LOAD_TEST_API_KEY))
+    add_arguments(parser, prefix="llm-")
+    args = parser.parse_args()
+
+    documents, questions = sample_documents(args), sample_questions(args)
+    processes, mock_url = [], None
+    if args.url:
+        url, pid = args.url.rstrip("/"), args.server_pid
+    else:
+        processes, url, mock_url = start_servers(args)
+        pid = processes[0].pid
+    print(f"{args.requests} requests at concurrency {args.concurrency} against {url}: "
+          f"{len(documents)} documents, {len(questions)} questions each{' (cold)' if args.cold else ''}")
+
+    try:
+        sampler = ResourceSampler(pid) if pid else None
+        if sampler:
+            sampler.start()
+        caches_before = cache_stats(url)
+        start = time.perf_counter()
+        results = asyncio.run(
+            run_load(url, args.api_key, documents, questions, args.requests, args.concurrency, args.cold)
+        )
+        seconds = time.perf_counter() - start
+        resources = sampler.stop() if sampler else None
+        llm = httpx.get(mock_url + "/stats").json() if mock_url else None
+        report(results, seconds, resources, llm, cache_delta(caches_before, cache_stats(url)))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Local stand-in for the Groq chat-completions API, for load tests that
+should neither spend quota nor be dominated by the real API's latency.
+
+Serves POST /openai/v1/chat/completions (plain and stream=True) with
+answers shaped like the prompts of this repo expect: one '|'-separated
+segment per question for the keyword and answer prompts of query.py, and
+an empty JSON object for RFPExtractor (which fills in "Not specified").
+Point the service at it with GROQ_BASE_URL=http://127.0.0.1:<port>.
+
+Latency is modelled as time to first token plus completion tokens at a
+fixed generation rate; streamed responses are paced the same way. Errors
+are injected at random (500) or as rate limits (429 with Retry-After),
+either at random or once a requests-per-minute budget is exhausted.
+GET /stats returns the counters.
+
+Usage:
+  python -m benchmarks.mock_groq --port 8100
+  python -m benchmarks.mock_groq --latency 0.4 --tokens-per-second 300 --rate-limit-rate 0.05 --rpm 600
+"""
+
+import argparse
+import ast
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import deque
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CHARS_PER_TOKEN = 4
+
+
+class MockConfig:
+    __slots__ = ("latency", "jitter", "tokens_per_second", "error_rate", "rate_limit_rate", "rpm", "retry_after")
+
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, tokens_per_second: float = 500,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, rpm: int = 0, retry_after: float = 1.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rpm = rpm
+        self.retry_after = retry_after
+
+
+def _questions(prompt: str) -> list:
+    # The query.py prompts end with "Question:\n{python list}\n\nAnswer:"
+    _, _, tail = prompt.rpartition("Question:")
+    body, _, _ = tail.rpartition("Answer:")
+    try:
+        questions = ast.literal_eval(body.strip())
+    except (ValueError, SyntaxError):
+        return [body.strip()]
+    return list(questions) if isinstance(questions, (list, tuple)) else [questions]
+
+
+def completion_text(messages: list[dict]) -> str:
+    prompt = messages[-1].get("content", "") if messages else ""
+    # Only RFPExtractor sends a system prompt; it wants a JSON object
+    if any(message.get("role") == "system" for message in messages):
+        return "{}"
+    questions = _questions(prompt)
+    if "set of keywords" in prompt[:400]:
+        return " | ".join(f"keywords for {question}" for question in questions)
+    return " | ".join(f"Mock answer {i + 1}: the document covers this." for i in range(len(questions)))
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    app = FastAPI()
+    stats = {"requests": 0, "streams": 0, "rate_limited": 0, "errors": 0, "completion_tokens": 0}
+    window = deque()
+
+    def rate_limited() -> bool:
+        now = time.monotonic()
+        while window and now - window[0] > 60:
+            window.popleft()
+        if config.rpm and len(window) >= config.rpm:
+            return True
+        window.append(now)
+        return random.random() < config.rate_limit_rate
+
+    def error(status: int, kind: str, message: str) -> JSONResponse:
+        headers = {"retry-after": str(config.retry_after)} if status == 429 else None
+        return JSONResponse({"error": {"message": message, "type": kind}}, status_code=status, headers=headers)
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        if rate_limited():
+            stats["rate_limited"] += 1
+            return error(429, "rate_limit_exceeded", "Rate limit reached (mock)")
+        if random.random() < config.error_rate:
+            stats["errors"] += 1
+            return error(500, "internal_server_error", "Injected failure (mock)")
+
+        text = completion_text(body.get("messages", []))
+        prompt_tokens = sum(len(m.get("content") or "") for m in body.get("messages", [])) // CHARS_PER_TOKEN
+        completion_tokens = max(1, len(text) // CHARS_PER_TOKEN)
+        stats["completion_tokens"] += completion_tokens
+        first_token = max(0.0, config.latency + random.uniform(-config.jitter, config.jitter))
+        per_token = 1 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time()), "model": body.get("model")}
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_token + completion_tokens * per_token)
+            return {
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+
+        stats["streams"] += 1
+
+        async def events():
+            await asyncio.sleep(first_token)
+            for start in range(0, len(text), CHARS_PER_TOKEN):
+                delta = {"index": 0, "delta": {"content": text[start:start + CHARS_PER_TOKEN]}, "finish_reason": None}
+                yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [delta]})}\n\n"
+                await asyncio.sleep(per_token)
+            done = {"index": 0, "delta": {}, "finish_reason": "stop"}
+            yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [done]})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser, prefix: str = "") -> None:
+    parser.add_argument(f"--{prefix}latency", type=float, default=0.3, help="Seconds to first token")
+    parser.add_argument(f"--{prefix}jitter", type=float, default=0.1, help="Uniform +/- jitter on the latency")
+    parser.add_argument(f"--{prefix}tokens-per-second", type=float, default=500, help="Completion token rate")
+    parser.add_argument(f"--{prefix}error-rate", type=float, default=0.0, help="Share of calls failing with 500")
+    parser.add_argument(f"--{prefix}rate-limit-rate", type=float, default=0.0, help="Share of calls answered 429")
+    parser.add_argument(f"--{prefix}rpm", type=int, default=0, help="Requests per minute before 429s, 0 = unlimited")
+    parser.add_argument(f"--{prefix}retry-after", type=float, default=1.0, help="Retry-After sent with 429s")
+
+
+def config_from_args(args: argparse.Namespace, prefix: str = "") -> MockConfig:
+    prefix = prefix.replace("-", "_")
+    return MockConfig(**{name: getattr(args, prefix + name) for name in MockConfig.__slots__})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Groq chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
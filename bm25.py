@@ -0,0 +1,141 @@
+"""
+Lexical BM25 index over the chunks of one document.
+
+Built once at ingest (parse_chunk) and cached with the document, so
+queries only touch the postings of their own terms. The postings are kept
+in CSR form: one array of chunk ids and one of precomputed BM25 term
+weights, sliced per term, which pickles compactly out of the parse worker.
+
+fuse_hits combines BM25 and embedding results per query with weighted
+reciprocal rank fusion. RRF only looks at ranks, so it needs no
+calibration between cosine and BM25 scores, and the fused scores are
+comparable across queries (as context_packer expects).
+
+Configuration via environment:
+  BM25_INDEX   build the index at ingest, 1/0 (default: 1)
+  BM25_WEIGHT  share of the lexical ranking in the fused score, 0 disables fusion (default: 0.5)
+"""
+
+import os
+import re
+from collections import Counter
+from typing import Iterable
+
+import numpy as np
+
+BM25_WEIGHT = float(os.environ.get("BM25_WEIGHT", "0.5"))
+
+# Rank offset of reciprocal rank fusion (the usual 60 from Cormack et al.)
+RRF_K = 60
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.'][a-z0-9]+)*")
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i if in is it its of on or "
+    "our shall that the their there these this to under was what when where which who will with "
+    "would you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a list of texts.
+
+    Args:
+        texts: Chunk texts; row i is chunk id i
+        k1: Term frequency saturation
+        b: Length normalization
+    """
+
+    def __init__(self, texts: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        postings: dict[str, list[tuple[int, int]]] = {}
+        lengths = []
+        for chunk_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((chunk_id, tf))
+
+        self.n_chunks = len(lengths)
+        lengths = np.asarray(lengths, dtype=np.float32)
+        avg_length = float(lengths.mean()) if self.n_chunks and lengths.mean() > 0 else 1.0
+        norms = k1 * (1 - b + b * lengths / avg_length)
+
+        self.vocabulary: dict[str, int] = {}
+        offsets = [0]
+        ids = []
+        weights = []
+        for term, entries in postings.items():
+            self.vocabulary[term] = len(self.vocabulary)
+            df = len(entries)
+            idf = np.log(1 + (self.n_chunks - df + 0.5) / (df + 0.5))
+            term_ids = np.fromiter((chunk_id for chunk_id, _ in entries), dtype=np.int32, count=df)
+            tfs = np.fromiter((tf for _, tf in entries), dtype=np.float32, count=df)
+            ids.append(term_ids)
+            weights.append(idf * tfs * (k1 + 1) / (tfs + norms[term_ids]))
+            offsets.append(offsets[-1] + df)
+
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.ids = np.concatenate(ids) if ids else np.empty(0, dtype=np.int32)
+        self.weights = np.concatenate(weights).astype(np.float32) if weights else np.empty(0, dtype=np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        # Vocabulary strings are not counted; they are small next to the postings
+        return self.offsets.nbytes + self.ids.nbytes + self.weights.nbytes
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.n_chunks, dtype=np.float32)
+        for term in set(tokenize(query)):
+            row = self.vocabulary.get(term)
+            if row is None:
+                continue
+            start, stop = self.offsets[row], self.offsets[row + 1]
+            # A term lists each chunk at most once, so plain fancy-index addition is safe
+            scores[self.ids[start:stop]] += self.weights[start:stop]
+        return scores
+
+    def search(self, queries: list[str], top_k: int = 5) -> list[tuple[np.ndarray, np.ndarray]]:
+        """(chunk ids, BM25 scores) per query, best first; chunks without any query term are left out."""
+        hits = []
+        for query in queries:
+            scores = self.scores(query)
+            matched = np.flatnonzero(scores > 0)
+            k = min(top_k, len(matched))
+            if k == 0:
+                hits.append((np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)))
+                continue
+            part = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            order = np.argsort(-scores[part], kind="stable")
+            hits.append((part[order], scores[part[order]]))
+        return hits
+
+
+def fuse_hits(dense: list[tuple[np.ndarray, np.ndarray]], lexical: list[tuple[np.ndarray, np.ndarray]],
+              top_k: int = 5, weight: float = BM25_WEIGHT) -> list[tuple[np.ndarray, np.ndarray]]:
+    """
+    Weighted reciprocal rank fusion of two result lists per query.
+
+    Args:
+        dense: (ids, scores) per query from embedding search
+        lexical: (ids, scores) per query from BM25Index.search
+        top_k: Results kept per query
+        weight: Share of the lexical ranking (0..1)
+
+    Returns:
+        (ids, fused scores) per query, best first
+    """
+    fused = []
+    for (dense_ids, _), (lexical_ids, _) in zip(dense, lexical):
+        scores: dict[int, float] = {}
+        for rank, chunk_id in enumerate(dense_ids.tolist()):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + (1 - weight) / (RRF_K + rank + 1)
+        for rank, chunk_id in enumerate(lexical_ids.tolist()):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + weight / (RRF_K + rank + 1)
+        best = sorted(scores, key=lambda chunk_id: -scores[chunk_id])[:top_k]
+        fused.append((np.asarray(best, dtype=np.intp), np.asarray([scores[i] for i in best], dtype=np.float32)))
+    return fused
@@ -0,0 +1,118 @@
+"""
+Compact in-memory representation of a chunked document.
+
+All chunks of a document share one text buffer (the extracted document
+text); each chunk is only a (start, end) offset pair plus its page range,
+stored in typed arrays. Overlapping chunks therefore cost no extra text,
+and the table pickles as one string plus a few byte buffers when it
+comes back from a parse worker. Chunk ids are row positions. The lexical
+index built at ingest (bm25.BM25Index) travels with the table.
+
+JSON is produced only where it leaves the process (to_json / to_dicts).
+"""
+
+import json
+from array import array
+from typing import Iterable, Iterator
+
+from extract_chunk_support import ChunkSpan
+
+
+class Chunk:
+    """One row of a ChunkTable, materialized on access."""
+
+    __slots__ = ("file_name", "chunk_id", "text", "page", "page_end", "start", "end")
+
+    def __init__(self, file_name: str, chunk_id: int, text: str, page: int, page_end: int, start: int, end: int):
+        self.file_name = file_name
+        self.chunk_id = chunk_id
+        self.text = text
+        self.page = page
+        self.page_end = page_end
+        self.start = start
+        self.end = end
+
+    def to_dict(self) -> dict:
+        return {
+            "file_name": self.file_name,
+            "chunk_id": self.chunk_id,
+            "text": self.text,
+            "page": self.page,
+            "page_end": self.page_end,
+            "span": [self.start, self.end],
+        }
+
+    def __repr__(self) -> str:
+        return f"Chunk(chunk_id={self.chunk_id}, page={self.page}, text={self.text[:40]!r})"
+
+
+class ChunkTable:
+    """
+    Chunks of one document as offsets into a shared text buffer.
+
+    Args:
+        text: Full document text the offsets point into
+        file_name: Source name reported with every chunk
+    """
+
+    __slots__ = ("text", "file_name", "starts", "ends", "pages", "page_ends", "bm25")
+
+    def __init__(self, text: str, file_name: str = "Insurance"):
+        self.text = text
+        self.file_name = file_name
+        self.starts = array("q")
+        self.ends = array("q")
+        self.pages = array("i")
+        self.page_ends = array("i")
+        self.bm25 = None
+
+    @classmethod
+    def from_spans(cls, text: str, spans: Iterable[ChunkSpan], file_name: str = "Insurance") -> "ChunkTable":
+        table = cls(text, file_name)
+        for span in spans:
+            table.append(span)
+        return table
+
+    def append(self, span: ChunkSpan) -> None:
+        self.starts.append(span.start)
+        self.ends.append(span.end)
+        self.pages.append(span.page)
+        self.page_ends.append(span.page_end)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, i: int) -> Chunk:
+        if i < 0:
+            i += len(self)
+        start, end = self.starts[i], self.ends[i]
+        return Chunk(self.file_name, i, self.text[start:end], self.pages[i], self.page_ends[i], start, end)
+
+    def __iter__(self) -> Iterator[Chunk]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def chunk_text(self, i: int) -> str:
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def texts(self, indices: Iterable[int] = None) -> list[str]:
+        """Chunk texts, for all rows or the given row indices."""
+        if indices is None:
+            indices = range(len(self))
+        text, starts, ends = self.text, self.starts, self.ends
+        return [text[starts[i]:ends[i]] for i in indices]
+
+    @property
+    def nbytes(self) -> int:
+        # The buffer is counted once however much the chunks overlap
+        arrays = (self.starts, self.ends, self.pages, self.page_ends)
+        nbytes = len(self.text) + sum(a.itemsize * len(a) for a in arrays)
+        if self.bm25 is not None:
+            nbytes += self.bm25.nbytes
+        return nbytes
+
+    def to_dicts(self) -> list[dict]:
+        return [chunk.to_dict() for chunk in self]
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dicts())
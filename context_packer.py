@@ -0,0 +1,76 @@
+"""
+Builds the LLM context from retrieval hits.
+
+Every keyword set and question retrieves its own top-k chunks, and the
+same chunks come back for many of them. Instead of concatenating all
+result lists, the packer takes the union of the retrieved chunk ids,
+ranks each chunk by its best score over all queries and adds chunks
+until the token budget of the context is spent. Each query's best chunk
+is admitted first, so a question whose hits score lower than the others
+still gets evidence. The selected chunks are emitted in document order.
+
+Configuration via environment:
+  CONTEXT_TOKEN_BUDGET  tokens reserved for retrieved context in a prompt (default: 6000)
+"""
+
+import os
+from typing import Callable
+
+import numpy as np
+
+from chunk_table import ChunkTable
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "6000"))
+
+SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    # Default counter: ~4 characters per token for English prose with Llama-style tokenizers.
+    # query.py passes the model's real tokenizer (token_count.token_counter) instead.
+    return len(text) // 4 + 1
+
+
+def rank_chunks(hits: list[tuple[np.ndarray, np.ndarray]]) -> list[int]:
+    """
+    Unique chunk ids of all hits: each query's best chunk first (in query
+    order), then the rest by their best score over all queries.
+    """
+    best: dict[int, float] = {}
+    for ids, scores in hits:
+        for chunk_id, score in zip(ids.tolist(), scores.tolist()):
+            if score > best.get(chunk_id, -np.inf):
+                best[chunk_id] = score
+
+    leaders = list(dict.fromkeys(int(ids[0]) for ids, _ in hits if len(ids)))
+    leader_set = set(leaders)
+    rest = sorted((chunk_id for chunk_id in best if chunk_id not in leader_set), key=lambda i: -best[i])
+    return leaders + rest
+
+
+def pack_context(chunks: ChunkTable, hits: list[tuple[np.ndarray, np.ndarray]],
+                 budget_tokens: int = CONTEXT_TOKEN_BUDGET,
+                 count_tokens: Callable[[str], int] = estimate_tokens) -> str:
+    """
+    Deduplicated context that fits budget_tokens.
+
+    Args:
+        chunks: ChunkTable the hits refer to
+        hits: (chunk ids, scores) per query, as returned by embedding.search_hits
+        budget_tokens: Maximum tokens of the returned context
+        count_tokens: Token counter of the target model
+
+    Returns:
+        Selected chunk texts in document order, separated by blank lines
+    """
+    separator_tokens = count_tokens(SEPARATOR)
+    selected = []
+    used = 0
+    for chunk_id in rank_chunks(hits):
+        cost = count_tokens(chunks.chunk_text(chunk_id)) + (separator_tokens if selected else 0)
+        if used + cost > budget_tokens:
+            # A smaller, lower-ranked chunk may still fit
+            continue
+        selected.append(chunk_id)
+        used += cost
+    return SEPARATOR.join(chunks.texts(sorted(selected)))
@@ -0,0 +1,209 @@
+"""
+Content-addressed cache of parsed and embedded documents.
+
+Uploads are keyed by a hash of the raw PDF bytes plus the chunker version
+and the embedding model/backend, so a repeat upload skips parsing and encoding
+and goes straight to retrieval.
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from ann_index import build_index
+from chunk_table import ChunkTable
+from embedding import ENCODER_ID, embed_chunks
+from executors import run_in_process, run_in_thread
+from extract_chunk_support import CHUNKER_VERSION, PdfSource
+from metrics import count, record_spans, span
+from parse_chunks import parse_chunk, parse_small_pdf_with_spans
+
+
+class CachedDocument:
+    """Chunks, embedding matrix and (for large documents) ANN index of one parsed document."""
+
+    __slots__ = ("key", "chunks", "embeddings", "index", "nbytes")
+
+    def __init__(self, key: str, chunks: ChunkTable, embeddings: np.ndarray, index=None):
+        self.key = key
+        self.chunks = chunks
+        self.embeddings = embeddings
+        self.index = index
+        # Rough footprint: the matrix, its index and the chunk text it was built from
+        self.nbytes = embeddings.nbytes + chunks.nbytes
+        if index is not None:
+            self.nbytes += index.nbytes
+
+
+class DocumentCache:
+    """
+    Thread-safe LRU cache of CachedDocument entries, bounded both by entry
+    count and by approximate memory footprint.
+    """
+
+    def __init__(self, max_entries: int = 128, max_bytes: int = 512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[CachedDocument]:
+        with self._lock:
+            doc = self._entries.get(key)
+            if doc is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return doc
+
+    def __contains__(self, key: str) -> bool:
+        # Peek without touching LRU order or hit/miss counters
+        with self._lock:
+            return key in self._entries
+
+    def put(self, doc: CachedDocument) -> None:
+        with self._lock:
+            old = self._entries.pop(doc.key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+
+            # A single document larger than the whole budget is never cached
+            if doc.nbytes > self.max_bytes:
+                return
+
+            self._entries[doc.key] = doc
+            self._bytes += doc.nbytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def document_key(pdf_bytes: bytes) -> str:
+    return digest_key(hashlib.sha256(pdf_bytes).hexdigest())
+
+
+def digest_key(sha256_hex: str) -> str:
+    # Anything that changes the chunks or their vectors must be part of the key
+    return f"{sha256_hex}:{CHUNKER_VERSION}:{ENCODER_ID}"
+
+
+document_cache = DocumentCache(
+    max_entries=int(os.environ.get("DOC_CACHE_MAX_ENTRIES", "128")),
+    max_bytes=int(os.environ.get("DOC_CACHE_MAX_MB", "512")) * 1024 * 1024,
+)
+
+
+def load_document(pdf_bytes: bytes) -> CachedDocument:
+    """
+    Return the parsed chunks and embeddings for a PDF, reusing a cached copy
+    when the same bytes were seen before.
+    """
+    key = document_key(pdf_bytes)
+    doc = document_cache.get(key)
+    if doc is not None:
+        return doc
+
+    doc = _build_document(key, parse_chunk(pdf_bytes))
+    document_cache.put(doc)
+    return doc
+
+
+def _build_document(key: str, chunks: ChunkTable) -> CachedDocument:
+    chunks, embeddings = embed_chunks(chunks)
+    with span("ann_index"):
+        index = build_index(embeddings)
+    count("documents", 1)
+    count("chunks", len(chunks))
+    return CachedDocument(key, chunks, embeddings, index)
+
+
+# Builds in progress, so concurrent uploads of the same PDF parse it only once
+_inflight: dict[str, tuple[asyncio.Task, PdfSource]] = {}
+
+
+async def load_document_async(pdf: PdfSource, key: str = None) -> CachedDocument:
+    """
+    Async variant of load_document for the API: parsing runs in the process
+    pool and encoding in the thread pool, so the event loop is never blocked.
+
+    Args:
+        pdf: PDF bytes, or the path of a spooled upload (only read on a cache miss)
+        key: Cache key from digest_key(); required for paths, derived for bytes
+    """
+    if key is None:
+        key = document_key(pdf)
+    doc = document_cache.get(key)
+    if doc is not None:
+        return doc
+
+    build = _inflight.get(key)
+    if build is None:
+        # The build is a task of its own that every caller (the first one too) waits on
+        # through shield, so a cancelled request never cancels it for the others
+        task = asyncio.ensure_future(_build_document_async(key, pdf))
+        task.add_done_callback(lambda done: _build_finished(key, done))
+        build = _inflight[key] = (task, pdf)
+    task, source = build
+    try:
+        return await asyncio.shield(task)
+    except Exception:
+        if source is pdf or not _removed(source):
+            raise
+        # The build read the spooled file of a request that went away and removed it; use ours
+        return await load_document_async(pdf, key)
+
+
+def _removed(source: PdfSource) -> bool:
+    return not isinstance(source, bytes) and not os.path.exists(source)
+
+
+def _build_finished(key: str, task: asyncio.Task) -> None:
+    if key in _inflight and _inflight[key][0] is task:
+        del _inflight[key]
+    # Mark retrieved so a failure whose callers all went away is not logged as "never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+
+async def _build_document_async(key: str, pdf: PdfSource) -> CachedDocument:
+    # Paths are sent to the worker as-is, so the PDF is never pickled through a pipe
+    parsed = await run_in_process(parse_small_pdf_with_spans, pdf)
+    if parsed is None:
+        # Large PDFs fan out to the page-shard pool themselves; only wait for them here
+        chunks = await run_in_thread(parse_chunk, pdf)
+    else:
+        chunks, spans = parsed
+        record_spans(spans)
+    doc = await run_in_thread(_build_document, key, chunks)
+    document_cache.put(doc)
+    return doc
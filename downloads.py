@@ -0,0 +1,210 @@
+"""
+Pooled, size-capped downloads of PDF URLs for /hackrx/run.
+
+All downloads share one keep-alive requests.Session with explicit
+timeouts. Bodies are streamed to a temp file in fixed-size pieces and
+hashed on the way through, like spooled uploads. For every URL the
+response validators (ETag / Last-Modified) are remembered together with
+the content hash, so a repeat request for a document we already hold is
+a conditional GET answered with 304: nothing is downloaded or re-parsed.
+
+Configuration via environment:
+  DOWNLOAD_MAX_MB           largest accepted document (default: UPLOAD_MAX_MB or 100)
+  DOWNLOAD_CHUNK_KB         piece size written per read (default: 1024)
+  DOWNLOAD_TIMEOUT          read timeout in seconds (default: 60)
+  DOWNLOAD_CONNECT_TIMEOUT  connect timeout in seconds (default: 5)
+  DOWNLOAD_POOL_SIZE        pooled connections per host (default: 20)
+  URL_CACHE_MAX_ENTRIES     URLs whose validators are remembered (default: 1024)
+  UPLOAD_TMP_DIR            where downloads are spooled (default: system temp dir)
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+MAX_DOWNLOAD_BYTES = int(os.environ.get("DOWNLOAD_MAX_MB", os.environ.get("UPLOAD_MAX_MB", "100"))) * 1024 * 1024
+CHUNK_BYTES = int(os.environ.get("DOWNLOAD_CHUNK_KB", "1024")) * 1024
+TIMEOUT = (
+    float(os.environ.get("DOWNLOAD_CONNECT_TIMEOUT", "5")),
+    float(os.environ.get("DOWNLOAD_TIMEOUT", "60")),
+)
+
+
+class DownloadTooLarge(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"Document exceeds the {limit // (1024 * 1024)} MB limit")
+        self.limit = limit
+
+
+class NotAPdf(Exception):
+    pass
+
+
+class Validators(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    sha256: str
+
+
+class Download:
+    """
+    Result of fetch_pdf. path is None when the server answered 304 and the
+    cached content (sha256) is still current; otherwise remove() it once parsed.
+    """
+
+    __slots__ = ("url", "path", "sha256", "size")
+
+    def __init__(self, url: str, path: Optional[Path], sha256: str, size: int = 0):
+        self.url = url
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+
+    @property
+    def not_modified(self) -> bool:
+        return self.path is None
+
+    def remove(self) -> None:
+        if self.path is None:
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def session() -> requests.Session:
+    # requests.Session is safe to share for plain GETs; the adapter pools connections per host
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = int(os.environ.get("DOWNLOAD_POOL_SIZE", "20"))
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+            _session = requests.Session()
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+class ValidatorCache:
+    """Thread-safe LRU of URL -> Validators of the last full download."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Validators]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.downloads = 0
+
+    def get(self, url: str) -> Optional[Validators]:
+        with self._lock:
+            validators = self._entries.get(url)
+            if validators is not None:
+                self._entries.move_to_end(url)
+            return validators
+
+    def record(self, not_modified: bool) -> None:
+        with self._lock:
+            if not_modified:
+                self.not_modified += 1
+            else:
+                self.downloads += 1
+
+    def put(self, url: str, validators: Validators) -> None:
+        with self._lock:
+            self._entries[url] = validators
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, url: str) -> None:
+        with self._lock:
+            self._entries.pop(url, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "urls": len(self._entries),
+                "max_urls": self.max_entries,
+                "downloads": self.downloads,
+                "not_modified": self.not_modified,
+            }
+
+
+url_validators = ValidatorCache(int(os.environ.get("URL_CACHE_MAX_ENTRIES", "1024")))
+
+
+def fetch_pdf(url: str, is_current: Callable[[str], bool] = None,
+              max_bytes: int = MAX_DOWNLOAD_BYTES) -> Download:
+    """
+    Download a PDF URL to a temp file, or revalidate a copy we already hold.
+
+    Args:
+        url: http(s) URL of the PDF
+        is_current: Called with the sha256 of the last download of this URL;
+            the request is only made conditional when it returns True (i.e. the
+            parsed document is still cached). None never revalidates.
+        max_bytes: Size cap, checked against Content-Length and while streaming
+
+    Raises:
+        DownloadTooLarge: when the document is larger than max_bytes
+        NotAPdf: when the body does not start with the PDF signature
+        requests.RequestException: connection errors, timeouts and non-2xx responses
+    """
+    headers = {}
+    known = url_validators.get(url)
+    if known is not None and is_current is not None and is_current(known.sha256):
+        if known.etag:
+            headers["If-None-Match"] = known.etag
+        if known.last_modified:
+            headers["If-Modified-Since"] = known.last_modified
+
+    with session().get(url, headers=headers, stream=True, timeout=TIMEOUT) as resp:
+        if resp.status_code == 304 and headers:
+            url_validators.record(not_modified=True)
+            return Download(url, None, known.sha256)
+        resp.raise_for_status()
+
+        length = resp.headers.get("Content-Length")
+        if length is not None and length.isdigit() and int(length) > max_bytes:
+            raise DownloadTooLarge(max_bytes)
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, name = tempfile.mkstemp(suffix=".pdf", dir=os.environ.get("UPLOAD_TMP_DIR"))
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for piece in resp.iter_content(CHUNK_BYTES):
+                    # PDF readers accept the signature anywhere in the first 1 KB
+                    if size == 0 and b"%PDF" not in piece[:1024]:
+                        raise NotAPdf(f"{url} did not return a PDF document")
+                    size += len(piece)
+                    if size > max_bytes:
+                        raise DownloadTooLarge(max_bytes)
+                    digest.update(piece)
+                    out.write(piece)
+        except BaseException:
+            os.remove(name)
+            raise
+
+        sha256 = digest.hexdigest()
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+
+    url_validators.record(not_modified=False)
+    if etag or last_modified:
+        url_validators.put(url, Validators(etag, last_modified, sha256))
+    else:
+        url_validators.discard(url)
+    return Download(url, Path(name), sha256, size)
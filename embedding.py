@@ -1,22 +1,132 @@
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+import threading
+
 import numpy as np
-import json
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+from bm25 import BM25_WEIGHT, fuse_hits
+from chunk_table import ChunkTable
+from metrics import count, span
+from embedding_store import open_default_store, text_key
+from encoders import encoder_id, load_encoder
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Inference backend is selected with EMBEDDING_BACKEND (torch/onnx/int8), see encoders.py.
+# Loaded on first use rather than at import, so importing this module stays cheap
+_model = None
+_model_lock = threading.Lock()
+
+# Identifies the vectors this process produces (model + backend); used as cache/store namespace
+ENCODER_ID = encoder_id(MODEL_NAME)
+
+# Optional persistent store (EMBEDDING_STORE_DIR) shared across workers and restarts
+store = open_default_store(ENCODER_ID)
+
+
+def get_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = load_encoder(MODEL_NAME)
+        return _model
 
 
-def embed_chunks(json_chunks: str) -> tuple[list[dict], np.ndarray]:
+def embed_chunks(chunks: ChunkTable) -> tuple[ChunkTable, np.ndarray]:
     # Used to convert all chunks into embeddings/extras
-    chunks = json.loads(json_chunks)
-    texts = [chunk['text'] for chunk in chunks]
-    embeddings = model.encode(texts)
+    embeddings = encode_texts(chunks.texts())
     return chunks, embeddings
 
 
-def search(query: str, chunks: list[dict], embeddings: np.ndarray, top_k: int = 5) -> list[str]:
+def encode_texts(texts: list[str]) -> np.ndarray:
+    # Returns L2-normalized embeddings, so a dot product is the cosine similarity
+    return _normalize(_encode_with_store(texts))
+
+
+def _encode_with_store(texts: list[str]) -> np.ndarray:
+    # Encodes only the texts missing from the persistent store (if configured)
+    model = get_model()
+    if store is None or not texts:
+        with span("encode"):
+            count("encoded_texts", len(texts))
+            return model.encode(texts)
+
+    keys = [text_key(text) for text in texts]
+    stored, missing = store.get_many(keys)
+
+    embeddings = np.empty((len(texts), model.get_sentence_embedding_dimension()), dtype=np.float32)
+    for i, vector in enumerate(stored):
+        if vector is not None:
+            embeddings[i] = vector
+
+    if missing:
+        with span("encode"):
+            count("encoded_texts", len(missing))
+            new_embeddings = model.encode([texts[i] for i in missing])
+        embeddings[missing] = new_embeddings
+        store.add([keys[i] for i in missing], new_embeddings)
+
+    return embeddings
+
+
+def encode_queries(queries: list[str]) -> np.ndarray:
+    # Query vectors are not stored: questions rarely repeat verbatim across documents
+    with span("query_encode"):
+        return get_model().encode(list(queries), normalize_embeddings=True)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+    # Row-wise top-k indices, best first; argpartition is O(n) instead of a full sort
+    k = min(top_k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.intp)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def search_hits(queries: list[str], embeddings: np.ndarray, top_k: int = 5,
+                index=None) -> list[tuple[np.ndarray, np.ndarray]]:
+    # Encodes all queries in one batch and scores them with a single matrix multiply.
+    # Expects embeddings from embed_chunks/encode_texts (already normalized).
+    # With an ANN index (see ann_index.build_index) only the probed candidates are scored.
+    # Returns (chunk ids, cosine scores) per query, best first.
+    if not queries:
+        return []
+    query_embeddings = encode_queries(queries)
+    with span("dense_search"):
+        if index is not None:
+            rows = index.search(query_embeddings, top_k)
+            return [(row, embeddings[row] @ query) for row, query in zip(rows, query_embeddings)]
+        scores = query_embeddings @ embeddings.T
+        rows = _top_k(scores, top_k)
+        return [(row, scores[i, row]) for i, row in enumerate(rows)]
+
+
+def search_hybrid(queries: list[str], chunks: ChunkTable, embeddings: np.ndarray, top_k: int = 5,
+                  index=None, bm25_weight: float = BM25_WEIGHT) -> list[tuple[np.ndarray, np.ndarray]]:
+    # Embedding and BM25 results fused per query (see bm25.fuse_hits); plain
+    # search_hits when the document has no lexical index or fusion is disabled
+    if chunks.bm25 is None or bm25_weight <= 0:
+        return search_hits(queries, embeddings, top_k, index)
+    # Fusion reorders candidates, so each side contributes a deeper list than top_k
+    dense = search_hits(queries, embeddings, top_k * 4, index)
+    with span("bm25_search"):
+        lexical = chunks.bm25.search(queries, top_k * 4)
+    return fuse_hits(dense, lexical, top_k, bm25_weight)
+
+
+def search_many(queries: list[str], chunks: ChunkTable, embeddings: np.ndarray, top_k: int = 5,
+                index=None) -> list[list[str]]:
+    # Texts of the top_k chunks per query (see search_hits)
+    return [chunks.texts(ids) for ids, _ in search_hits(queries, embeddings, top_k, index)]
+
+
+def search(query: str, chunks: ChunkTable, embeddings: np.ndarray, top_k: int = 5, index=None) -> list[str]:
     # Searches embedding by comparing it to the embedded query
-    query_embedding = model.encode([query])
-    similarities = cosine_similarity(query_embedding, embeddings)[0]
-    top_indices = similarities.argsort()[::-1][:top_k]
-    return [chunks[i]['text'] for i in top_indices]
+    return search_many([query], chunks, embeddings, top_k, index)[0]
@@ -0,0 +1,266 @@
+"""
+Persistent on-disk store of chunk embeddings, keyed by chunk text hash.
+
+Vectors are kept as contiguous float32/float16 ``.npy`` segments and opened
+with ``np.memmap`` so loads are zero-copy and pages are shared between
+uvicorn workers through the OS page cache. Segments are append-only and
+written atomically (temp file + rename), so any number of processes can read
+the store while others add to it.
+
+Layout::
+
+    <root>/<model>-<dtype>/seg-<id>.keys.npy   (n, 32) uint8 sha256 digests
+    <root>/<model>-<dtype>/seg-<id>.vecs.npy   (n, dim) float32/float16
+
+Every add() writes a segment; once there are more than max_segments, all
+but the largest are merged into one, so the file count and open maps stay
+bounded without rewriting the whole store each time.
+
+Configuration via environment (open_default_store):
+  EMBEDDING_STORE_DIR           store root; unset disables the store
+  EMBEDDING_STORE_DTYPE         float32 | float16 (default: float32)
+  EMBEDDING_STORE_READONLY      1 to never write (default: 0)
+  EMBEDDING_STORE_MAX_SEGMENTS  segment count that triggers a merge (default: 16; 0: never)
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+import numpy as np
+
+KEY_BYTES = 32
+MTIME_SETTLE_NS = 1_000_000_000
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingStore:
+    """
+    Append-only, memory-mapped embedding store for one model and dtype.
+
+    Args:
+        root: Directory holding the store (created if missing unless read_only)
+        model_name: Embedding model the vectors belong to
+        dtype: On-disk precision, "float32" or "float16"
+        read_only: Never write new segments (e.g. for serving workers)
+        max_segments: Merge segments once add() leaves more than this many (0: never)
+    """
+
+    def __init__(self, root: str, model_name: str, dtype: str = "float32", read_only: bool = False,
+                 max_segments: int = 16):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported embedding store dtype: {dtype}")
+
+        self.dtype = np.dtype(dtype)
+        self.read_only = read_only
+        self.max_segments = max_segments
+        self.path = os.path.join(root, f"{model_name.replace('/', '_')}-{dtype}")
+        if not read_only:
+            os.makedirs(self.path, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # One merge at a time per process; add() skips its merge while another runs
+        self._compact_lock = threading.Lock()
+        self._segments: dict[str, np.ndarray] = {}
+        self._index: dict[bytes, tuple[str, int]] = {}
+        self._listed_mtime = None
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def refresh(self) -> None:
+        """Pick up segments written by other processes since the last call."""
+        try:
+            # Segment files are renamed into place, which bumps the directory mtime; unchanged
+            # mtime means nothing to pick up, so lookups that miss cost a stat, not a listing
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+
+        with self._lock:
+            if mtime == self._listed_mtime:
+                return
+            self._load_segments(self._segments, self._index)
+            # Directory timestamps are coarse: a rename within the same tick as this listing would
+            # leave the mtime unchanged, so only trust an mtime that is older than any tick
+            self._listed_mtime = mtime if time.time_ns() - mtime > MTIME_SETTLE_NS else None
+
+    def _load_segments(self, segments: dict, index: dict) -> None:
+        # Syncs `segments` and `index` with the complete segments on disk; caller holds the lock
+        on_disk = sorted(name[:-len(".vecs.npy")] for name in os.listdir(self.path) if name.endswith(".vecs.npy"))
+        if set(segments).difference(on_disk):
+            # Segments merged away by another process: index the files on disk from scratch,
+            # so a long-running reader does not keep every removed file mapped
+            segments.clear()
+            index.clear()
+
+        for seg_id in on_disk:
+            if seg_id in segments:
+                continue
+
+            keys_path = os.path.join(self.path, f"{seg_id}.keys.npy")
+            if not os.path.exists(keys_path):
+                # Keys are renamed into place last; segment not complete yet
+                continue
+
+            try:
+                keys = np.load(keys_path)
+                vecs = np.load(os.path.join(self.path, f"{seg_id}.vecs.npy"), mmap_mode="r")
+            except FileNotFoundError:
+                # Removed by a concurrent compaction; its vectors are in the merged segment
+                continue
+            segments[seg_id] = vecs
+            for row, key in enumerate(keys):
+                index.setdefault(key.tobytes(), (seg_id, row))
+
+    def get_many(self, keys: list[bytes]) -> tuple[list[Optional[np.ndarray]], list[int]]:
+        """
+        Look up vectors for the given keys.
+
+        Returns:
+            (vectors, missing) where vectors[i] is a read-only memmap row or
+            None, and missing lists the indices that were not found
+        """
+        if any(key not in self._index for key in keys):
+            self.refresh()
+
+        vectors: list[Optional[np.ndarray]] = []
+        missing = []
+        # Under the lock, so a concurrent compact() cannot repoint the index mid-lookup;
+        # rows handed out keep their segment's map alive after that
+        with self._lock:
+            for i, key in enumerate(keys):
+                loc = self._index.get(key)
+                if loc is None:
+                    vectors.append(None)
+                    missing.append(i)
+                else:
+                    seg_id, row = loc
+                    vectors.append(self._segments[seg_id][row])
+        return vectors, missing
+
+    def add(self, keys: list[bytes], vectors: np.ndarray) -> None:
+        """
+        Persist new vectors as a fresh segment, merging segments once there
+        are more than max_segments. No-op for read-only stores.
+        """
+        if self.read_only or not keys:
+            return
+
+        # Skip stored keys and repeats of the same text within this batch
+        new, seen = [], set()
+        for i, key in enumerate(keys):
+            if key in self._index or key in seen:
+                continue
+            seen.add(key)
+            new.append(i)
+        if not new:
+            return
+
+        key_arr = np.frombuffer(b"".join(keys[i] for i in new), dtype=np.uint8).reshape(len(new), KEY_BYTES)
+        vec_arr = np.ascontiguousarray(vectors[new], dtype=self.dtype)
+        self._write_segment(key_arr, vec_arr)
+        self.refresh()
+
+        if not self.max_segments or len(self._segments) <= self.max_segments:
+            return
+        if self._compact_lock.acquire(blocking=False):
+            try:
+                # Merge everything but the largest segment: the bulk of the store is rewritten
+                # only when the merged small segments outgrow it, not on every merge
+                with self._lock:
+                    by_size = sorted(self._segments, key=lambda seg_id: len(self._segments[seg_id]))
+                self._merge(by_size[:-1])
+            finally:
+                self._compact_lock.release()
+
+    def compact(self) -> None:
+        """Merge all segments into one to keep file count and open maps low."""
+        if self.read_only:
+            raise ValueError("Cannot compact a read-only embedding store")
+
+        self.refresh()
+        with self._compact_lock:
+            self._merge(list(self._segments))
+
+    def _merge(self, seg_ids: list[str]) -> None:
+        # Caller holds _compact_lock
+        with self._lock:
+            # A refresh() may have dropped segments another process merged in the meantime
+            seg_ids = [seg_id for seg_id in seg_ids if seg_id in self._segments]
+            if len(seg_ids) < 2:
+                return
+            merging = set(seg_ids)
+            keys = [key for key, (seg_id, _) in self._index.items() if seg_id in merging]
+            key_arr = np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(len(keys), KEY_BYTES)
+            vec_arr = np.empty((len(keys), self._segments[seg_ids[0]].shape[1]), dtype=self.dtype)
+            for i, key in enumerate(keys):
+                seg_id, row = self._index[key]
+                vec_arr[i] = self._segments[seg_id][row]
+
+        merged_id = self._write_segment(key_arr, vec_arr)
+        # Readers that already mapped the old files keep them alive until they unmap
+        for seg_id in seg_ids:
+            for suffix in (".keys.npy", ".vecs.npy"):
+                try:
+                    os.remove(os.path.join(self.path, seg_id + suffix))
+                except FileNotFoundError:
+                    pass
+
+        # Repoint the merged keys in one step under the lock: lookups see either the old
+        # segments or the merged one, never a key without a segment
+        merged = np.load(os.path.join(self.path, merged_id + ".vecs.npy"), mmap_mode="r")
+        with self._lock:
+            self._segments[merged_id] = merged
+            for row, key in enumerate(keys):
+                self._index[key] = (merged_id, row)
+            for seg_id in seg_ids:
+                # A refresh() since the files were removed may have dropped it already
+                self._segments.pop(seg_id, None)
+
+    def _write_segment(self, key_arr: np.ndarray, vec_arr: np.ndarray) -> str:
+        seg_id = f"seg-{uuid.uuid4().hex}"
+        for suffix, arr in ((".vecs.npy", vec_arr), (".keys.npy", key_arr)):
+            final = os.path.join(self.path, seg_id + suffix)
+            tmp = final + ".tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp, final)
+        return seg_id
+
+
+def open_default_store(model_name: str) -> Optional[EmbeddingStore]:
+    """Open the store configured via EMBEDDING_STORE_DIR, or None if unset."""
+    root = os.environ.get("EMBEDDING_STORE_DIR")
+    if not root:
+        return None
+    return EmbeddingStore(
+        root,
+        model_name,
+        dtype=os.environ.get("EMBEDDING_STORE_DTYPE", "float32"),
+        read_only=os.environ.get("EMBEDDING_STORE_READONLY", "0") == "1",
+        max_segments=int(os.environ.get("EMBEDDING_STORE_MAX_SEGMENTS", "16")),
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or compact an embedding store")
+    parser.add_argument("root", help="Store directory (EMBEDDING_STORE_DIR)")
+    parser.add_argument("model_name", help="Embedding model name, e.g. all-MiniLM-L6-v2")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--compact", action="store_true", help="Merge all segments into one")
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.root, args.model_name, dtype=args.dtype)
+    if args.compact:
+        store.compact()
+    print(f"{store.path}: {len(store)} vectors in {len(store._segments)} segment(s)")
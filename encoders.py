@@ -0,0 +1,74 @@
+"""
+Selectable CPU inference backends for the sentence embedding model.
+
+All backends return a SentenceTransformer-compatible object, so
+embed_chunks/search work unchanged regardless of the choice.
+
+Configuration via environment:
+  EMBEDDING_BACKEND    torch | onnx | int8   (default: torch)
+      torch - stock PyTorch fp32 model
+      onnx  - ONNX Runtime export of the model (needs optimum + onnxruntime)
+      int8  - PyTorch model with Linear layers dynamically quantized to int8
+  EMBEDDING_ONNX_FILE  ONNX file to load for the onnx backend, e.g. a
+                       pre-quantized "onnx/model_qint8_avx512_vnni.onnx"
+"""
+
+import os
+from typing import Optional
+
+from sentence_transformers import SentenceTransformer
+
+BACKENDS = ("torch", "onnx", "int8")
+
+
+def selected_backend(backend: Optional[str] = None) -> str:
+    backend = backend or os.environ.get("EMBEDDING_BACKEND", "torch")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}. Expected one of {', '.join(BACKENDS)}")
+    return backend
+
+
+def encoder_id(model_name: str, backend: Optional[str] = None) -> str:
+    """
+    Identifier of the vectors an encoder produces. Backends do not produce
+    bit-identical embeddings, so caches and stores are namespaced by it.
+    """
+    backend = selected_backend(backend)
+    if backend == "torch":
+        return model_name
+    if backend == "onnx" and os.environ.get("EMBEDDING_ONNX_FILE"):
+        file_stem = os.path.splitext(os.path.basename(os.environ["EMBEDDING_ONNX_FILE"]))[0]
+        return f"{model_name}-onnx-{file_stem}"
+    return f"{model_name}-{backend}"
+
+
+def load_encoder(model_name: str, backend: Optional[str] = None) -> SentenceTransformer:
+    """
+    Load the embedding model with the requested inference backend.
+
+    Args:
+        model_name: Hugging Face model id or local path
+        backend: One of BACKENDS; defaults to EMBEDDING_BACKEND
+
+    Returns:
+        A SentenceTransformer exposing the usual encode() interface
+    """
+    backend = selected_backend(backend)
+
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+
+    if backend == "onnx":
+        onnx_file = os.environ.get("EMBEDDING_ONNX_FILE")
+        model_kwargs = {"file_name": onnx_file} if onnx_file else None
+        # Exports the model to ONNX on first load if the repo has no ONNX file
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs=model_kwargs)
+
+    # int8: dynamic quantization keeps activations in fp32 and only stores
+    # Linear weights as int8, which is where MiniLM spends nearly all its time
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    model = SentenceTransformer(model_name, device="cpu")
+    quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
@@ -0,0 +1,102 @@
+"""
+Bounded worker pools for CPU-bound work called from async endpoints.
+
+PyMuPDF extraction and chunking run in a process pool (pure Python work that
+would otherwise hold the GIL), model encoding and scoring run in a thread
+pool (torch/numpy release the GIL). Both keep the uvicorn event loop free so
+concurrent requests overlap instead of queueing.
+
+The process pools use spawn, and spawn re-imports the __main__ module in
+every worker. Keep __main__ light: run the API as `uvicorn main:app`, not
+as a script that imports the app, or each worker loads FastAPI, torch and
+the embedding stack too.
+
+Configuration via environment:
+  INGEST_PROCESSES  processes for PDF parsing (default: min(4, cpu count))
+  ENCODE_THREADS    threads for encoding/search (default: min(4, cpu count))
+  PDF_EXTRACT_WORKERS  processes for page-sharded extraction of large PDFs
+                       (default: min(4, cpu count); 1 disables sharding)
+"""
+
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+_DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+_lock = threading.Lock()
+_process_pool = None
+_thread_pool = None
+_pdf_page_pool = None
+
+
+def process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    with _lock:
+        if _process_pool is None:
+            # spawn: children import only the parsing modules (and __main__, see above),
+            # not torch or the model
+            _process_pool = ProcessPoolExecutor(
+                max_workers=int(os.environ.get("INGEST_PROCESSES", _DEFAULT_WORKERS)),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    with _lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(
+                max_workers=int(os.environ.get("ENCODE_THREADS", _DEFAULT_WORKERS)),
+                thread_name_prefix="encode",
+            )
+        return _thread_pool
+
+
+def pdf_workers() -> int:
+    return int(os.environ.get("PDF_EXTRACT_WORKERS", _DEFAULT_WORKERS))
+
+
+def pdf_page_pool() -> ProcessPoolExecutor:
+    # Separate from process_pool so the shards of one huge PDF cannot starve
+    # the parse jobs of small uploads
+    global _pdf_page_pool
+    with _lock:
+        if _pdf_page_pool is None:
+            _pdf_page_pool = ProcessPoolExecutor(
+                max_workers=pdf_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pdf_page_pool
+
+
+async def run_in_process(fn, *args, **kwargs):
+    # fn and its arguments must be picklable (module-level functions, plain data)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(process_pool(), functools.partial(fn, *args, **kwargs))
+
+
+async def run_in_thread(fn, *args, **kwargs):
+    # Runs in a copy of the caller's context, so per-request state (metrics spans) follows it
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(thread_pool(), context.run, functools.partial(fn, *args, **kwargs))
+
+
+def shutdown() -> None:
+    global _process_pool, _thread_pool, _pdf_page_pool
+    with _lock:
+        if _pdf_page_pool is not None:
+            _pdf_page_pool.shutdown(cancel_futures=True)
+            _pdf_page_pool = None
+        if _process_pool is not None:
+            _process_pool.shutdown(cancel_futures=True)
+            _process_pool = None
+        if _thread_pool is not None:
+            _thread_pool.shutdown(cancel_futures=True)
+            _thread_pool = None
@@ -1,83 +1,299 @@
+import bisect
+import os
 import fitz  # PyMuPDF
-import requests
-from io import BytesIO
 import re
 from collections import Counter
-from typing import Union
+from typing import Callable, Iterator, NamedTuple, Union
 
-def _extract_pdf_text_from_bytes(pdf_bytes: bytes) -> str:
+import executors
+from downloads import fetch_pdf
+
+# Bump whenever extraction or chunking output changes, so cached documents are rebuilt
+CHUNKER_VERSION = "2"
+
+# Optional chunk limit in embedding-model tokens (0 = character sizing only); the model
+# truncates longer inputs (all-MiniLM-L6-v2: 256 word pieces)
+CHUNK_MAX_TOKENS = int(os.environ.get("CHUNK_MAX_TOKENS", "0"))
+CHUNK_TOKENIZER = os.environ.get("CHUNK_TOKENIZER", "sentence-transformers/all-MiniLM-L6-v2")
+
+_PAGE_LABEL = re.compile(r"\bPage\s*\d+\b", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+# Large PDFs are extracted in page shards on a process pool (see executors.pdf_page_pool)
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "100"))
+
+
+# A PDF given either as raw bytes or as a path on disk
+PdfSource = Union[bytes, os.PathLike]
+
+
+def _open_pdf(source: PdfSource):
+    if isinstance(source, bytes):
+        # fitz opens the bytes object directly; no BytesIO wrapper (and extra copy) needed
+        return fitz.open(stream=source, filetype="pdf")
+    # From a path MuPDF reads pages on demand instead of holding the whole file
+    return fitz.open(os.fspath(source), filetype="pdf")
+
+
+def _extract_page_range(source: PdfSource, start: int, stop: int) -> list:
+    """Non-empty stripped lines of each page in [start, stop)."""
+    pdf = _open_pdf(source)
+    pages_lines = []
+    for page_num in range(start, stop):
+        text = pdf[page_num].get_text("text")
+        pages_lines.append([line.strip() for line in text.split("\n") if line.strip()])
+    pdf.close()
+    return pages_lines
+
+
+def _page_ranges(page_count: int, shards: int) -> list:
+    size = -(-page_count // shards)
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def pdf_page_count(source: PdfSource) -> int:
+    pdf = _open_pdf(source)
+    page_count = pdf.page_count
+    pdf.close()
+    return page_count
+
+
+def uses_sharded_extraction(page_count: int, workers: int = None) -> bool:
+    if workers is None:
+        workers = executors.pdf_workers()
+    return workers > 1 and page_count >= PDF_PARALLEL_MIN_PAGES
+
+
+def _extract_pdf_text_from_bytes(pdf_bytes: bytes, workers: int = None) -> str:
     """Extract text from a PDF given raw bytes, with de-dup of repeated lines."""
-    pdf = fitz.open(stream=BytesIO(pdf_bytes), filetype="pdf")
-    pages_text = []
-    all_lines = []
+    return _extract_pdf_text(pdf_bytes, workers)
+
+
+def _extract_pdf_text(source: PdfSource, workers: int = None) -> str:
+    """Extract text from a PDF (bytes or path), with de-dup of repeated lines."""
+    return _extract_pdf_pages(source, workers)[0]
+
+
+def _extract_pdf_pages(source: PdfSource, workers: int = None) -> tuple:
+    """
+    Like _extract_pdf_text, but also returns the offset in the text at which
+    each page starts (page_starts[i] is page i + 1), for chunk provenance.
+    """
+    page_count = pdf_page_count(source)
+    if workers is None:
+        workers = executors.pdf_workers()
 
     # Collect raw text per page
-    for page in pdf:
-        text = page.get_text("text")
-        lines = [line.strip() for line in text.split("\n") if line.strip()]
-        pages_text.append(lines)
-        all_lines.extend(lines)
-
-    # Detect common lines (avoid boilerplate repeating across pages)
-    line_counts = Counter(all_lines)
+    if uses_sharded_extraction(page_count, workers):
+        # More shards than workers so uneven pages (scans, tables) balance out; map keeps page order.
+        # Path sources are re-opened by each worker; bytes are pickled to it.
+        ranges = _page_ranges(page_count, workers * 2)
+        shards = executors.pdf_page_pool().map(
+            _extract_page_range,
+            [source] * len(ranges),
+            [start for start, _ in ranges],
+            [stop for _, stop in ranges],
+        )
+        pages_text = [lines for shard in shards for lines in shard]
+    else:
+        pages_text = _extract_page_range(source, 0, page_count)
+
+    # Detect common lines (avoid boilerplate repeating across pages); done after the
+    # merge so repeats are found across the whole document, not per shard
+    line_counts = Counter(line for lines in pages_text for line in lines)
     repeated_lines = {line for line, count in line_counts.items() if count > 1}
 
-    cleaned_pages = []
+    # Normalize page by page into one buffer, recording where each page starts in it
+    parts = []
+    page_starts = []
+    offset = 0
     for lines in pages_text:
-        cleaned_lines = [line for line in lines if line not in repeated_lines]
-        cleaned_pages.append(" ".join(cleaned_lines))
+        page_text = " ".join(line for line in lines if line not in repeated_lines)
+        page_text = _PAGE_LABEL.sub("", page_text)
+        page_text = _WHITESPACE.sub(" ", page_text).strip()
+
+        if page_text and parts:
+            parts.append(" ")
+            offset += 1
+        page_starts.append(offset)
+        if page_text:
+            parts.append(page_text)
+            offset += len(page_text)
+
+    return "".join(parts), page_starts
+
 
-    full_text = "\n\n".join(cleaned_pages)
+def _extract_url(url: str, extract):
+    # Streamed to a size-capped temp file over the pooled session, then parsed from the path
+    download = fetch_pdf(url)
+    try:
+        return extract(download.path)
+    finally:
+        download.remove()
 
-    # Normalize
-    full_text = re.sub(r"\bPage\s*\d+\b", "", full_text, flags=re.IGNORECASE)
-    full_text = re.sub(r"\s+", " ", full_text).strip()
 
-    return full_text
+def extract_text_with_pages(source: Union[str, bytes, os.PathLike]) -> tuple:
+    """extract_text plus page start offsets; non-PDF text counts as a single page."""
+    if isinstance(source, (bytes, os.PathLike)):
+        return _extract_pdf_pages(source)
 
+    if isinstance(source, str) and source.strip().lower().startswith(("http://", "https://")):
+        return _extract_url(source.strip(), _extract_pdf_pages)
 
-def extract_text(source: Union[str, bytes]) -> str:
+    return extract_text(source), [0]
+
+
+def extract_text(source: Union[str, bytes, os.PathLike]) -> str:
     """
     Polymorphic extractor:
       - bytes -> treat as PDF bytes
+      - os.PathLike (e.g. pathlib.Path) -> PDF file on disk
       - str starting with http(s) -> download URL as PDF and extract
       - other str -> treat as plain text (already-extracted)
     """
     if isinstance(source, bytes):
         return _extract_pdf_text_from_bytes(source)
 
+    if isinstance(source, os.PathLike):
+        return _extract_pdf_text(source)
+
     if isinstance(source, str):
         s = source.strip()
         # URL to a PDF
         if s.lower().startswith(("http://", "https://")):
-            resp = requests.get(s)
-            resp.raise_for_status()
-            return _extract_pdf_text_from_bytes(resp.content)
+            return _extract_url(s, _extract_pdf_text)
 
         # Fall back to plain text (already extracted)
         return s
 
-    raise TypeError("Unsupported source type for extract_text; expected str or bytes.")
+    raise TypeError("Unsupported source type for extract_text; expected str, bytes or a path.")
+
+
+class ChunkSpan(NamedTuple):
+    start: int     # character offsets into the document text
+    end: int
+    page: int      # 1-based page of the first character
+    page_end: int  # 1-based page of the last character
+
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.?!])\s+")
+
+
+def _sentence_spans(text: str) -> Iterator[tuple]:
+    start = 0
+    for sep in _SENTENCE_BREAK.finditer(text):
+        yield start, sep.start()
+        start = sep.end()
+    if start < len(text):
+        yield start, len(text)
+
+
+def _split_long_span(text: str, start: int, end: int, n_tokens: int, max_tokens: int) -> Iterator[tuple]:
+    # A single sentence over the token limit would be truncated by the model; cut it at
+    # spaces into pieces of proportional character length instead
+    piece = max(1, (end - start) * max_tokens // n_tokens)
+    while end - start > piece:
+        cut = text.rfind(" ", start + 1, start + piece)
+        if cut == -1:
+            cut = start + piece
+        yield start, cut
+        start = cut + 1 if text[cut] == " " else cut
+    yield start, end
+
+
+def iter_chunks(text: str, page_starts: list = None, chunk_size: int = 500, overlap: int = 50,
+                max_tokens: int = None, count_tokens: Callable[[str], int] = None) -> Iterator[ChunkSpan]:
+    """
+    Sentence-packing chunker over character offsets into a single text buffer.
+
+    Chunks are yielded as soon as they are complete, in one linear pass and
+    without building intermediate strings; each previous chunk contributes
+    its last `overlap` characters to the next one.
 
+    Args:
+        text: Document text
+        page_starts: Offset of each page in text (from extract_text_with_pages)
+        chunk_size: Maximum chunk length in characters (a longer sentence stays whole)
+        overlap: Characters carried over from the previous chunk
+        max_tokens: Optional additional limit in embedding-model tokens
+        count_tokens: Token counter for max_tokens (default: CHUNK_TOKENIZER)
+    """
+    if max_tokens and count_tokens is None:
+        count_tokens = token_counter()
+    page_starts = page_starts or [0]
+
+    def span(start, end):
+        return ChunkSpan(
+            start,
+            end,
+            bisect.bisect_right(page_starts, start),
+            bisect.bisect_right(page_starts, end - 1),
+        )
+
+    def sentences():
+        for start, end in _sentence_spans(text):
+            if not max_tokens:
+                yield start, end, 0
+                continue
+            n_tokens = count_tokens(text[start:end])
+            if n_tokens <= max_tokens:
+                yield start, end, n_tokens
+                continue
+            for piece_start, piece_end in _split_long_span(text, start, end, n_tokens, max_tokens):
+                yield piece_start, piece_end, count_tokens(text[piece_start:piece_end])
+
+    chunk_start = chunk_end = None
+    chunk_tokens = 0
+    for start, end, n_tokens in sentences():
+        if chunk_start is None:
+            chunk_start, chunk_end, chunk_tokens = start, end, n_tokens
+            continue
+
+        too_long = (chunk_end - chunk_start) + (end - start) + 1 > chunk_size
+        if max_tokens:
+            too_long = too_long or chunk_tokens + n_tokens > max_tokens
+        if not too_long:
+            chunk_end = end
+            chunk_tokens += n_tokens
+            continue
+
+        yield span(chunk_start, chunk_end)
+
+        # Start the next chunk with the tail of this one
+        next_start = max(chunk_start, chunk_end - overlap) if overlap > 0 else start
+        while next_start < start and text[next_start].isspace():
+            next_start += 1
+        chunk_tokens = n_tokens
+        if max_tokens and next_start < start:
+            chunk_tokens += count_tokens(text[next_start:chunk_end])
+            if chunk_tokens > max_tokens:
+                # Overlap plus sentence would not fit the model; drop the overlap
+                next_start, chunk_tokens = start, n_tokens
+        chunk_start, chunk_end = next_start, end
+
+    if chunk_start is not None and chunk_end > chunk_start:
+        yield span(chunk_start, chunk_end)
 
-def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50):
-    sentences = re.split(r"(?<=[.?!])\s+", text)
-    chunks = []
-    current_chunk = ""
 
+def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50, max_tokens: int = None):
     # performs chunking with ~10% overlaps (controlled by 'overlap' param)
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) + 1 > chunk_size:
-            chunks.append(current_chunk.strip())
-            if overlap > 0 and chunks[-1]:
-                overlap_text = chunks[-1][-overlap:]
-                current_chunk = (overlap_text + " " + sentence).strip()
-            else:
-                current_chunk = sentence
-        else:
-            current_chunk = (current_chunk + " " + sentence).strip()
-
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-
-    return chunks
+    return [text[c.start:c.end] for c in iter_chunks(text, None, chunk_size, overlap, max_tokens)]
+
+
+_token_counter = None
+
+
+def token_counter() -> Callable[[str], int]:
+    """
+    Token counter of the embedding model's tokenizer (CHUNK_TOKENIZER), loaded
+    with the lightweight `tokenizers` package so parse workers never import torch.
+    """
+    global _token_counter
+    if _token_counter is None:
+        from tokenizers import Tokenizer
+
+        tokenizer = Tokenizer.from_pretrained(CHUNK_TOKENIZER)
+        tokenizer.no_truncation()
+        _token_counter = lambda s: len(tokenizer.encode(s, add_special_tokens=False).ids)
+    return _token_counter
@@ -0,0 +1,98 @@
+"""
+On-disk cache of RFP extraction results, so re-running rfp_processor over
+a folder only sends new or modified documents to the LLM.
+
+Entries are keyed by the SHA-256 of the file content and a namespace
+covering everything else the result depends on: the expected fields, the
+prompt version, the model and the long-document settings (see
+RFPExtractor.cache_namespace). Renaming or moving a file keeps its entry;
+changing a single byte of it, or any of those settings, misses.
+
+Configuration via environment:
+  RFP_CACHE_PATH  SQLite file of the cache (default: rfp_extraction_cache.sqlite3)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+DEFAULT_PATH = "rfp_extraction_cache.sqlite3"
+
+
+def file_sha256(path: str, chunk_bytes: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_bytes), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extraction_key(content_sha256: str, namespace: str) -> str:
+    return hashlib.sha256(f"{namespace}\0{content_sha256}".encode()).hexdigest()
+
+
+class ExtractionCache:
+    """
+    extracted_fields per (file content, extraction settings) in a SQLite file.
+
+    Args:
+        path: SQLite file; created on first use
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.environ.get("RFP_CACHE_PATH", DEFAULT_PATH)
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY,
+                content_sha256 TEXT NOT NULL,
+                document_name TEXT NOT NULL,
+                fields TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT fields FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE extractions SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, content_sha256: str, document_name: str, fields: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?, ?, ?)",
+                (key, content_sha256, document_name, json.dumps(fields, ensure_ascii=False), now, now),
+            )
+            self.stored += 1
+
+    def purge(self) -> int:
+        """Delete every entry; returns how many there were."""
+        with self._lock:
+            return self._conn.execute("DELETE FROM extractions").rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "stored": self.stored, "entries": len(self)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
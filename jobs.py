@@ -0,0 +1,228 @@
+"""
+Asynchronous batch jobs: many documents, each with many questions.
+
+A submitted job is split into one item per document and queued on a local
+asyncio work queue. A fixed pool of worker tasks takes items off the
+queue, loads each document once (through the document cache, so a PDF
+that appears in several items or jobs is parsed and embedded once) and
+answers its questions in groups. Groups of all workers share one
+semaphore, which bounds the number of pipelines talking to the LLM at the
+same time however many jobs are queued.
+
+Jobs live in memory and are dropped JOB_TTL seconds after they finish.
+
+Configuration via environment:
+  JOB_WORKERS             documents processed concurrently (default: 4)
+  JOB_LLM_CONCURRENCY     question groups in flight toward the LLM (default: 4)
+  JOB_QUESTIONS_PER_CALL  questions answered per LLM answer call (default: 10)
+  JOB_MAX_PENDING         queued documents before submissions are refused (default: 1000)
+  JOB_TTL                 seconds finished jobs are kept for polling (default: 3600)
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobItem:
+    """
+    One document of a job and its questions.
+
+    source is what the document loader understands (a URL, or a spooled
+    upload); answers and error are filled in by the worker.
+    """
+
+    __slots__ = ("index", "name", "source", "questions", "status", "answers", "error", "seconds")
+
+    def __init__(self, index: int, name: str, source, questions: list[str]):
+        self.index = index
+        self.name = name
+        self.source = source
+        self.questions = questions
+        self.status = QUEUED
+        self.answers: Optional[list[str]] = None
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "document": self.name,
+            "status": self.status,
+            "questions": self.questions,
+            "answers": self.answers,
+            "error": self.error,
+            "seconds": self.seconds,
+        }
+
+
+class Job:
+    __slots__ = ("id", "items", "created", "finished", "remaining")
+
+    def __init__(self, items: list[JobItem]):
+        self.id = uuid.uuid4().hex
+        self.items = items
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.remaining = len(items)
+
+    @property
+    def status(self) -> str:
+        if self.remaining:
+            return RUNNING if any(item.status != QUEUED for item in self.items) else QUEUED
+        return FAILED if all(item.status == FAILED for item in self.items) else DONE
+
+    def summary(self) -> dict:
+        counts = {state: 0 for state in (QUEUED, RUNNING, DONE, FAILED)}
+        for item in self.items:
+            counts[item.status] += 1
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "documents": len(self.items),
+            "questions": sum(len(item.questions) for item in self.items),
+            "items": counts,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+    def results(self) -> dict:
+        return {**self.summary(), "results": [item.to_dict() for item in self.items]}
+
+
+class QueueFull(Exception):
+    pass
+
+
+# (item) -> document with .chunks/.embeddings/.index/.key, e.g. doc_cache.CachedDocument
+DocumentLoader = Callable[[JobItem], Awaitable[object]]
+# (document, questions) -> list of answers
+Answerer = Callable[[object, list[str]], Awaitable[list[str]]]
+# (item) -> None; releases the item's source (e.g. removes a spooled upload)
+Releaser = Callable[[JobItem], None]
+
+
+class JobQueue:
+    """
+    Work queue plus worker pool for batch jobs.
+
+    Args:
+        load_document: Coroutine loading the document of an item
+        answer: Coroutine answering a group of questions on a loaded document
+        release: Called once an item is processed, successfully or not
+    """
+
+    def __init__(self, load_document: DocumentLoader, answer: Answerer, release: Releaser = None):
+        self.load_document = load_document
+        self.answer = answer
+        self.release = release
+        self.workers = int(os.environ.get("JOB_WORKERS", "4"))
+        self.llm_concurrency = int(os.environ.get("JOB_LLM_CONCURRENCY", "4"))
+        self.questions_per_call = int(os.environ.get("JOB_QUESTIONS_PER_CALL", "10"))
+        self.max_pending = int(os.environ.get("JOB_MAX_PENDING", "1000"))
+        self.ttl = float(os.environ.get("JOB_TTL", "3600"))
+
+        self.jobs: dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._llm_slots: Optional[asyncio.Semaphore] = None
+        self._tasks: list[asyncio.Task] = []
+
+    def _ensure_started(self) -> None:
+        # Created lazily on the serving loop, so the queue works however the app was started
+        if self._tasks and not any(task.done() for task in self._tasks):
+            return
+        self._queue = self._queue or asyncio.Queue()
+        self._llm_slots = self._llm_slots or asyncio.Semaphore(self.llm_concurrency)
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    def submit(self, items: list[JobItem]) -> Job:
+        """
+        Queue a job; raises QueueFull when the backlog is already at JOB_MAX_PENDING.
+        """
+        self._ensure_started()
+        self._prune()
+        if self._queue.qsize() + len(items) > self.max_pending:
+            raise QueueFull(f"Job queue is full ({self._queue.qsize()} documents pending)")
+
+        job = Job(items)
+        self.jobs[job.id] = job
+        for item in items:
+            self._queue.put_nowait((job, item))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def stats(self) -> dict:
+        return {
+            "jobs": len(self.jobs),
+            "pending_documents": self._queue.qsize() if self._queue is not None else 0,
+            "workers": len(self._tasks),
+            "llm_concurrency": self.llm_concurrency,
+        }
+
+    def _prune(self) -> None:
+        now = time.time()
+        expired = [job_id for job_id, job in self.jobs.items() if job.finished and now - job.finished > self.ttl]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job, item = await self._queue.get()
+            try:
+                await self._process(item)
+            finally:
+                job.remaining -= 1
+                if not job.remaining:
+                    job.finished = time.time()
+                self._queue.task_done()
+
+    async def _process(self, item: JobItem) -> None:
+        item.status = RUNNING
+        start = time.perf_counter()
+        try:
+            doc = await self.load_document(item)
+
+            # The document is loaded once; its question groups then run concurrently,
+            # each holding one LLM slot for its whole retrieval + answer pipeline
+            groups = [
+                item.questions[i:i + self.questions_per_call]
+                for i in range(0, len(item.questions), self.questions_per_call)
+            ]
+            answers = await asyncio.gather(*(self._answer_group(doc, group) for group in groups))
+            item.answers = [answer for group in answers for answer in group]
+            item.status = DONE
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            item.error = getattr(e, "detail", None) or str(e) or type(e).__name__
+            item.status = FAILED
+        finally:
+            item.seconds = time.perf_counter() - start
+            if self.release is not None:
+                self.release(item)
+
+    async def _answer_group(self, doc, questions: list[str]) -> list[str]:
+        async with self._llm_slots:
+            return await self.answer(doc, questions)
+
+    async def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Items that never ran still hold their sources (spooled uploads)
+        while self._queue is not None and not self._queue.empty():
+            _, item = self._queue.get_nowait()
+            if self.release is not None:
+                self.release(item)
@@ -0,0 +1,280 @@
+"""
+Process-wide pooled Groq client shared by query.py and RFPExtractor.
+
+One keep-alive connection pool per process (instead of a fresh client, TLS
+handshake and connection per request), explicit timeouts, retry with
+jittered exponential backoff on 429/5xx and connection errors, and per-call
+latency and token stats. Every prompt is measured locally before it is sent
+(see token_count) and rejected without a round-trip if it cannot fit.
+
+Configuration via environment:
+  GROQ_TIMEOUT          read timeout in seconds (default: 60)
+  GROQ_CONNECT_TIMEOUT  connect timeout in seconds (default: 5)
+  GROQ_MAX_CONNECTIONS  pooled connections per client (default: 20)
+  GROQ_MAX_RETRIES      retries after the first attempt (default: 4)
+  GROQ_BACKOFF_BASE     first backoff ceiling in seconds (default: 0.5)
+  GROQ_BACKOFF_MAX      backoff ceiling in seconds (default: 20)
+  GROQ_BASE_URL         API endpoint override (read by the groq SDK)
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Optional
+
+import groq
+import httpx
+from groq import AsyncGroq, Groq
+
+from executors import run_in_thread
+from rate_limiter import RateLimiter
+from token_count import PromptTooLarge, count_message_tokens, prompt_limit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    # Honour the server's Retry-After hint on 429/503 when it sends one
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_rate_limit(error: Exception) -> bool:
+    return isinstance(error, groq.APIStatusError) and error.status_code == 429
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, groq.APIConnectionError):  # includes timeouts
+        return True
+    if isinstance(error, groq.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class CallStats:
+    """Latency and outcome counters for one call label."""
+
+    def __init__(self, window: int = 1000):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.max_prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = deque(maxlen=window)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.latencies)
+
+        def pct(p: float) -> float:
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else 0.0
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "mean_s": sum(ordered) / len(ordered) if ordered else 0.0,
+            "p50_s": pct(0.50),
+            "p95_s": pct(0.95),
+            "max_s": ordered[-1] if ordered else 0.0,
+        }
+
+
+_stats: dict[str, CallStats] = {}
+_stats_lock = threading.Lock()
+
+
+def _record(label: str, start: float, attempts: int, failed: bool, prompt_tokens: int = 0,
+            completion=None) -> None:
+    # Streams report no usage up front; their completion tokens are not counted
+    usage = getattr(completion, "usage", None)
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    with _stats_lock:
+        stats = _stats.setdefault(label, CallStats())
+        stats.calls += 1
+        stats.retries += attempts - 1
+        stats.prompt_tokens += prompt_tokens
+        stats.max_prompt_tokens = max(stats.max_prompt_tokens, prompt_tokens)
+        stats.completion_tokens += completion_tokens
+        if failed:
+            stats.errors += 1
+        else:
+            stats.latencies.append(time.perf_counter() - start)
+    if not failed:
+        logger.info(
+            "llm call label=%s prompt_tokens=%d reported_prompt_tokens=%s completion_tokens=%d attempts=%d",
+            label, prompt_tokens, getattr(usage, "prompt_tokens", None), completion_tokens, attempts,
+        )
+
+
+def _preflight(messages: list[dict], model: str, label: str, kwargs: dict) -> int:
+    # Measure the prompt locally; one that cannot fit fails here instead of at the API
+    prompt_tokens = count_message_tokens(messages, model)
+    reserve = kwargs.get("max_completion_tokens") or kwargs.get("max_tokens") or 1024
+    limit = prompt_limit(model, reserve)
+    if prompt_tokens > limit:
+        _record(label, time.perf_counter(), 1, failed=True, prompt_tokens=prompt_tokens)
+        raise PromptTooLarge(prompt_tokens, limit, model)
+    return prompt_tokens
+
+
+class LLMClient:
+    """
+    Pooled sync + async Groq chat-completions client with retries and stats.
+
+    Args:
+        api_key: Groq API key. If not provided, will use GROQ_API_KEY from environment.
+    """
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key or os.environ.get('GROQ_API_KEY')
+        if not self.api_key:
+            raise ValueError("GROQ_API_KEY must be provided or set in environment variables")
+
+        self.timeout = httpx.Timeout(
+            float(os.environ.get("GROQ_TIMEOUT", "60")),
+            connect=float(os.environ.get("GROQ_CONNECT_TIMEOUT", "5")),
+        )
+        max_connections = int(os.environ.get("GROQ_MAX_CONNECTIONS", "20"))
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=60,
+        )
+        self.max_retries = int(os.environ.get("GROQ_MAX_RETRIES", "4"))
+        self.backoff_base = float(os.environ.get("GROQ_BACKOFF_BASE", "0.5"))
+        self.backoff_max = float(os.environ.get("GROQ_BACKOFF_MAX", "20"))
+
+        self._lock = threading.Lock()
+        self._sync_client: Optional[Groq] = None
+        # httpx.AsyncClient is bound to the loop it was first used on: one per loop,
+        # dropped with the loop (close_async on the loop closes its connections)
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncGroq]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def sync_client(self) -> Groq:
+        with self._lock:
+            if self._sync_client is None:
+                self._sync_client = Groq(
+                    api_key=self.api_key,
+                    max_retries=0,  # retries are handled here, with jitter
+                    http_client=httpx.Client(timeout=self.timeout, limits=self.limits),
+                )
+            return self._sync_client
+
+    @property
+    def async_client(self) -> AsyncGroq:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = self._async_clients[loop] = AsyncGroq(
+                    api_key=self.api_key,
+                    max_retries=0,
+                    http_client=httpx.AsyncClient(timeout=self.timeout, limits=self.limits),
+                )
+            return client
+
+    async def close_async(self) -> None:
+        """Close the running loop's async client and its connections (call before the loop ends)."""
+        with self._lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        # Full jitter: uniform in [0, min(max, base * 2^attempt)], never below Retry-After
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        hint = _retry_after(error)
+        return max(delay, min(hint, self.backoff_max)) if hint is not None else delay
+
+    def create(self, messages: list[dict], model: str = DEFAULT_MODEL, label: str = "chat",
+               limiter: Optional[RateLimiter] = None, **kwargs):
+        """
+        Blocking chat completion with retries. Returns the groq completion object.
+        With a limiter, every attempt first waits for request/token capacity and
+        429s and completion sizes are reported back to it.
+        """
+        prompt_tokens = _preflight(messages, model, label, kwargs)
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                if limiter is not None:
+                    limiter.acquire(limiter.estimate(prompt_tokens))
+                completion = self.sync_client.chat.completions.create(messages=messages, model=model, **kwargs)
+                _record(label, start, attempt + 1, failed=False, prompt_tokens=prompt_tokens, completion=completion)
+                if limiter is not None:
+                    limiter.record(getattr(getattr(completion, "usage", None), "completion_tokens", None))
+                return completion
+            except Exception as e:
+                if limiter is not None and _is_rate_limit(e):
+                    limiter.rate_limited(_retry_after(e))
+                if attempt == self.max_retries or not _is_retryable(e):
+                    _record(label, start, attempt + 1, failed=True, prompt_tokens=prompt_tokens)
+                    raise
+                time.sleep(self._backoff(attempt, e))
+
+    async def acreate(self, messages: list[dict], model: str = DEFAULT_MODEL, label: str = "chat", **kwargs):
+        """
+        Async chat completion with retries. With stream=True the retries cover
+        opening the stream and the latency is time to the response headers.
+        """
+        # Tokenizing a long prompt (or loading the tokenizer) must not stall the event loop
+        prompt_tokens = await run_in_thread(_preflight, messages, model, label, kwargs)
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                completion = await self.async_client.chat.completions.create(messages=messages, model=model, **kwargs)
+                _record(label, start, attempt + 1, failed=False, prompt_tokens=prompt_tokens, completion=completion)
+                return completion
+            except Exception as e:
+                if attempt == self.max_retries or not _is_retryable(e):
+                    _record(label, start, attempt + 1, failed=True, prompt_tokens=prompt_tokens)
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+
+
+_clients: dict[str, LLMClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: Optional[str] = None) -> LLMClient:
+    """Return the process-wide client for an API key (GROQ_API_KEY by default)."""
+    key = api_key or os.environ.get('GROQ_API_KEY')
+    if not key:
+        raise ValueError("GROQ_API_KEY must be provided or set in environment variables")
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = LLMClient(key)
+        return _clients[key]
+
+
+async def close_async_clients() -> None:
+    """Close the running loop's async client of every shared client."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    for client in clients:
+        await client.close_async()
+
+
+def llm_stats() -> dict:
+    """Per-label latency stats of all LLM calls made by this process."""
+    with _stats_lock:
+        return {label: stats.snapshot() for label, stats in _stats.items()}
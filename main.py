@@ -1,22 +1,45 @@
 # main.py
+# Run with `uvicorn main:app` (`python main.py` hands over to it). The parse worker pools
+# use spawn, which re-imports the __main__ module in every worker: started as a plain
+# script this module, with FastAPI and the embedding stack, would load into each of them.
 import os
+import sys
 from fastapi import FastAPI, Header, HTTPException, Body, File, UploadFile, Form
 import json
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from typing import List
-import uvicorn
 
-from parse_chunks import parse_chunk
-from query import query_llm
+import requests
+
+import executors
+from answer_cache import answer_cache
+from doc_cache import digest_key, document_cache, load_document_async
+from downloads import DownloadTooLarge, NotAPdf, fetch_pdf, url_validators
+from embedding import get_model
+from executors import run_in_thread
+from llm_client import close_async_clients, llm_stats
+from metrics import ServerTimingMiddleware, render_metrics, span
+from query import answer_questions_async, stream_answers
+from jobs import JobItem, JobQueue, QueueFull
+from uploads import (
+    MAX_BATCH_UPLOAD_BYTES, MAX_UPLOAD_BYTES, SpooledUpload, UploadLimitMiddleware, UploadTooLarge, spool_upload,
+)
 
 load_dotenv()
 
 app = FastAPI()
 
+# Cap upload bodies while they arrive: Starlette has the whole multipart body spooled before an endpoint runs
+app.add_middleware(UploadLimitMiddleware, limits={
+    "/hackrx/run-file": MAX_UPLOAD_BYTES,
+    "/hackrx/run-file/stream": MAX_UPLOAD_BYTES,
+    "/hackrx/jobs/files": MAX_BATCH_UPLOAD_BYTES,
+})
+
 # Allow your HTML/JS to call the API
 app.add_middleware(
     CORSMiddleware,
@@ -24,7 +47,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# Per-stage timings of each request in a Server-Timing header (and as histograms on /metrics)
+app.add_middleware(ServerTimingMiddleware)
 
 # Serve the /static path and an index.html at /
 app.mount("/static", StaticFiles(directory="public"), name="static")
@@ -35,30 +61,38 @@ class RequestData(BaseModel):
     questions: List[str]
 
 
+class BatchRequest(BaseModel):
+    items: List[RequestData]
+
+
+@app.on_event("startup")
+async def load_model():
+    # The embedding model loads on first use; load it now so no request waits for it
+    await run_in_thread(get_model)
+
+
+@app.on_event("shutdown")
+async def shutdown_pools():
+    # Stop the batch workers and the parsing/encoding worker pools with the server
+    await job_queue.shutdown()
+    executors.shutdown()
+    await close_async_clients()
+
+
 @app.get("/")
 async def home():
     # Sample page
     return {'hello': 'world'}
 
 
-@app.post("/hackrx/run-file")
-async def run_file(
-    file: UploadFile = File(...),
-    questions_json: str = Form(...),
-    header: str = Header(None, alias="Authorization"),
-):
+def check_auth(header: str):
     # Authorization check
     auth = os.environ["HACKRX_API_KEY"]
     if not header or header != f"{auth}":
         raise HTTPException(status_code=401, detail="UNAUTHORIZED")
 
-    # Basic validation
-    if file.content_type not in ("application/pdf",):
-        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
-
-    # Read the uploaded PDF into memory (bytes)
-    pdf_bytes = await file.read()
 
+def parse_questions(questions_json: str) -> List[str]:
     # Convert questions JSON string -> list[str]
     try:
         questions = json.loads(questions_json)
@@ -66,13 +100,251 @@ async def run_file(
             raise ValueError
     except Exception:
         raise HTTPException(status_code=400, detail="questions_json must be a JSON array of strings")
+    return questions
+
+
+async def read_upload(file: UploadFile, questions_json: str, header: str):
+    check_auth(header)
+
+    # Basic validation
+    if file.content_type not in ("application/pdf",):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+
+    questions = parse_questions(questions_json)
+
+    # Copy the upload to a named temp file the parse workers can open, hashing it on the way
+    try:
+        with span("upload"):
+            upload = await spool_upload(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    # Repeat uploads of the same PDF skip parsing/embedding and go straight to retrieval.
+    # Parsing/encoding run on worker pools and the LLM calls are async, so the event loop stays free.
+    try:
+        with span("document"):
+            doc = await load_document_async(upload.path, digest_key(upload.sha256))
+    finally:
+        upload.remove()
+    return doc, questions
+
+
+def _is_cached(sha256: str) -> bool:
+    return digest_key(sha256) in document_cache
+
+
+async def download_url(url: str, is_current=None):
+    try:
+        with span("download"):
+            return await run_in_thread(fetch_pdf, url, is_current)
+    except DownloadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except NotAPdf as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except requests.RequestException as e:
+        raise HTTPException(status_code=502, detail=f"Could not download document: {e}")
+
+
+async def read_url(url: str):
+    url = url.strip()
+    if not url.lower().startswith(("http://", "https://")):
+        raise HTTPException(status_code=400, detail="documents must be an http(s) URL of a PDF")
+
+    # Pooled, size-capped streaming download; a URL whose document is still cached is only
+    # revalidated (If-None-Match / If-Modified-Since) and a 304 skips download and parsing
+    download = await download_url(url, _is_cached)
+
+    key = digest_key(download.sha256)
+    if download.not_modified:
+        doc = document_cache.get(key)
+        if doc is not None:
+            return doc
+        # Evicted since the revalidation; fetch it again unconditionally
+        download = await download_url(url)
+        key = digest_key(download.sha256)
+
+    try:
+        with span("document"):
+            return await load_document_async(download.path, key)
+    finally:
+        download.remove()
+
+
+@app.post("/hackrx/run")
+async def run(
+    data: RequestData,
+    header: str = Header(None, alias="Authorization"),
+):
+    check_auth(header)
+
+    doc = await read_url(data.documents)
+
+    return await answer_questions_async(doc.chunks, doc.embeddings, data.questions, index=doc.index, doc_key=doc.key)
+
+
+@app.post("/hackrx/run-file")
+async def run_file(
+    file: UploadFile = File(...),
+    questions_json: str = Form(...),
+    header: str = Header(None, alias="Authorization"),
+):
+    doc, questions = await read_upload(file, questions_json, header)
+
+    return await answer_questions_async(doc.chunks, doc.embeddings, questions, index=doc.index, doc_key=doc.key)
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/hackrx/run-file/stream")
+async def run_file_stream(
+    file: UploadFile = File(...),
+    questions_json: str = Form(...),
+    header: str = Header(None, alias="Authorization"),
+):
+    """
+    Server-Sent Events variant of /hackrx/run-file: emits one `answer` event
+    per answer as soon as its tokens arrive from the LLM, then `done`.
+    """
+    doc, questions = await read_upload(file, questions_json, header)
+
+    async def events():
+        count = 0
+        try:
+            async for answer in stream_answers(doc.chunks, doc.embeddings, questions, index=doc.index, doc_key=doc.key):
+                yield sse_event("answer", {"index": count, "answer": answer})
+                count += 1
+            yield sse_event("done", {"count": count})
+        except Exception as e:
+            # Headers are already sent, so errors are reported in-band
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def load_job_document(item: JobItem):
+    if isinstance(item.source, SpooledUpload):
+        return await load_document_async(item.source.path, digest_key(item.source.sha256))
+    return await read_url(item.source)
+
+
+async def answer_job_questions(doc, questions: List[str]) -> List[str]:
+    result = await answer_questions_async(doc.chunks, doc.embeddings, questions, index=doc.index, doc_key=doc.key)
+    return result["answers"]
+
+
+def release_job_item(item: JobItem):
+    if isinstance(item.source, SpooledUpload):
+        item.source.remove()
+
+
+job_queue = JobQueue(load_job_document, answer_job_questions, release_job_item)
+
+
+def submit_job(items: List[JobItem]):
+    try:
+        job = job_queue.submit(items)
+    except QueueFull as e:
+        for item in items:
+            release_job_item(item)
+        raise HTTPException(status_code=429, detail=str(e))
+    return job.summary()
+
+
+@app.post("/hackrx/jobs")
+async def create_job(
+    batch: BatchRequest,
+    header: str = Header(None, alias="Authorization"),
+):
+    """
+    Submit many (document URL, questions) pairs at once. Returns a job id
+    right away; poll /hackrx/jobs/{job_id} and fetch /hackrx/jobs/{job_id}/results.
+    """
+    check_auth(header)
+    if not batch.items:
+        raise HTTPException(status_code=400, detail="items must not be empty")
+
+    items = [JobItem(i, item.documents, item.documents, item.questions) for i, item in enumerate(batch.items)]
+    return submit_job(items)
+
+
+@app.post("/hackrx/jobs/files")
+async def create_file_job(
+    files: List[UploadFile] = File(...),
+    questions_json: str = Form(...),
+    header: str = Header(None, alias="Authorization"),
+):
+    # Batch variant of /hackrx/run-file: the same questions are asked of every uploaded PDF
+    check_auth(header)
+    if any(file.content_type not in ("application/pdf",) for file in files):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    questions = parse_questions(questions_json)
+
+    # Uploads are spooled now and removed by the worker once their item is processed
+    items = []
+    try:
+        for i, file in enumerate(files):
+            items.append(JobItem(i, file.filename, await spool_upload(file), questions))
+    except UploadTooLarge as e:
+        for item in items:
+            release_job_item(item)
+        raise HTTPException(status_code=413, detail=str(e))
+    return submit_job(items)
+
+
+@app.get("/hackrx/jobs")
+async def job_queue_stats(header: str = Header(None, alias="Authorization")):
+    check_auth(header)
+    return job_queue.stats()
+
+
+def get_job(job_id: str, header: str):
+    check_auth(header)
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id")
+    return job
+
+
+@app.get("/hackrx/jobs/{job_id}")
+async def job_status(job_id: str, header: str = Header(None, alias="Authorization")):
+    return get_job(job_id, header).summary()
+
+
+@app.get("/hackrx/jobs/{job_id}/results")
+async def job_results(job_id: str, header: str = Header(None, alias="Authorization")):
+    # Finished items carry their answers (or error) while the rest of the job is still running
+    return get_job(job_id, header).results()
+
+
+@app.get("/hackrx/cache")
+async def cache_stats():
+    # Hit/miss counters of the parsed-document cache, URL revalidation and the answer cache
+    return {
+        **document_cache.stats(),
+        "urls": url_validators.stats(),
+        "answers": answer_cache.stats() if answer_cache is not None else None,
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus scrape endpoint: stage and request latency histograms, item counters
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
-    # Let your existing parser handle bytes/text
-    # (see small tweak to parse_chunk below)
-    chunks = parse_chunk(pdf_bytes)
 
-    return query_llm(chunks, questions)
+@app.get("/hackrx/llm")
+async def llm_call_stats():
+    # Per-call latency/retry stats of the shared Groq client
+    return llm_stats()
 
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    # Replace this process with the uvicorn CLI, so the pools' workers re-import its small
+    # __main__ instead of this module (see the note at the top)
+    os.execv(sys.executable, [sys.executable, "-m", "uvicorn", "main:app", "--host", "0.0.0.0", "--port", "8000", "--reload"])
\ No newline at end of file
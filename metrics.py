@@ -0,0 +1,178 @@
+"""
+Per-stage timing spans, Prometheus histograms and Server-Timing headers.
+
+Code wraps a pipeline stage in `with span("encode"):`. Every span is
+observed in the process-wide stage_seconds histogram (served on /metrics
+in the Prometheus text format) and, while a request is being handled, is
+also collected for that request, so ServerTimingMiddleware can report
+where its time went in a Server-Timing header.
+
+Spans recorded inside process-pool workers are not visible to the parent;
+such work runs under collect_spans() in the worker and the returned spans
+are replayed in the parent with record_spans().
+"""
+
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, math.inf)
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple, buckets: tuple = BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple((name, labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [bucket counts..., sum, count]
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = "+Inf" if bound == math.inf else repr(float(bound))
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', le),))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple((name, labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+stage_seconds = Histogram("hackrx_stage_seconds", "Duration of pipeline stages.", ("stage",))
+request_seconds = Histogram(
+    "hackrx_request_seconds", "Duration of HTTP requests until the response starts.", ("method", "path", "status")
+)
+items_total = Counter("hackrx_items_total", "Work items processed by pipeline stages.", ("kind",))
+
+_registry = (stage_seconds, request_seconds, items_total)
+
+# Spans of the request (or collect_spans block) being handled; None outside of one
+_request_spans: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_spans", default=None)
+
+
+def record_spans(spans: list[tuple[str, float]]) -> None:
+    """Observe (stage, seconds) pairs measured elsewhere, e.g. in a worker process."""
+    collected = _request_spans.get()
+    for name, seconds in spans:
+        stage_seconds.observe(seconds, stage=name)
+        if collected is not None:
+            collected.append((name, seconds))
+
+
+@contextmanager
+def span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_spans([(name, time.perf_counter() - start)])
+
+
+def count(kind: str, amount: int) -> None:
+    items_total.inc(amount, kind=kind)
+
+
+@contextmanager
+def collect_spans():
+    """Collect the spans recorded in the block into the yielded list (they are still observed)."""
+    spans = []
+    token = _request_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _request_spans.reset(token)
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+def server_timing(spans: list[tuple[str, float]]) -> str:
+    # Repeated stages (e.g. several LLM calls) are summed, in first-seen order
+    totals: dict[str, float] = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={1000 * seconds:.1f}" for name, seconds in totals.items())
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware: collects the spans of each HTTP request, adds them as a
+    Server-Timing header and observes the request duration. Streaming
+    responses report the spans recorded before their first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        spans = []
+        token = _request_spans.set(spans)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                route = scope.get("route")
+                path = getattr(route, "path", None) or "unmatched"
+                request_seconds.observe(elapsed, method=scope["method"], path=path, status=message["status"])
+                header = server_timing(spans + [("total", elapsed)])
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_spans.reset(token)
@@ -1,26 +1,43 @@
-from extract_chunk_support import extract_text, chunk_text
-import json
+from bm25 import BM25Index
+from chunk_table import ChunkTable
+from extract_chunk_support import (
+    CHUNK_MAX_TOKENS, extract_text_with_pages, iter_chunks, pdf_page_count, uses_sharded_extraction
+)
+from metrics import collect_spans, span
+import os
 from typing import Union
 
-def parse_chunk(document: Union[str, bytes], file_name: str = "Insurance") -> str:
+def parse_chunk(document: Union[str, bytes, os.PathLike], file_name: str = "Insurance") -> ChunkTable:
     """
     Accepts:
-      - bytes: raw PDF bytes (from file upload)
+      - bytes: raw PDF bytes
+      - os.PathLike: PDF file on disk (from a spooled upload)
       - str:   http(s) URL to a PDF OR plain text
     Returns:
-      - JSON string of chunk objects (same shape as before)
+      - ChunkTable of the document (ChunkTable.to_json() gives the old JSON chunk objects),
+        with its BM25 index unless BM25_INDEX=0
     """
-    text = extract_text(document)
-    chunks = chunk_text(text)
+    with span("extract"):
+        text, page_starts = extract_text_with_pages(document)
+    with span("chunk"):
+        table = ChunkTable.from_spans(text, iter_chunks(text, page_starts, max_tokens=CHUNK_MAX_TOKENS or None), file_name)
+    if os.environ.get("BM25_INDEX", "1") != "0":
+        with span("bm25_index"):
+            table.bm25 = BM25Index(table.texts())
+    return table
 
-    json_chunks = []
-    for i, item in enumerate(chunks):
-        json_chunks.append(
-            {
-                "file_name": file_name,
-                "chunk_id": i,
-                "text": item,
-            }
-        )
 
-    return json.dumps(json_chunks)
+def parse_chunk_with_spans(document: Union[str, bytes, os.PathLike], file_name: str = "Insurance"):
+    # For process-pool workers: returns the stage timings with the table, so the parent can record them
+    with collect_spans() as spans:
+        table = parse_chunk(document, file_name)
+    return table, spans
+
+
+def parse_small_pdf_with_spans(document: Union[bytes, os.PathLike], file_name: str = "Insurance"):
+    # For process-pool workers: like parse_chunk_with_spans, but returns None for PDFs large enough
+    # for page-sharded extraction, which the parent fans out to the page pool itself.
+    # Deciding here keeps opening the PDF (slow for large or damaged files) off the event loop.
+    if uses_sharded_extraction(pdf_page_count(document)):
+        return None
+    return parse_chunk_with_spans(document, file_name)
@@ -1,18 +1,85 @@
-import groq
-from embedding import embed_chunks, search
+import asyncio
+import hashlib
+from answer_cache import answer_cache
+from doc_cache import digest_key
+from context_packer import CONTEXT_TOKEN_BUDGET, pack_context
+from embedding import embed_chunks, encode_queries, search_hybrid
+from executors import run_in_thread
+from metrics import span
 from dotenv import load_dotenv
 import os
-from groq import Groq
+from llm_client import DEFAULT_MODEL, close_async_clients, get_client
+from token_count import MESSAGE_OVERHEAD, count_tokens, prompt_limit, token_counter
 load_dotenv()
 
+# Bump whenever the prompts or their postprocessing change, so cached answers are not reused
+PROMPT_VERSION = "2"
 
-def query_llm(json_chunks, queries):
-    client = Groq(
-        api_key=os.environ['GROQ_API_KEY'],
+# keywords: an LLM call turns the questions into keyword sets, which are searched with the questions
+# fast: the questions alone are searched (hybrid BM25 + embeddings), saving that round-trip
+RETRIEVAL_MODES = ("keywords", "fast")
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "keywords")
+
+
+def _retrieval_mode(mode=None):
+    mode = mode or RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown RETRIEVAL_MODE: {mode}. Expected one of {', '.join(RETRIEVAL_MODES)}")
+    return mode
+
+
+def _answer_namespace(mode):
+    # Answers depend on the prompts, the model and the context retrieval produced
+    return f"{PROMPT_VERSION}:{DEFAULT_MODEL}:{mode}"
+
+
+def query_llm(chunks, queries):
+    # chunks: ChunkTable from parse_chunk
+    chunks, embeddings = embed_chunks(chunks)
+    return answer_questions(chunks, embeddings, queries)
+
+
+def answer_questions(chunks, embeddings, queries, index=None, doc_key=None):
+    # Synchronous entry point for scripts; the API awaits answer_questions_async directly
+    return asyncio.run(_answer_questions_and_close(chunks, embeddings, queries, index, doc_key))
+
+
+async def _answer_questions_and_close(chunks, embeddings, queries, index, doc_key):
+    try:
+        return await answer_questions_async(chunks, embeddings, queries, index, doc_key)
+    finally:
+        # The loop ends with asyncio.run; its pooled connections must not outlive it
+        await close_async_clients()
+
+
+async def _cached_answers(chunks, queries, doc_key, namespace):
+    # Per-question answer cache lookup: (doc_key, answers with None for misses, question embeddings)
+    if answer_cache is None:
+        return doc_key, [None] * len(queries), None
+    if doc_key is None:
+        # Callers without a document cache key (scripts) are keyed by the chunked text
+        doc_key = digest_key(hashlib.sha256(chunks.text.encode()).hexdigest())
+    question_embeddings = None
+    if answer_cache.similarity > 0:
+        question_embeddings = await run_in_thread(encode_queries, queries)
+    with span("answer_cache"):
+        cached = await run_in_thread(answer_cache.lookup, doc_key, namespace, queries, question_embeddings)
+    return doc_key, cached, question_embeddings
+
+
+async def _store_answers(doc_key, namespace, queries, answers, question_embeddings, missing):
+    # Only cache when the LLM returned exactly one answer per asked question,
+    # otherwise answers cannot be attributed to questions
+    if answer_cache is None or len(answers) != len(missing):
+        return
+    if question_embeddings is not None:
+        question_embeddings = question_embeddings[missing]
+    await run_in_thread(
+        answer_cache.store, doc_key, namespace, [queries[i] for i in missing], answers, question_embeddings
     )
 
-    chunks, embeddings = embed_chunks(json_chunks)
 
+async def _extract_keywords(client, queries):
     # LLM prompt to extract important keywords that can be used to query the document for relevant information
     key_prompt = f"""You are an expert legal assistant.
         You are given a set of questions and a document to query to get the answers from. Give your answer as a set of keywords that you would use to query the document using cosine similarity search.
@@ -22,89 +89,178 @@ def query_llm(json_chunks, queries):
         {queries}
 
         Answer: """
-    chat_completion = client.chat.completions.create(
-        messages=[
-            {
-                "role": "user",
-                "content": f"{key_prompt}",
-            }
-        ],
-        model="meta-llama/llama-4-scout-17b-16e-instruct",
-    )
+    with span("llm_keywords"):
+        chat_completion = await client.acreate(
+            messages=[
+                {
+                    "role": "user",
+                    "content": f"{key_prompt}",
+                }
+            ],
+            model=DEFAULT_MODEL,
+            label="keywords",
+        )
     key_answers = chat_completion.choices[0].message.content
     key_answers = key_answers.split('|')
     key_answers = [answer.strip() for answer in key_answers if answer]
+    return key_answers
+
+
+async def _retrieve_context(client, chunks, embeddings, queries, index=None, mode="keywords"):
+    key_answers = await _extract_keywords(client, queries) if mode == "keywords" else []
 
-    # Context extracted using keywords extracted using llm
-    context1 = ''
-    for query in key_answers:
-        top_chunks = search(query, chunks, embeddings)
+    # Keyword sets and original questions are searched in a single batch, off the event loop;
+    # embedding and BM25 rankings are fused when the document has a lexical index
+    with span("search"):
+        hits = await run_in_thread(search_hybrid, key_answers + list(queries), chunks, embeddings, index=index)
 
-        context1 += '\n\n'.join(top_chunks)
+    # Union of all retrieved chunks, each once, best-scoring first, cut to the context token budget
+    # (itself capped so that the answer prompt fits the model, measured with its tokenizer)
+    with span("pack_context"):
+        return await run_in_thread(_pack_context, chunks, hits, queries)
 
-    # Context extracted using keywords in the original query (only used if number of questions is small
-    # to avoid llm rate limits on message size
-    context2 = ''
-    for query in queries:
-        top_chunks = search(query, chunks, embeddings)
 
-        context2 += '\n\n'.join(top_chunks)
+def _pack_context(chunks, hits, queries):
+    template_tokens = count_tokens(_answer_prompt("", queries), DEFAULT_MODEL) + MESSAGE_OVERHEAD
+    budget = min(CONTEXT_TOKEN_BUDGET, prompt_limit(DEFAULT_MODEL) - template_tokens)
+    return pack_context(chunks, hits, budget, token_counter(DEFAULT_MODEL))
 
+
+def _answer_prompt(context, queries):
     # Prompt for llm batch query
-    prompt = f"""You are an expert legal assistant.
+    return f"""You are an expert legal assistant.
     Use the following context to answer the following questions.
     Separate each answer with a '|'. Do not repeat the questions in the answer.
     
     Context:
-    {context1 + context2}
+    {context}
     
     Question:
     {queries}
     
     Answer: """
 
-    try:
-        chat_completion = client.chat.completions.create(
+
+async def _answer_completion(client, context, queries, **kwargs):
+    # The packed context is budgeted to fit the model, so no retry with a smaller prompt is needed
+    # (for streamed calls the span ends when the stream opens)
+    with span("llm_answer"):
+        return await client.acreate(
             messages=[
                 {
                     "role": "user",
-                    "content": f"{prompt}",
+                    "content": _answer_prompt(context, queries),
                 }
             ],
-            model="meta-llama/llama-4-scout-17b-16e-instruct",
+            model=DEFAULT_MODEL,
+            label="answer_stream" if kwargs.get("stream") else "answer",
+            **kwargs,
         )
-        answers = chat_completion.choices[0].message.content
-    except groq.APIStatusError:
-        # If using both contexts in the prompt is too large for the llm model
-        prompt = f"""You are an expert legal assistant.
-            Use the following context to answer the following questions.
-            Separate each answer with a '|'. Do not repeat the questions in the answer.
 
-            Context:
-            {context1}
 
-            Question:
-            {queries}
+def _clean_answer(answer, is_first):
+    # Streaming counterpart of the postprocessing in answer_questions_async
+    answer = answer.strip()
+    if not answer or (is_first and answer == '-'):
+        return None
+    return answer
 
-            Answer: """
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"{prompt}",
-                }
-            ],
-            model="meta-llama/llama-4-scout-17b-16e-instruct",
-        )
-        answers = chat_completion.choices[0].message.content
+
+async def answer_questions_async(chunks, embeddings, queries, index=None, doc_key=None, mode=None):
+    # Retrieval + answering over an already embedded document (e.g. from doc_cache)
+    # Questions answered before for this document are served from the answer cache
+    mode = _retrieval_mode(mode)
+    namespace = _answer_namespace(mode)
+    doc_key, cached, question_embeddings = await _cached_answers(chunks, queries, doc_key, namespace)
+    missing = [i for i, answer in enumerate(cached) if answer is None]
+    if not missing:
+        return {"answers": cached}
+    asked = [queries[i] for i in missing]
+
+    # Process-wide pooled client: keep-alive connections, retries on 429/5xx, latency stats
+    client = get_client(os.environ['GROQ_API_KEY'])
+
+    context = await _retrieve_context(client, chunks, embeddings, asked, index, mode)
+    chat_completion = await _answer_completion(client, context, asked)
+    answers = chat_completion.choices[0].message.content
 
     # Postprocessing
     answers = answers.split('|')
     answers = [answer.strip() for answer in answers if answer.strip() != ""]
     # LLM seems to send a '-' sometimes, even when prompted not to.
-    if answers[0] == '-':
+    if answers and answers[0] == '-':
         answers = answers[1:]
 
+    await _store_answers(doc_key, namespace, queries, answers, question_embeddings, missing)
+
+    # Fill the cache misses in order; extra or missing LLM answers shift like before
+    for i, answer in zip(missing, answers):
+        cached[i] = answer
+    answers = [answer for answer in cached if answer is not None] + answers[len(missing):]
+
     ans = {"answers": answers}
 
-    return ans
\ No newline at end of file
+    return ans
+
+
+async def stream_answers(chunks, embeddings, queries, index=None, doc_key=None, mode=None):
+    """
+    Same pipeline as answer_questions_async, but the answer call is streamed
+    and each answer is yielded as soon as its closing '|' arrives. Cached
+    answers are yielded in question order around the streamed ones.
+    """
+    mode = _retrieval_mode(mode)
+    namespace = _answer_namespace(mode)
+    doc_key, cached, question_embeddings = await _cached_answers(chunks, queries, doc_key, namespace)
+    missing = [i for i, answer in enumerate(cached) if answer is None]
+
+    position = 0
+    while position < len(cached) and cached[position] is not None:
+        yield cached[position]
+        position += 1
+    if not missing:
+        return
+    asked = [queries[i] for i in missing]
+
+    client = get_client(os.environ['GROQ_API_KEY'])
+
+    context = await _retrieve_context(client, chunks, embeddings, asked, index, mode)
+    stream = await _answer_completion(client, context, asked, stream=True)
+
+    def streamed(answer):
+        # Yields the streamed answer followed by any cached answers up to the next miss
+        nonlocal position
+        out = [answer]
+        if len(fresh) <= len(missing):
+            position = missing[len(fresh) - 1] + 1
+            while position < len(cached) and cached[position] is not None:
+                out.append(cached[position])
+                position += 1
+        return out
+
+    pending = ''
+    fresh = []
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        pending += chunk.choices[0].delta.content or ''
+        while '|' in pending:
+            answer, pending = pending.split('|', 1)
+            answer = _clean_answer(answer, not fresh)
+            if answer is not None:
+                fresh.append(answer)
+                for out in streamed(answer):
+                    yield out
+
+    answer = _clean_answer(pending, not fresh)
+    if answer is not None:
+        fresh.append(answer)
+        for out in streamed(answer):
+            yield out
+
+    # The LLM returned fewer answers than asked: still send the remaining cached ones
+    for answer in cached[position:]:
+        if answer is not None:
+            yield answer
+
+    await _store_answers(doc_key, namespace, queries, fresh, question_embeddings, missing)
@@ -0,0 +1,130 @@
+"""
+Client-side Groq rate limiting for concurrent batches.
+
+RateLimiter holds two token buckets, one for requests per minute and one
+for tokens per minute. Each bucket refills continuously and its capacity
+is one minute's allowance. Before each attempt, a call takes one request
+and its estimated tokens. The estimate is the locally counted prompt plus
+a running average of the completion sizes seen so far. When no capacity
+is left the call blocks, so a batch spreads its calls over the minute
+instead of bursting into 429s.
+
+The configured limits are ceilings. A 429 halves the effective rate and
+pauses all callers for the server's Retry-After. Every success wins back
+a small share of the ceiling, so the rate settles just under the real
+limit even when that limit is lower than configured.
+
+Configuration via environment:
+  GROQ_RPM  requests per minute (default: 30)
+  GROQ_TPM  tokens per minute, prompt + completion (default: 30000)
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+# Multiplicative decrease on 429, additive increase (share of the ceiling) per success
+BACKOFF_FACTOR = 0.5
+RECOVERY_STEP = 0.05
+MIN_SCALE = 0.05
+
+
+class TokenBucket:
+    """Continuously refilling bucket; not thread-safe on its own (RateLimiter locks it)."""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now: float, scale: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_minute * scale / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float, scale: float) -> float:
+        # Requests larger than the bucket go through once it is full instead of never
+        amount = min(amount, self.capacity)
+        missing = amount - self.level
+        return 0.0 if missing <= 0 else missing * 60 / (self.per_minute * scale)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limiter shared by the threads of a batch.
+
+    Args:
+        rpm: Requests per minute allowed at most
+        tpm: Tokens per minute (prompt + completion) allowed at most
+        completion_estimate: Completion tokens assumed per call until some are observed
+    """
+
+    def __init__(self, rpm: float, tpm: float, completion_estimate: int = 512):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.completion_estimate = float(completion_estimate)
+        self.scale = 1.0
+        self.paused_until = 0.0
+        self.rate_limited_count = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, rpm: Optional[float] = None, tpm: Optional[float] = None) -> "RateLimiter":
+        return cls(
+            rpm or float(os.environ.get("GROQ_RPM", "30")),
+            tpm or float(os.environ.get("GROQ_TPM", "30000")),
+        )
+
+    def estimate(self, prompt_tokens: int) -> int:
+        return int(prompt_tokens + self.completion_estimate)
+
+    def acquire(self, tokens: int) -> None:
+        """Block until one request and `tokens` tokens may be spent, then spend them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.requests.refill(now, self.scale)
+                self.tokens.refill(now, self.scale)
+                delay = max(
+                    self.paused_until - now,
+                    self.requests.wait_time(1, self.scale),
+                    self.tokens.wait_time(tokens, self.scale),
+                )
+                if delay <= 0:
+                    self.requests.level -= 1
+                    self.tokens.level -= min(tokens, self.tokens.capacity)
+                    return
+                self.waited += delay
+            time.sleep(delay)
+
+    def record(self, completion_tokens: Optional[int]) -> None:
+        """Called after a successful call: recover toward the ceiling and learn completion sizes."""
+        with self._lock:
+            self.scale = min(1.0, self.scale + RECOVERY_STEP)
+            if completion_tokens:
+                self.completion_estimate = 0.8 * self.completion_estimate + 0.2 * completion_tokens
+
+    def rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """Called on a 429: slow down and pause everyone for Retry-After."""
+        with self._lock:
+            self.rate_limited_count += 1
+            self.scale = max(MIN_SCALE, self.scale * BACKOFF_FACTOR)
+            now = time.monotonic()
+            # Capacity believed to be left was evidently not there
+            self.requests.level = min(self.requests.level, 0.0)
+            self.tokens.level = min(self.tokens.level, 0.0)
+            self.requests.updated = self.tokens.updated = now
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rpm": self.requests.per_minute * self.scale,
+                "tpm": self.tokens.per_minute * self.scale,
+                "rate_limited": self.rate_limited_count,
+                "waited_s": self.waited,
+                "completion_estimate": round(self.completion_estimate),
+            }
@@ -5,10 +5,17 @@ Extracts structured information from HTML and PDF documents related to RFP proce
 
 import os
 import json
-from typing import Dict, Any, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Optional, Tuple, Union
 from pathlib import Path
 from dotenv import load_dotenv
-from groq import Groq
+from extraction_cache import ExtractionCache, extraction_key, file_sha256
+from llm_client import DEFAULT_MODEL, get_client
+from metrics import collect_spans, span
+from rate_limiter import RateLimiter
+import rfp_sections
+from rfp_sections import RFP_MAP_WORKERS, merge_fields, plan_calls, route_groups, split_sections, use_sections
+from token_count import count_message_tokens, count_tokens, fit_text, prompt_limit
 import fitz  # PyMuPDF
 from bs4 import BeautifulSoup
 
@@ -44,18 +51,52 @@ class RFPExtractor:
         "Product Specification"
     ]
     
-    def __init__(self, api_key: str = None):
+    SYSTEM_PROMPT = "You are an expert at extracting structured information from documents. Always respond with valid JSON only."
+    
+    # Completion tokens reserved for the JSON answer when fitting the prompt
+    MAX_OUTPUT_TOKENS = 2048
+    
+    # Bump whenever the prompts or the response parsing change, so cached extractions are not reused
+    PROMPT_VERSION = "1"
+    
+    def __init__(self, api_key: str = None, cache: Optional[ExtractionCache] = None):
         """
         Initialize the RFP Extractor with Groq API client.
         
         Args:
             api_key: Groq API key. If not provided, will use GROQ_API_KEY from environment.
+            cache: Optional extraction cache; unchanged documents are then answered from it
         """
         self.api_key = api_key or os.environ.get('GROQ_API_KEY')
         if not self.api_key:
             raise ValueError("GROQ_API_KEY must be provided or set in environment variables")
         
-        self.client = Groq(api_key=self.api_key)
+        # Shared process-wide client (pooled connections, retries with backoff)
+        self.client = get_client(self.api_key)
+        
+        # Set for batches: paces LLM calls to the Groq per-minute limits (see rate_limiter)
+        self.rate_limiter: Optional[RateLimiter] = None
+        
+        self.cache = cache
+    
+    def cache_namespace(self) -> str:
+        """
+        Everything besides the file content that the extracted fields depend on.
+        
+        Returns:
+            A string identifying fields, prompt version, model and long-document settings
+        """
+        return json.dumps({
+            "fields": self.EXPECTED_FIELDS,
+            "prompt_version": self.PROMPT_VERSION,
+            "model": DEFAULT_MODEL,
+            "long_mode": [
+                rfp_sections.RFP_LONG_MODE,
+                rfp_sections.RFP_SINGLE_PROMPT_TOKENS,
+                rfp_sections.RFP_SECTION_TOKENS,
+                rfp_sections.RFP_SECTIONS_PER_GROUP,
+            ],
+        })
     
     def extract_text_from_pdf(self, file_path: str) -> str:
         """
@@ -135,87 +176,170 @@ class RFPExtractor:
         else:
             raise ValueError(f"Unsupported file format: {file_extension}. Only PDF and HTML are supported.")
     
-    def extract_rfp_information(self, text: str) -> Dict[str, Any]:
+    def build_prompt(self, text: str, fields: list = None) -> str:
         """
-        Use LLM to extract structured RFP information from text.
+        Build the extraction prompt around the document text.
         
         Args:
-            text: Extracted text from the document
+            text: Document text to embed in the prompt (already fitted)
+            fields: Fields to ask for (default: EXPECTED_FIELDS)
             
         Returns:
-            Dictionary containing extracted RFP information
+            The user prompt for the LLM
         """
-        # Create a prompt for the LLM to extract structured information
-        prompt = f"""You are an expert at extracting structured information from RFP (Request for Proposal) documents.
+        fields = fields or self.EXPECTED_FIELDS
+        field_list = "\n".join(f"{i}. {field}" for i, field in enumerate(fields, 1))
+        json_template = ",\n".join(f'    "{field}": "value"' for field in fields)
+        return f"""You are an expert at extracting structured information from RFP (Request for Proposal) documents.
 
 Extract the following information from the provided document text. For each field, provide the exact value found in the document. If a field is not found or not applicable, use "N/A" or "Not specified" as the value.
 
 Required Fields:
-1. Bid Number
-2. Title
-3. Due Date
-4. Bid Submission Type
-5. Term of Bid
-6. Pre Bid Meeting
-7. Installation
-8. Bid Bond Requirement
-9. Delivery Date
-10. Payment Terms
-11. Any Additional Documentation Required
-12. MFG for Registration
-13. Contract or Cooperative to use
-14. Model_no
-15. Part_no
-16. Product
-17. contact_info
-18. company_name
-19. Bid Summary
-20. Product Specification
+{field_list}
 
 Document Text:
-{text[:12000]}
+{text}
 
 Please provide the extracted information in the following JSON format:
 {{
-    "Bid Number": "value",
-    "Title": "value",
-    "Due Date": "value",
-    "Bid Submission Type": "value",
-    "Term of Bid": "value",
-    "Pre Bid Meeting": "value",
-    "Installation": "value",
-    "Bid Bond Requirement": "value",
-    "Delivery Date": "value",
-    "Payment Terms": "value",
-    "Any Additional Documentation Required": "value",
-    "MFG for Registration": "value",
-    "Contract or Cooperative to use": "value",
-    "Model_no": "value",
-    "Part_no": "value",
-    "Product": "value",
-    "contact_info": "value",
-    "company_name": "value",
-    "Bid Summary": "value",
-    "Product Specification": "value"
+{json_template}
 }}
 
 Return ONLY the JSON object without any additional text or explanation."""
+    
+    def fit_document_text(self, text: str, fields: list = None) -> str:
+        """
+        Trim document text so the full request fits the model's prompt limit.
+        
+        Args:
+            text: Extracted text from the document
+            fields: Fields the prompt asks for (default: EXPECTED_FIELDS)
+            
+        Returns:
+            The text, cut at a token boundary if it is too long
+        """
+        fixed_tokens = count_message_tokens(
+            [
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": self.build_prompt("", fields)},
+            ],
+            DEFAULT_MODEL,
+        )
+        budget = prompt_limit(DEFAULT_MODEL, self.MAX_OUTPUT_TOKENS) - fixed_tokens
+        return fit_text(text, budget, DEFAULT_MODEL)
+    
+    def extract_rfp_information(self, text: str) -> Dict[str, Any]:
+        """
+        Use LLM to extract structured RFP information from text.
+        
+        Documents longer than RFP_SINGLE_PROMPT_TOKENS are extracted section
+        by section (see extract_rfp_information_by_sections) instead of
+        being cut to fit a single prompt.
+        
+        Args:
+            text: Extracted text from the document
+            
+        Returns:
+            Dictionary containing extracted RFP information
+        """
+        return self.extract_rfp_information_checked(text)[0]
+    
+    def extract_rfp_information_checked(self, text: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        extract_rfp_information, also telling whether every LLM call succeeded.
+        
+        Args:
+            text: Extracted text from the document
+            
+        Returns:
+            (extracted RFP information, complete); complete is False when a call
+            failed or answered with unparseable JSON, so the result must not be cached
+        """
+        if use_sections(count_tokens(text, DEFAULT_MODEL)):
+            return self.extract_rfp_information_by_sections(text)
+        rfp_data = self.extract_fields(text, self.EXPECTED_FIELDS)
+        return rfp_data, not self._failed(rfp_data)
+    
+    @staticmethod
+    def _failed(rfp_data: Dict[str, Any]) -> bool:
+        # extract_fields marks every field this way when the response is not valid JSON
+        return "Error extracting" in rfp_data.values()
+    
+    def extract_rfp_information_by_sections(self, text: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        Map-reduce extraction for long documents (see rfp_sections).
+        
+        Field groups are routed to the sections most likely to contain them,
+        the routed sections are extracted in parallel and the per-section
+        answers are merged field by field.
+        
+        Args:
+            text: Extracted text from the document
+            
+        Returns:
+            (extracted RFP information, complete); complete is False when any
+            section call failed or answered with unparseable JSON
+        """
+        sections = split_sections(text)
+        with span("rfp_route"):
+            routes = route_groups(text, sections)
+        calls = plan_calls(routes)
+        
+        answers = {}
+        failed = 0
+        with ThreadPoolExecutor(max_workers=RFP_MAP_WORKERS, thread_name_prefix="rfp-section") as pool:
+            futures = {
+                pool.submit(self.extract_fields, text[sections[i].start:sections[i].end], fields): i
+                for i, fields in calls.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    answer = future.result()
+                except Exception as e:
+                    # One failed section only loses its fields; they may still come from other sections
+                    print(f"Error extracting section {futures[future] + 1}/{len(sections)}: {str(e)}")
+                    failed += 1
+                    continue
+                failed += self._failed(answer)
+                answers[futures[future]] = answer
+        
+        if not answers:
+            raise Exception(f"Error extracting information with LLM: all {len(calls)} section calls failed")
+        return merge_fields(self.EXPECTED_FIELDS, routes, answers), failed == 0
+    
+    def extract_fields(self, text: str, fields: list) -> Dict[str, Any]:
+        """
+        Extract the given fields from text with a single LLM call.
+        
+        Args:
+            text: Document text (cut to the prompt limit if needed)
+            fields: Fields to extract
+            
+        Returns:
+            Dictionary with a value for each field
+        """
+        # Fit the document into the model's prompt limit (measured with its tokenizer) instead of
+        # cutting at a fixed character count; only text that cannot fit is dropped, and that is logged
+        text = self.fit_document_text(text, fields)
+        prompt = self.build_prompt(text, fields)
 
         try:
             # Use Groq LLM to extract information
-            chat_completion = self.client.chat.completions.create(
+            chat_completion = self.client.create(
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are an expert at extracting structured information from documents. Always respond with valid JSON only."
+                        "content": self.SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
                         "content": prompt
                     }
                 ],
-                model="meta-llama/llama-4-scout-17b-16e-instruct",
+                model=DEFAULT_MODEL,
                 temperature=0.1,  # Low temperature for more consistent extraction
+                label="rfp_extract",
+                limiter=self.rate_limiter,
             )
             
             response_text = chat_completion.choices[0].message.content.strip()
@@ -234,7 +358,7 @@ Return ONLY the JSON object without any additional text or explanation."""
             extracted_data = json.loads(response_text)
             
             # Ensure all expected fields are present
-            for field in self.EXPECTED_FIELDS:
+            for field in fields:
                 if field not in extracted_data:
                     extracted_data[field] = "Not specified"
             
@@ -244,16 +368,19 @@ Return ONLY the JSON object without any additional text or explanation."""
             print(f"Error parsing JSON response: {str(e)}")
             print(f"Response text: {response_text}")
             # Return a template with "Error extracting" for all fields
-            return {field: "Error extracting" for field in self.EXPECTED_FIELDS}
+            return {field: "Error extracting" for field in fields}
         except Exception as e:
             raise Exception(f"Error extracting information with LLM: {str(e)}")
     
-    def process_document(self, file_path: str) -> Dict[str, Any]:
+    def process_document(self, file_path: str, verbose: bool = True,
+                         content_sha256: Optional[str] = None) -> Dict[str, Any]:
         """
         Process a single RFP document and extract structured information.
         
         Args:
             file_path: Path to the document file (PDF or HTML)
+            verbose: Print progress of the stages
+            content_sha256: SHA-256 of the file if the caller already has it (saves hashing it again)
             
         Returns:
             Dictionary containing extracted RFP information with metadata
@@ -263,53 +390,113 @@ Return ONLY the JSON object without any additional text or explanation."""
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
         
-        print(f"Processing document: {file_path}")
+        log = print if verbose else (lambda *args: None)
+        log(f"Processing document: {file_path}")
+        
+        # Unchanged documents (same content and extraction settings) are answered from the cache
+        cache_key = None
+        if self.cache is not None:
+            content_sha256 = content_sha256 or file_sha256(file_path)
+            cache_key = extraction_key(content_sha256, self.cache_namespace())
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                log("  - Unchanged since a previous run, using the cached extraction")
+                return self._result(file_path, cached)
         
-        # Extract text from document
-        print("  - Extracting text...")
-        text = self.extract_text_from_file(file_path)
+        # Stage timings go to the shared metrics histograms and are printed per stage
+        with collect_spans() as spans, span("rfp_document"):
+            # Extract text from document
+            log("  - Extracting text...")
+            with span("rfp_extract_text"):
+                text = self.extract_text_from_file(file_path)
+            
+            log(f"  - Extracted {len(text)} characters in {spans[-1][1]:.2f}s")
+            
+            # Extract structured information using LLM
+            log("  - Extracting structured information with LLM...")
+            with span("rfp_llm"):
+                rfp_data, complete = self.extract_rfp_information_checked(text)
         
-        print(f"  - Extracted {len(text)} characters")
+        # Extractions with a failed call or JSON parse are not cached, so the next run asks again
+        if cache_key is not None:
+            if complete:
+                self.cache.put(cache_key, content_sha256, Path(file_path).name, rfp_data)
+            else:
+                log("  - Some LLM calls failed; not caching this extraction")
         
-        # Extract structured information using LLM
-        print("  - Extracting structured information with LLM...")
-        rfp_data = self.extract_rfp_information(text)
+        timings = dict(spans)
+        log(f"  - Extraction complete! (LLM {timings['rfp_llm']:.2f}s, total {timings['rfp_document']:.2f}s)")
         
+        return self._result(file_path, rfp_data)
+    
+    def _result(self, file_path: str, rfp_data: Dict[str, Any]) -> Dict[str, Any]:
         # Add metadata
-        result = {
+        return {
             "document_name": Path(file_path).name,
             "document_type": Path(file_path).suffix.lower(),
             "extracted_fields": rfp_data
         }
-        
-        print("  - Extraction complete!")
-        
-        return result
     
-    def process_multiple_documents(self, file_paths: list) -> list:
+    def process_document_or_error(self, file_path: str, verbose: bool = True,
+                                  content_sha256: Optional[str] = None) -> Dict[str, Any]:
+        """
+        process_document for batches: a failing document becomes an error
+        entry ({"document_name", "error"}) instead of raising.
+        """
+        try:
+            return self.process_document(file_path, verbose, content_sha256)
+        except Exception as e:
+            if verbose:
+                print(f"Error processing {file_path}: {str(e)}")
+            return {
+                "document_name": Path(file_path).name,
+                "error": str(e)
+            }
+    
+    def process_multiple_documents(self, file_paths: list, max_workers: int = 1,
+                                   rate_limiter: Optional[RateLimiter] = None,
+                                   content_hashes: Optional[list] = None) -> list:
         """
         Process multiple RFP documents.
         
+        With max_workers > 1 documents are processed concurrently, so text
+        extraction of some documents overlaps the LLM calls of others. The LLM
+        calls of the batch share one rate limiter (GROQ_RPM / GROQ_TPM unless
+        one is given), which keeps them within Groq's per-minute limits.
+        
         Args:
             file_paths: List of paths to document files
+            max_workers: Documents processed at the same time (1 = one after another)
+            rate_limiter: Limiter for the batch's LLM calls
+            content_hashes: SHA-256 of each file, in the order of file_paths, if already known
             
         Returns:
-            List of dictionaries containing extracted information for each document
+            List of dictionaries containing extracted information for each document,
+            in the order of file_paths
         """
-        results = []
+        jobs = list(zip(file_paths, content_hashes or [None] * len(file_paths)))
+        if max_workers <= 1 and rate_limiter is None:
+            return [self.process_document_or_error(file_path, True, sha256) for file_path, sha256 in jobs]
         
-        for file_path in file_paths:
-            try:
-                result = self.process_document(file_path)
-                results.append(result)
-            except Exception as e:
-                print(f"Error processing {file_path}: {str(e)}")
-                results.append({
-                    "document_name": Path(file_path).name,
-                    "error": str(e)
-                })
-        
-        return results
+        previous_limiter = self.rate_limiter
+        self.rate_limiter = rate_limiter or previous_limiter or RateLimiter.from_env()
+        try:
+            if max_workers <= 1:
+                return [self.process_document_or_error(file_path, True, sha256) for file_path, sha256 in jobs]
+            
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rfp") as pool:
+                futures = {
+                    pool.submit(self.process_document_or_error, file_path, False, sha256): file_path
+                    for file_path, sha256 in jobs
+                }
+                for done, future in enumerate(as_completed(futures), 1):
+                    result = future.result()
+                    status = f"error ({result['error']})" if "error" in result else "done"
+                    print(f"[{done}/{len(futures)}] {futures[future]}: {status}")
+                # Results in input order, whatever order the documents finished in
+                return [future.result() for future in futures]
+        finally:
+            self.rate_limiter = previous_limiter
     
     def save_results_to_json(self, results: Union[Dict, list], output_path: str):
         """
@@ -0,0 +1,130 @@
+"""
+Input discovery for the RFP CLI: directories, glob patterns and recursive
+scans, plus an incremental manifest of processed files.
+
+The manifest records path, size, mtime and content hash of every file
+processed, with its outcome. A later scan skips files whose size and
+mtime are unchanged without reading them, and files that were only
+touched (same hash) without processing them. So a folder that gains a
+few files a day only schedules those.
+
+Configuration via environment:
+  RFP_MANIFEST_PATH  SQLite file of the manifest (default: rfp_manifest.sqlite3)
+"""
+
+import glob
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+from extraction_cache import file_sha256
+
+SUPPORTED_SUFFIXES = (".pdf", ".html", ".htm")
+
+DONE = "done"
+FAILED = "failed"
+
+
+def is_supported(path: str) -> bool:
+    return Path(path).suffix.lower() in SUPPORTED_SUFFIXES
+
+
+def expand_inputs(inputs: Iterable[str], recursive: bool = False) -> list[str]:
+    """
+    Files named by the inputs, in order and without duplicates.
+
+    Directories contribute their PDF/HTML files (all subdirectories too when
+    recursive) and glob patterns their matching PDF/HTML files ("**" needs
+    recursive). Plain paths are passed through as given, existing or not,
+    so the caller can report them.
+    """
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = "**/*" if recursive else "*"
+            files.extend(sorted(str(p) for p in Path(item).glob(pattern) if p.is_file() and is_supported(str(p))))
+        elif glob.has_magic(item):
+            files.extend(sorted(p for p in glob.glob(item, recursive=recursive) if os.path.isfile(p) and is_supported(p)))
+        else:
+            files.append(item)
+    return list(dict.fromkeys(files))
+
+
+def is_settled(path: str, settle_seconds: float) -> bool:
+    # Files still being copied in keep changing; only pick up ones that have been quiet for a while
+    try:
+        return time.time() - os.stat(path).st_mtime >= settle_seconds
+    except OSError:
+        return False
+
+
+class FileState(NamedTuple):
+    path: str
+    size: int
+    mtime: float
+    sha256: str
+
+
+class Manifest:
+    """
+    Processed files and their outcome in a SQLite file.
+
+    Args:
+        path: SQLite file; created on first use
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.environ.get("RFP_MANIFEST_PATH", "rfp_manifest.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                sha256 TEXT NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                processed REAL NOT NULL
+            )"""
+        )
+
+    def check(self, path: str, retry_failed: bool = True) -> Optional[FileState]:
+        """
+        State of a file that needs processing, or None when it was processed
+        before and has not changed since. Unchanged files that failed are
+        scheduled again only with retry_failed.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime, sha256, status FROM files WHERE path = ?", (path,)).fetchone()
+        done = row is not None and (row[3] == DONE or not retry_failed)
+        if done and (row[0], row[1]) == (stat.st_size, stat.st_mtime):
+            return None
+
+        sha256 = file_sha256(path)
+        if done and row[2] == sha256:
+            # Touched or copied again with the same content
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE files SET size = ?, mtime = ? WHERE path = ?", (stat.st_size, stat.st_mtime, path)
+                )
+            return None
+        return FileState(path, stat.st_size, stat.st_mtime, sha256)
+
+    def record(self, state: FileState, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*state, FAILED if error else DONE, error, time.time()),
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall()
+        return {DONE: 0, FAILED: 0, **dict(rows)}
@@ -4,9 +4,110 @@ Command-line interface for processing RFP documents and extracting structured in
 """
 
 import argparse
+import json
+import os
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
+from extraction_cache import ExtractionCache
+from rate_limiter import RateLimiter
 from rfp_extractor import RFPExtractor
+from rfp_inputs import Manifest, expand_inputs, is_settled, is_supported
+
+
+def print_cache_stats(cache):
+    if cache is None:
+        print("  Cache: disabled")
+        return
+    stats = cache.stats()
+    print(f"  Cache: {stats['hits']} hit(s), {stats['misses']} miss(es), {stats['stored']} stored, "
+          f"{stats['entries']} entries in {cache.path}")
+
+
+def print_limiter_stats(limiter):
+    stats = limiter.stats()
+    print(f"  Rate limiting: {stats['rate_limited']} x 429, {stats['waited_s']:.1f}s waiting for capacity, "
+          f"settled at {stats['rpm']:.0f} rpm / {stats['tpm']:.0f} tpm")
+
+
+def record_results(manifest, states, results):
+    # Failed documents are recorded too; the next incremental run retries them
+    for state, result in zip(states, results):
+        manifest.record(state, result.get('error'))
+
+
+def append_json_line(result, output_path):
+    with open(output_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+
+def watch(args, extractor, manifest):
+    """
+    Poll the inputs for new or changed documents and process them as they
+    land, until interrupted.
+    
+    Each result is appended to args.output as one JSON line and recorded in
+    the manifest. A file is only picked up once it has not been modified for
+    args.settle seconds, so documents still being copied in are not read
+    half-written. A document that fails is retried only once it changes.
+    """
+    workers = max(1, args.concurrency)
+    if workers > 1 or args.rpm or args.tpm:
+        extractor.rate_limiter = RateLimiter.from_env(args.rpm, args.tpm)
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rfp-watch")
+    in_flight = {}  # future -> FileState
+    counts = {"done": 0, "failed": 0}
+    
+    def finish(future):
+        state = in_flight.pop(future)
+        result = future.result()
+        error = result.get('error')
+        manifest.record(state, error)
+        append_json_line(result, args.output)
+        counts["failed" if error else "done"] += 1
+        print(f"{time.strftime('%H:%M:%S')} {state.path}: {f'error ({error})' if error else 'done'}")
+    
+    print(f"Watching {', '.join(args.files)} every {args.interval:g}s, {workers} document(s) at a time; "
+          f"appending results to {args.output} (Ctrl+C to stop)\n")
+    try:
+        while True:
+            busy = {state.path for state in in_flight.values()}
+            for file_path in map(os.path.abspath, expand_inputs(args.files, args.recursive)):
+                # At most two documents queued per worker; the rest are picked up by later scans
+                if len(in_flight) >= 2 * workers:
+                    break
+                # Documents in progress are not hashed again on every scan
+                if file_path in busy or not is_supported(file_path) or not is_settled(file_path, args.settle):
+                    continue
+                try:
+                    state = manifest.check(file_path, retry_failed=False)
+                except OSError:
+                    # Removed or renamed since the scan
+                    continue
+                if state is not None:
+                    future = pool.submit(extractor.process_document_or_error, state.path, False, state.sha256)
+                    in_flight[future] = state
+                    busy.add(state.path)
+            
+            if in_flight:
+                # Wake up as soon as a document finishes, to refill the pool
+                done, _ = wait(list(in_flight), timeout=args.interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(future)
+            else:
+                time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\nStopping; waiting for documents in progress...")
+        for future in list(in_flight):
+            if future.cancel():
+                # Not started: picked up again by the next run
+                in_flight.pop(future)
+        pool.shutdown(wait=True)
+        for future in list(in_flight):
+            finish(future)
+    
+    print(f"\n✓ Processed {counts['done']} document(s), {counts['failed']} failed")
 
 
 def main():
@@ -23,20 +124,43 @@ Examples:
 
   # Specify API key directly
   python rfp_processor.py -f document.pdf -o output.json -k YOUR_API_KEY
+
+  # Process a large batch 8 documents at a time, within 30 requests / 30k tokens per minute
+  python rfp_processor.py -f rfps/*.pdf -o results.json -j 8 --rpm 30 --tpm 30000
+
+  # Re-extract everything, ignoring results cached by earlier runs
+  python rfp_processor.py -f rfps/*.pdf -o results.json --no-cache
+
+  # Empty the extraction cache
+  python rfp_processor.py --purge-cache
+
+  # Every PDF/HTML under a share, skipping files processed by earlier runs
+  python rfp_processor.py -f /mnt/bids -r --incremental -o new_results.json -j 8
+
+  # Glob patterns (quoted, "**" needs -r)
+  python rfp_processor.py -f "/mnt/bids/**/RFP-*.pdf" -r --incremental -o new_results.json
+
+  # Keep watching a folder, processing new documents as they land (JSON Lines output)
+  python rfp_processor.py -f /mnt/bids -r --watch -j 4 -o results.jsonl
         """
     )
     
     parser.add_argument(
         '-f', '--files',
         nargs='+',
-        required=True,
-        help='Path(s) to RFP document file(s) (PDF or HTML)'
+        help='RFP document file(s) (PDF or HTML), directories or glob patterns'
+    )
+    
+    parser.add_argument(
+        '-r', '--recursive',
+        action='store_true',
+        help='Include subdirectories of directories, and let "**" in patterns match them'
     )
     
     parser.add_argument(
         '-o', '--output',
-        default='rfp_extracted_data.json',
-        help='Output JSON file path (default: rfp_extracted_data.json)'
+        help='Output JSON file path (default: rfp_extracted_data.json; '
+             'with --watch, JSON Lines appended to rfp_extracted_data.jsonl)'
     )
     
     parser.add_argument(
@@ -44,7 +168,87 @@ Examples:
         help='Groq API key (optional if GROQ_API_KEY is set in environment)'
     )
     
+    parser.add_argument(
+        '-j', '--concurrency',
+        type=int,
+        default=1,
+        help='Documents processed at the same time (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--rpm',
+        type=float,
+        help='Groq requests per minute to stay within (default: GROQ_RPM or 30)'
+    )
+    
+    parser.add_argument(
+        '--tpm',
+        type=float,
+        help='Groq tokens per minute to stay within (default: GROQ_TPM or 30000)'
+    )
+    
+    parser.add_argument(
+        '--cache-path',
+        help='Extraction cache file (default: RFP_CACHE_PATH or rfp_extraction_cache.sqlite3)'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Neither read nor store cached extractions'
+    )
+    
+    parser.add_argument(
+        '--purge-cache',
+        action='store_true',
+        help='Delete all cached extractions before processing (alone: only purge)'
+    )
+    
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Skip files unchanged since an earlier run processed them (tracked in the manifest)'
+    )
+    
+    parser.add_argument(
+        '--manifest',
+        help='Manifest of processed files (default: RFP_MANIFEST_PATH or rfp_manifest.sqlite3)'
+    )
+    
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep polling the inputs and process new or changed documents as they land (implies --incremental)'
+    )
+    
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=10.0,
+        help='Seconds between scans in watch mode (default: 10)'
+    )
+    
+    parser.add_argument(
+        '--settle',
+        type=float,
+        default=30.0,
+        help='Seconds a file must be unmodified before watch mode reads it (default: 30)'
+    )
+    
     args = parser.parse_args()
+    if not args.files and not args.purge_cache:
+        parser.error('the following arguments are required: -f/--files')
+    if args.output is None:
+        args.output = 'rfp_extracted_data.jsonl' if args.watch else 'rfp_extracted_data.json'
+    
+    # Unchanged documents from earlier runs are answered from the cache without an LLM call
+    cache = None if args.no_cache and not args.purge_cache else ExtractionCache(args.cache_path)
+    if args.purge_cache:
+        print(f"✓ Purged {cache.purge()} cached extraction(s) from {cache.path}")
+        if args.no_cache:
+            cache = None
+        if not args.files:
+            return
     
     # Validate input files
     print("\n" + "=" * 60)
@@ -52,7 +256,7 @@ Examples:
     print("=" * 60)
     
     valid_files = []
-    for file_path in args.files:
+    for file_path in expand_inputs(args.files, args.recursive):
         path = Path(file_path)
         if not path.exists():
             print(f"✗ Error: File not found: {file_path}")
@@ -65,15 +269,28 @@ Examples:
         
         valid_files.append(str(path))
     
-    if not valid_files:
+    if not valid_files and not args.watch:
         print("\n✗ No valid files to process. Exiting.")
         sys.exit(1)
     
     print(f"\n✓ Found {len(valid_files)} valid file(s) to process")
     
+    # Files already processed by an earlier run and unchanged since (size and mtime, else content hash) are skipped
+    manifest, states = None, None
+    if args.incremental or args.watch:
+        manifest = Manifest(args.manifest)
+    if args.incremental and not args.watch:
+        states = [state for state in map(manifest.check, valid_files) if state is not None]
+        print(f"✓ {len(valid_files) - len(states)} unchanged since earlier runs (manifest: {manifest.path}), "
+              f"{len(states)} new or modified")
+        if not states:
+            print("\nNothing new to process.")
+            return
+        valid_files = [state.path for state in states]
+    
     # Initialize extractor
     try:
-        extractor = RFPExtractor(api_key=args.api_key)
+        extractor = RFPExtractor(api_key=args.api_key, cache=cache)
         print("✓ Groq API initialized successfully")
     except ValueError as e:
         print(f"\n✗ Error: {e}")
@@ -82,22 +299,38 @@ Examples:
     
     print("\n" + "-" * 60)
     
+    if args.watch:
+        watch(args, extractor, manifest)
+        print_cache_stats(cache)
+        if extractor.rate_limiter is not None:
+            print_limiter_stats(extractor.rate_limiter)
+        return
+    
     # Process documents
     if len(valid_files) == 1:
         # Single document
         print(f"Processing single document...\n")
         try:
-            result = extractor.process_document(valid_files[0])
+            result = extractor.process_document(valid_files[0], content_sha256=states[0].sha256 if states else None)
             extractor.save_results_to_json(result, args.output)
             print(f"\n✓ Successfully processed 1 document")
+            print_cache_stats(cache)
         except Exception as e:
             print(f"\n✗ Error processing document: {str(e)}")
+            if manifest is not None:
+                record_results(manifest, states, [{"error": str(e)}])
             sys.exit(1)
+        if manifest is not None:
+            record_results(manifest, states, [result])
     else:
         # Multiple documents
         print(f"Processing {len(valid_files)} documents...\n")
-        results = extractor.process_multiple_documents(valid_files)
+        limiter = RateLimiter.from_env(args.rpm, args.tpm) if args.concurrency > 1 or args.rpm or args.tpm else None
+        content_hashes = [state.sha256 for state in states] if states else None
+        results = extractor.process_multiple_documents(valid_files, args.concurrency, limiter, content_hashes)
         extractor.save_results_to_json(results, args.output)
+        if manifest is not None:
+            record_results(manifest, states, results)
         
         # Summary
         successful = sum(1 for r in results if 'error' not in r)
@@ -105,6 +338,9 @@ Examples:
         print(f"\n✓ Successfully processed: {successful}/{len(results)} documents")
         if failed > 0:
             print(f"✗ Failed: {failed} documents")
+        print_cache_stats(cache)
+        if limiter is not None:
+            print_limiter_stats(limiter)
     
     print("\n" + "=" * 60)
     print(f"Results saved to: {args.output}")
@@ -0,0 +1,213 @@
+"""
+Map-reduce field extraction for long RFP documents.
+
+A document too long for one extraction prompt is split into sections of
+RFP_SECTION_TOKENS tokens. The fields are grouped (identification,
+schedule, submission, financial, product), and each group is routed only
+to the RFP_SECTIONS_PER_GROUP sections most likely to contain it. The
+router searches a query per field over small chunks with the hybrid BM25 +
+embedding search of the Q&A pipeline; chunk hits vote for their sections.
+Each routed section is then asked for the fields routed to it, so LLM
+calls and tokens depend on the number of field groups, not on the length
+of the document.
+
+merge_fields reduces the per-section answers to one value per field:
+ - values meaning "not found" are ignored;
+ - list-like fields (LIST_FIELDS) join the distinct values found, best-ranked section first;
+ - other fields take the value from the best-ranked section, and other values are logged as conflicts;
+ - a field found nowhere is "Not specified".
+
+Configuration via environment:
+  RFP_LONG_MODE           auto | always | off; auto sections documents above RFP_SINGLE_PROMPT_TOKENS (default: auto)
+  RFP_SINGLE_PROMPT_TOKENS  longest document text sent in a single prompt in auto mode (default: 6000)
+  RFP_SECTION_TOKENS      document tokens per section (default: 3000)
+  RFP_SECTIONS_PER_GROUP  sections each field group is extracted from (default: 3)
+  RFP_MAP_WORKERS         section extractions in flight per document (default: 4)
+"""
+
+import bisect
+import logging
+import os
+from typing import NamedTuple
+
+from token_count import CHARS_PER_TOKEN
+
+logger = logging.getLogger(__name__)
+
+RFP_LONG_MODE = os.environ.get("RFP_LONG_MODE", "auto")
+RFP_SINGLE_PROMPT_TOKENS = int(os.environ.get("RFP_SINGLE_PROMPT_TOKENS", "6000"))
+RFP_SECTION_TOKENS = int(os.environ.get("RFP_SECTION_TOKENS", "3000"))
+RFP_SECTIONS_PER_GROUP = int(os.environ.get("RFP_SECTIONS_PER_GROUP", "3"))
+RFP_MAP_WORKERS = int(os.environ.get("RFP_MAP_WORKERS", "4"))
+
+# Fields extracted together from the same sections
+FIELD_GROUPS = {
+    "identification": ("Bid Number", "Title", "company_name", "contact_info", "Bid Summary"),
+    "schedule": ("Due Date", "Pre Bid Meeting", "Term of Bid", "Delivery Date", "Installation"),
+    "submission": ("Bid Submission Type", "Any Additional Documentation Required", "MFG for Registration",
+                   "Contract or Cooperative to use"),
+    "financial": ("Bid Bond Requirement", "Payment Terms"),
+    "product": ("Product", "Model_no", "Part_no", "Product Specification"),
+}
+
+# Retrieval query per field, phrased the way solicitations word it
+FIELD_QUERIES = {
+    "Bid Number": "solicitation bid RFP number",
+    "Title": "title of the request for proposal bid",
+    "company_name": "issuing agency company organization name",
+    "contact_info": "contact person email phone procurement officer",
+    "Bid Summary": "scope of work summary purpose of this solicitation",
+    "Due Date": "proposals due date deadline time submission closing",
+    "Pre Bid Meeting": "pre-bid conference meeting site visit",
+    "Term of Bid": "contract term period years renewal bid validity",
+    "Delivery Date": "delivery date delivered within days",
+    "Installation": "installation install setup services",
+    "Bid Submission Type": "submit proposals electronic portal sealed envelope email",
+    "Any Additional Documentation Required": "required forms documents attachments certificates references",
+    "MFG for Registration": "manufacturer registration authorized dealer",
+    "Contract or Cooperative to use": "cooperative purchasing contract state contract vehicle",
+    "Bid Bond Requirement": "bid bond bid security guarantee percent",
+    "Payment Terms": "payment terms invoice net days",
+    "Product": "products goods equipment to be purchased",
+    "Model_no": "model number",
+    "Part_no": "part number item number",
+    "Product Specification": "technical specifications minimum requirements",
+}
+
+# Fields whose values from several sections are combined rather than picked
+LIST_FIELDS = frozenset({"Any Additional Documentation Required", "Product Specification", "Bid Summary"})
+
+MISSING_VALUES = frozenset({
+    "", "n/a", "na", "none", "not specified", "not applicable", "not found", "not mentioned", "not provided",
+    "unknown", "error extracting",
+})
+
+# The identification fields are usually on the cover page; the first section is always asked for them
+FRONT_MATTER_GROUP = "identification"
+
+
+class Section(NamedTuple):
+    start: int
+    end: int
+
+
+def use_sections(text_tokens: int, mode: str = None) -> bool:
+    mode = mode or RFP_LONG_MODE
+    if mode not in ("auto", "always", "off"):
+        raise ValueError(f"Unknown RFP_LONG_MODE: {mode}. Expected one of auto, always, off")
+    return mode == "always" or (mode == "auto" and text_tokens > RFP_SINGLE_PROMPT_TOKENS)
+
+
+def split_sections(text: str, section_tokens: int = RFP_SECTION_TOKENS) -> list[Section]:
+    """Sentence-aligned sections of about section_tokens tokens, overlapping by a few sentences."""
+    from extract_chunk_support import iter_chunks
+
+    size = section_tokens * CHARS_PER_TOKEN
+    return [Section(span.start, span.end) for span in iter_chunks(text, chunk_size=size, overlap=size // 20)]
+
+
+def route_groups(text: str, sections: list[Section], per_group: int = RFP_SECTIONS_PER_GROUP) -> dict[str, list[int]]:
+    """
+    Section indices per field group, best first. Each field's query is
+    searched over small chunks; a section scores, per field, its best chunk
+    hit (fused score), and a group ranks sections by the sum over its fields.
+    """
+    if len(sections) <= per_group:
+        return {group: list(range(len(sections))) for group in FIELD_GROUPS}
+
+    # Imported here: loading the embedding model is only worth it for long documents
+    from bm25 import BM25Index
+    from chunk_table import ChunkTable
+    from embedding import encode_texts, search_hybrid
+    from extract_chunk_support import iter_chunks
+
+    chunks = ChunkTable.from_spans(text, iter_chunks(text), "rfp")
+    chunks.bm25 = BM25Index(chunks.texts())
+    embeddings = encode_texts(chunks.texts())
+    fields = list(FIELD_QUERIES)
+    hits = search_hybrid([FIELD_QUERIES[field] for field in fields], chunks, embeddings, top_k=4 * per_group)
+
+    starts = [section.start for section in sections]
+    field_scores = {}
+    for field, (ids, scores) in zip(fields, hits):
+        best: dict[int, float] = {}
+        for chunk_id, score in zip(ids.tolist(), scores.tolist()):
+            middle = (chunks.starts[chunk_id] + chunks.ends[chunk_id]) // 2
+            section = max(0, bisect.bisect_right(starts, middle) - 1)
+            best[section] = max(best.get(section, 0.0), score)
+        field_scores[field] = best
+
+    routes = {}
+    for group, group_fields in FIELD_GROUPS.items():
+        votes: dict[int, float] = {}
+        for field in group_fields:
+            for section, score in field_scores[field].items():
+                votes[section] = votes.get(section, 0.0) + score
+        # Every field's own best section comes first, so a field found in only one
+        # place is not outvoted by sections that mention several fields weakly
+        field_best = sorted(
+            (max(scores.items(), key=lambda item: item[1]) for field in group_fields
+             if (scores := field_scores[field])),
+            key=lambda item: -item[1],
+        )
+        ranked = [section for section, _ in field_best] + sorted(votes, key=lambda section: -votes[section])
+        if group == FRONT_MATTER_GROUP:
+            ranked.insert(0, 0)
+        # Groups with too few hits are topped up from the start of the document
+        ranked += range(len(sections))
+        routes[group] = list(dict.fromkeys(ranked))[:per_group]
+    return routes
+
+
+def plan_calls(routes: dict[str, list[int]]) -> dict[int, list[str]]:
+    """One extraction call per routed section, asking for all the fields routed to it."""
+    calls: dict[int, list[str]] = {}
+    for group, sections in routes.items():
+        for section in sections:
+            calls.setdefault(section, []).extend(FIELD_GROUPS[group])
+    return dict(sorted(calls.items()))
+
+
+def is_missing(value) -> bool:
+    return value is None or str(value).strip().strip(".").lower() in MISSING_VALUES
+
+
+def _as_text(value) -> str:
+    # Models sometimes answer with a list or object instead of a string
+    if isinstance(value, list):
+        return "; ".join(str(item) for item in value)
+    return str(value)
+
+
+def merge_fields(fields: list[str], routes: dict[str, list[int]], answers: dict[int, dict]) -> dict:
+    """
+    Reduce per-section answers to one value per field (see the module docstring for the policy).
+
+    Args:
+        fields: All fields to return, in output order
+        routes: Section ranking per group from route_groups
+        answers: Parsed JSON answer per section index (failed sections left out)
+
+    Returns:
+        Field -> value
+    """
+    rank_of = {field: sections for group, sections in routes.items() for field in FIELD_GROUPS[group]}
+    merged = {}
+    for field in fields:
+        values = []
+        for section in rank_of.get(field, []):
+            value = answers.get(section, {}).get(field)
+            if is_missing(value):
+                continue
+            value = value if isinstance(value, str) else _as_text(value)
+            if value.strip().lower() not in (v.strip().lower() for v in values):
+                values.append(value)
+        if not values:
+            merged[field] = "Not specified"
+        elif field in LIST_FIELDS:
+            merged[field] = "; ".join(values)
+        else:
+            merged[field] = values[0]
+            if len(values) > 1:
+                logger.info("Conflicting values for %r; kept %r over %r", field, values[0], values[1:])
+    return merged
@@ -0,0 +1,52 @@
+"""
+Shared setup for the test suite.
+
+Tests run offline: no model or tokenizer downloads (token counts fall back to
+the character estimate), no persistent embedding store and no answer cache
+unless a test turns them on. Tests that encode text use the stub_encoder
+fixture instead of the MiniLM model.
+"""
+
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ["EMBEDDING_STORE_DIR"] = ""
+os.environ["ANSWER_CACHE"] = "off"
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class HashingEncoder:
+    """
+    Offline stand-in for the SentenceTransformer: bag-of-words vectors from
+    hashed tokens, so texts sharing words are similar.
+    """
+
+    dim = 64
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, normalize_embeddings=False, **kwargs):
+        vectors = np.full((len(texts), self.dim), 1e-3, dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[i, int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1.0
+        if normalize_embeddings:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+@pytest.fixture
+def stub_encoder(monkeypatch):
+    import embedding
+
+    encoder = HashingEncoder()
+    monkeypatch.setattr(embedding, "_model", encoder)
+    return encoder
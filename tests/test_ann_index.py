@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+import ann_index
+from ann_index import IVFIndex, build_index
+
+
+def clustered_rows(n, dim=32, clusters=20, seed=0):
+    # Chunk embeddings cluster by topic; uniform random vectors would make any IVF look bad
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))
+    vectors = vectors.astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(embeddings, queries, top_k):
+    return np.argsort(-(queries @ embeddings.T), axis=1)[:, :top_k]
+
+
+def recall(results, exact):
+    return np.mean([len(set(row.tolist()) & set(truth.tolist())) / len(truth) for row, truth in zip(results, exact)])
+
+
+def test_ivf_recall_against_exact_search():
+    embeddings = clustered_rows(3000)
+    queries = clustered_rows(50, seed=1)
+    index = IVFIndex(embeddings, nprobe=8)
+
+    results = index.search(queries, 10)
+    assert recall(results, exact_top_k(embeddings, queries, 10)) >= 0.9
+
+
+def test_ivf_probing_every_list_is_exact():
+    embeddings = clustered_rows(500)
+    queries = clustered_rows(10, seed=2)
+    index = IVFIndex(embeddings, nlist=16, nprobe=16)
+
+    for row, truth in zip(index.search(queries, 5), exact_top_k(embeddings, queries, 5)):
+        np.testing.assert_array_equal(row, truth)
+
+
+def test_ivf_results_are_ordered_and_in_range():
+    embeddings = clustered_rows(400)
+    queries = clustered_rows(5, seed=3)
+    index = IVFIndex(embeddings, nprobe=4)
+
+    for query, row in zip(queries, index.search(queries, 8)):
+        assert len(row) <= 8
+        assert len(set(row.tolist())) == len(row)
+        assert row.min() >= 0 and row.max() < len(embeddings)
+        scores = embeddings[row] @ query
+        assert np.all(np.diff(scores) <= 1e-6)
+
+
+def test_ivf_batched_search_matches_single_queries():
+    embeddings = clustered_rows(2000)
+    queries = clustered_rows(30, seed=6)
+    index = IVFIndex(embeddings, nprobe=4)
+
+    batched = index.search(queries, 20)
+    for query, row in zip(queries, batched):
+        single, = index.search(query[None, :], 20)
+        np.testing.assert_allclose(embeddings[row] @ query, embeddings[single] @ query, rtol=1e-5)
+    assert all(len(row) == 0 for row in index.search(queries, 0))
+    assert index.search(queries[:0], 5) == []
+
+
+def test_ivf_lists_partition_all_vectors():
+    embeddings = clustered_rows(300)
+    index = IVFIndex(embeddings)
+
+    assert index.offsets[-1] == len(embeddings)
+    assert sorted(index.ids.tolist()) == list(range(len(embeddings)))
+    np.testing.assert_array_equal(index.vectors, embeddings[index.ids])
+    assert index.nbytes >= embeddings.nbytes
+
+
+def test_ivf_is_reproducible():
+    embeddings = clustered_rows(300)
+    np.testing.assert_array_equal(IVFIndex(embeddings, seed=4).centroids, IVFIndex(embeddings, seed=4).centroids)
+
+
+def test_ivf_tiny_inputs():
+    embeddings = clustered_rows(3)
+    index = IVFIndex(embeddings, nprobe=8)
+    assert index.nlist == 1
+    row, = index.search(embeddings[:1], 10)
+    assert sorted(row.tolist()) == [0, 1, 2]
+
+
+def test_build_index_selection(monkeypatch):
+    small, large = clustered_rows(100), clustered_rows(300)
+    monkeypatch.setenv("ANN_MIN_CHUNKS", "200")
+    monkeypatch.setattr(ann_index, "faiss", None)
+
+    assert build_index(small) is None
+    assert build_index(large, "exact") is None
+    assert isinstance(build_index(large), IVFIndex)
+    assert isinstance(build_index(small, "ivf"), IVFIndex)
+
+    monkeypatch.setenv("ANN_NPROBE", "3")
+    assert build_index(large, "ivf").nprobe == 3
+
+    with pytest.raises(ImportError):
+        build_index(large, "faiss")
+    with pytest.raises(ValueError):
+        build_index(large, "annoy")
+
+
+def test_build_index_default_threshold(monkeypatch):
+    monkeypatch.delenv("ANN_MIN_CHUNKS", raising=False)
+    monkeypatch.delenv("ANN_INDEX", raising=False)
+    monkeypatch.setattr(ann_index, "faiss", None)
+    assert build_index(clustered_rows(9999, dim=8)) is None
+    assert isinstance(build_index(clustered_rows(10000, dim=8)), IVFIndex)
+
+
+def test_faiss_backend():
+    pytest.importorskip("faiss")
+    embeddings = clustered_rows(2000)
+    queries = clustered_rows(20, seed=5)
+    index = build_index(embeddings, "faiss")
+
+    assert recall(index.search(queries, 10), exact_top_k(embeddings, queries, 10)) >= 0.9
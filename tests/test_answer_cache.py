@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache, MemoryAnswerBackend, SQLiteAnswerBackend, normalize_question
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryAnswerBackend(max_entries=3)
+    return SQLiteAnswerBackend(str(tmp_path / "answers.sqlite3"), max_entries=3)
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_normalize_question():
+    assert normalize_question("  What is the  BID bond?? ") == "what is the bid bond"
+    assert normalize_question("What is the bid bond") == normalize_question("what is the bid bond.")
+
+
+def test_partial_hits_keep_question_order(backend):
+    cache = AnswerCache(backend)
+    cache.store("doc", "v1", ["When are proposals due?", "Who is the contact?"], ["May 3", "J. Smith"])
+
+    answers = cache.lookup("doc", "v1", ["Who is the CONTACT", "Is there a bid bond?", "when are proposals due"])
+    assert answers == ["J. Smith", None, "May 3"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 2)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+
+def test_answers_are_scoped_by_document_and_namespace(backend):
+    cache = AnswerCache(backend)
+    cache.store("doc", "v1", ["When are proposals due?"], ["May 3"])
+    assert cache.lookup("other", "v1", ["When are proposals due?"]) == [None]
+    assert cache.lookup("doc", "v2", ["When are proposals due?"]) == [None]
+
+
+def test_expired_answers_are_dropped(backend, monkeypatch):
+    cache = AnswerCache(backend, ttl=60)
+    now = 1_000_000.0
+    monkeypatch.setattr(answer_cache, "time", SimpleNamespace(time=lambda: now))
+    cache.store("doc", "v1", ["q"], ["a"])
+
+    now += 30
+    assert cache.lookup("doc", "v1", ["q"]) == ["a"]
+    now += 31
+    assert cache.lookup("doc", "v1", ["q"]) == [None]
+    assert len(backend) == 0
+
+
+def test_least_recently_used_answers_are_evicted(backend, monkeypatch):
+    cache = AnswerCache(backend)
+    clock = iter(range(1_000_000, 1_000_100))
+    monkeypatch.setattr(answer_cache, "time", SimpleNamespace(time=lambda: float(next(clock))))
+    cache.store("doc", "v1", ["a", "b", "c"], ["1", "2", "3"])
+    cache.lookup("doc", "v1", ["a"])
+    cache.store("doc", "v1", ["d"], ["4"])
+
+    assert len(backend) == 3
+    assert cache.lookup("doc", "v1", ["a", "b", "c", "d"]) == ["1", None, "3", "4"]
+
+
+def test_semantic_matches(backend):
+    cache = AnswerCache(backend, similarity=0.9)
+    cache.store("doc", "v1", ["When are proposals due?", "Who is the contact?"], ["May 3", "J. Smith"],
+                np.stack([unit(1, 0, 0), unit(0, 1, 0)]))
+
+    questions = ["What is the proposal deadline?", "Is a bid bond required?"]
+    answers = cache.lookup("doc", "v1", questions, np.stack([unit(1, 0.1, 0), unit(0.5, 0.5, 1)]))
+    assert answers == ["May 3", None]
+    assert cache.stats()["semantic_hits"] == 1
+
+    # Without embeddings only exact matches are served
+    assert cache.lookup("doc", "v1", questions) == [None, None]
+
+
+def test_open_default_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("ANSWER_CACHE", "off")
+    assert answer_cache.open_default_cache() is None
+
+    monkeypatch.setenv("ANSWER_CACHE", "sqlite")
+    monkeypatch.setenv("ANSWER_CACHE_PATH", str(tmp_path / "answers.sqlite3"))
+    monkeypatch.setenv("ANSWER_CACHE_SIMILARITY", "0.95")
+    cache = answer_cache.open_default_cache()
+    assert isinstance(cache.backend, SQLiteAnswerBackend) and cache.similarity == 0.95
+
+    monkeypatch.setenv("ANSWER_CACHE", "redis")
+    with pytest.raises(ValueError):
+        answer_cache.open_default_cache()
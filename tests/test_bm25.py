@@ -0,0 +1,113 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from bm25 import RRF_K, BM25Index, fuse_hits, tokenize
+
+TEXTS = [
+    "The bid bond is five percent of the bid price.",
+    "Proposals are due on May 3. Late proposals are rejected.",
+    "The performance bond is one hundred percent.",
+    "Questions go to the contracting officer by email.",
+    "A bid bond or a certified check must accompany the bid; the bond is returned after award.",
+]
+
+
+def reference_scores(texts, query, k1=1.5, b=0.75):
+    # Okapi BM25 written out term by term
+    docs = [Counter(tokenize(text)) for text in texts]
+    lengths = [sum(doc.values()) for doc in docs]
+    avg_length = sum(lengths) / len(lengths)
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in other for other in docs)
+            if not df or term not in doc:
+                continue
+            idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            tf = doc[term]
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+        scores.append(score)
+    return np.array(scores, dtype=np.float32)
+
+
+def hit(ids):
+    return np.array(ids, dtype=np.intp), np.linspace(1, 0.5, len(ids), dtype=np.float32)
+
+
+def test_tokenize():
+    assert tokenize("The Bid-Bond is 5.5% of the bidder's price") == ["bid", "bond", "5.5", "bidder's", "price"]
+    assert tokenize("What is the?") == []
+
+
+@pytest.mark.parametrize("query", ["bid bond", "Bond percent", "proposals due May", "the is of"])
+def test_scores_match_okapi_bm25(query):
+    index = BM25Index(TEXTS)
+    np.testing.assert_allclose(index.scores(query), reference_scores(TEXTS, query), rtol=1e-5)
+
+
+def test_postings_are_csr_by_term():
+    index = BM25Index(TEXTS)
+    assert len(index.offsets) == len(index.vocabulary) + 1
+    assert index.offsets[-1] == len(index.ids) == len(index.weights)
+    assert index.nbytes == index.offsets.nbytes + index.ids.nbytes + index.weights.nbytes
+
+    for term, row in index.vocabulary.items():
+        start, stop = index.offsets[row], index.offsets[row + 1]
+        expected = [i for i, text in enumerate(TEXTS) if term in tokenize(text)]
+        assert index.ids[start:stop].tolist() == expected
+        assert (index.weights[start:stop] > 0).all()
+
+
+def test_search_returns_matching_chunks_best_first():
+    index = BM25Index(TEXTS)
+    (ids, scores), = index.search(["bid bond"], top_k=10)
+    # Only the chunks containing a query term, however large top_k is
+    assert sorted(ids.tolist()) == [0, 2, 4]
+    assert ids[0] in (0, 4) and (np.diff(scores) <= 0).all()
+    np.testing.assert_allclose(scores, index.scores("bid bond")[ids])
+
+    (ids, _), = index.search(["bid bond"], top_k=1)
+    assert len(ids) == 1
+
+
+def test_search_without_matches():
+    index = BM25Index(TEXTS)
+    hits = index.search(["warranty", "what is the", ""], top_k=5)
+    for ids, scores in hits:
+        assert len(ids) == 0 and len(scores) == 0
+        assert ids.dtype == np.intp and scores.dtype == np.float32
+
+    empty = BM25Index([])
+    assert empty.n_chunks == 0 and empty.search(["bid bond"])[0][0].size == 0
+
+
+def test_fuse_hits_weighs_both_rankings():
+    dense = [hit([1, 2, 3])]
+    lexical = [hit([3, 4])]
+    (ids, scores), = fuse_hits(dense, lexical, top_k=5, weight=0.6)
+    # Found by both beats first place in only one; the larger lexical share puts 4 above 1
+    assert ids.tolist() == [3, 4, 1, 2]
+    assert scores[0] == pytest.approx(0.4 / (RRF_K + 3) + 0.6 / (RRF_K + 1))
+    assert scores[1] == pytest.approx(0.6 / (RRF_K + 2))
+    assert scores[2] == pytest.approx(0.4 / (RRF_K + 1))
+
+
+def test_fuse_hits_weight_zero_keeps_the_dense_ranking():
+    dense = [hit([5, 1, 2])]
+    lexical = [hit([2, 7, 1, 9])]
+    (ids, scores), = fuse_hits(dense, lexical, top_k=3, weight=0.0)
+    assert ids.tolist() == [5, 1, 2]
+    np.testing.assert_allclose(scores, [1 / (RRF_K + rank) for rank in (1, 2, 3)])
+
+
+def test_fuse_hits_weight_one_keeps_the_lexical_ranking():
+    dense = [hit([5, 1, 2]), hit([0])]
+    lexical = [hit([2, 7, 1, 9]), hit([])]
+    (ids, _), (other_ids, other_scores) = fuse_hits(dense, lexical, top_k=4, weight=1.0)
+    assert ids.tolist() == [2, 7, 1, 9]
+    # With no lexical hits only zero-weight dense ones remain
+    assert other_ids.tolist() == [0] and other_scores.tolist() == [0.0]
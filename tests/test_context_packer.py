@@ -0,0 +1,89 @@
+import numpy as np
+
+from chunk_table import ChunkTable
+from context_packer import SEPARATOR, estimate_tokens, pack_context, rank_chunks
+from extract_chunk_support import ChunkSpan
+
+
+def make_table(texts):
+    text, spans = "", []
+    for chunk in texts:
+        spans.append(ChunkSpan(len(text), len(text) + len(chunk), 1, 1))
+        text += chunk + " "
+    return ChunkTable.from_spans(text, spans)
+
+
+def hit(ids, scores):
+    return np.array(ids, dtype=np.int64), np.array(scores, dtype=np.float32)
+
+
+def words(text):
+    # One token per word; the separator costs one
+    return max(1, len(text.split()))
+
+
+# Chunk i is "c<i>" repeated sizes[i] times, so its cost is sizes[i] tokens
+SIZES = [10, 10, 10, 10, 4, 10, 10]
+CHUNKS = make_table([" ".join([f"c{i}"] * size) for i, size in enumerate(SIZES)])
+
+
+def packed_ids(context):
+    return [int(text.split()[0][1:]) for text in context.split(SEPARATOR)] if context else []
+
+
+def test_rank_chunks_dedups_and_admits_each_querys_best_first():
+    hits = [
+        hit([3, 1, 2], [0.9, 0.8, 0.1]),
+        hit([1, 4], [0.95, 0.2]),
+        hit([], []),
+        # This query's best chunk scores lower than every other hit, and is still a leader
+        hit([6, 3], [0.05, 0.01]),
+    ]
+    assert rank_chunks(hits) == [3, 1, 6, 4, 2]
+
+
+def test_rank_chunks_orders_the_rest_by_best_score_over_all_queries():
+    hits = [hit([0, 2, 5], [0.9, 0.2, 0.1]), hit([1, 5, 2], [0.8, 0.7, 0.3])]
+    assert rank_chunks(hits) == [0, 1, 5, 2]
+    assert rank_chunks([]) == []
+
+
+def test_pack_context_keeps_to_the_budget_in_document_order():
+    hits = [hit([5, 3, 1, 0], [0.9, 0.8, 0.7, 0.6])]
+    # 10 + 1 + 10 fits 25; a third chunk would need 32
+    context = pack_context(CHUNKS, hits, budget_tokens=25, count_tokens=words)
+    assert packed_ids(context) == [3, 5]
+    assert context == SEPARATOR.join(CHUNKS.texts([3, 5]))
+
+
+def test_pack_context_fills_the_budget_with_smaller_lower_ranked_chunks():
+    hits = [hit([0, 1, 2, 4], [0.9, 0.8, 0.7, 0.1])]
+    # After 0 and 1 (21 tokens), 2 does not fit 27 but the 4-token chunk 4 does (21 + 1 + 4)
+    assert packed_ids(pack_context(CHUNKS, hits, budget_tokens=27, count_tokens=words)) == [0, 1, 4]
+
+
+def test_pack_context_admits_every_querys_best_chunk_first():
+    hits = [hit([0, 1, 2], [0.9, 0.85, 0.8]), hit([6], [0.1])]
+    # Chunk 6 scores lowest of all and still takes the second slot
+    assert packed_ids(pack_context(CHUNKS, hits, budget_tokens=21, count_tokens=words)) == [0, 6]
+
+
+def test_pack_context_dedups_chunks_retrieved_by_several_queries():
+    hits = [hit([2, 0], [0.9, 0.5]), hit([2, 0], [0.8, 0.7]), hit([0, 2], [0.9, 0.1])]
+    context = pack_context(CHUNKS, hits, budget_tokens=1000, count_tokens=words)
+    assert packed_ids(context) == [0, 2]
+
+
+def test_pack_context_with_nothing_that_fits():
+    hits = [hit([0, 1], [0.9, 0.8])]
+    assert pack_context(CHUNKS, hits, budget_tokens=5, count_tokens=words) == ""
+    assert pack_context(CHUNKS, [], budget_tokens=1000, count_tokens=words) == ""
+
+
+def test_pack_context_default_counter_stays_within_budget():
+    hits = [hit(list(range(len(SIZES))), np.linspace(1, 0, len(SIZES)))]
+    context = pack_context(CHUNKS, hits, budget_tokens=40)
+    selected = packed_ids(context)
+    cost = sum(estimate_tokens(CHUNKS.chunk_text(i)) for i in selected)
+    assert cost + estimate_tokens(SEPARATOR) * (len(selected) - 1) <= 40
+    assert selected == sorted(selected) and len(selected) >= 2
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+import doc_cache
+from doc_cache import CachedDocument, DocumentCache, digest_key, load_document_async
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    cache = DocumentCache()
+    monkeypatch.setattr(doc_cache, "document_cache", cache)
+    return cache
+
+
+class GatedBuild:
+    """Stands in for _build_document_async: blocks until released, then reads its source."""
+
+    def __init__(self, monkeypatch):
+        self.release = asyncio.Event()
+        self.sources = []
+        monkeypatch.setattr(doc_cache, "_build_document_async", self)
+
+    async def __call__(self, key, pdf):
+        self.sources.append(pdf)
+        await self.release.wait()
+        if not isinstance(pdf, bytes):
+            with open(pdf, "rb") as f:
+                f.read()
+        doc = CachedDocument.__new__(CachedDocument)
+        doc.key, doc.nbytes = key, 0
+        doc_cache.document_cache.put(doc)
+        return doc
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_build(monkeypatch, fresh_cache):
+    async def run():
+        build = GatedBuild(monkeypatch)
+        first = asyncio.create_task(load_document_async(b"%PDF", "key"))
+        second = asyncio.create_task(load_document_async(b"%PDF", "key"))
+        await settle()
+        first.cancel()
+        await settle()
+        build.release.set()
+
+        doc = await second
+        assert first.cancelled()
+        assert doc.key == "key" and "key" in fresh_cache
+        assert len(build.sources) == 1
+        assert doc_cache._inflight == {}
+
+    asyncio.run(run())
+
+
+def test_build_finishes_when_every_caller_went_away(monkeypatch, fresh_cache):
+    async def run():
+        build = GatedBuild(monkeypatch)
+        caller = asyncio.create_task(load_document_async(b"%PDF", "key"))
+        await settle()
+        caller.cancel()
+        build.release.set()
+        await settle()
+
+        # The finished parse is cached, not thrown away
+        assert "key" in fresh_cache
+        assert await load_document_async(b"%PDF", "key") is fresh_cache.get("key")
+        assert len(build.sources) == 1
+
+    asyncio.run(run())
+
+
+def test_failures_reach_every_caller_and_are_not_kept(monkeypatch):
+    calls = []
+
+    async def failing_build(key, pdf):
+        calls.append(pdf)
+        await asyncio.sleep(0)
+        raise ValueError("not a PDF")
+
+    monkeypatch.setattr(doc_cache, "_build_document_async", failing_build)
+
+    async def run():
+        results = await asyncio.gather(
+            load_document_async(b"x", "key"), load_document_async(b"x", "key"), return_exceptions=True,
+        )
+        assert [type(result) for result in results] == [ValueError, ValueError]
+        assert len(calls) == 1 and doc_cache._inflight == {}
+
+        with pytest.raises(ValueError):
+            await load_document_async(b"x", "key")
+        assert len(calls) == 2
+
+    asyncio.run(run())
+
+
+def test_waiter_rebuilds_from_its_own_file_when_the_first_upload_is_gone(monkeypatch, tmp_path, fresh_cache):
+    first_path, second_path = tmp_path / "first.pdf", tmp_path / "second.pdf"
+    first_path.write_bytes(b"%PDF")
+    second_path.write_bytes(b"%PDF")
+
+    async def run():
+        build = GatedBuild(monkeypatch)
+        first = asyncio.create_task(load_document_async(first_path, "key"))
+        second = asyncio.create_task(load_document_async(second_path, "key"))
+        await settle()
+        # The first request goes away and removes its spooled upload, as read_upload does
+        first.cancel()
+        first_path.unlink()
+        build.release.set()
+
+        doc = await second
+        assert doc.key == "key"
+        assert build.sources == [first_path, second_path]
+
+    asyncio.run(run())
+
+
+def test_load_document_async_parses_and_embeds(tmp_path, stub_encoder):
+    fitz = pytest.importorskip("fitz")
+    pdf = fitz.open()
+    page = pdf.new_page()
+    page.insert_text((72, 72), "Proposals are due on May 3, 2024. A bid bond of five percent is required.")
+    path = tmp_path / "rfp.pdf"
+    pdf.save(path)
+    pdf.close()
+
+    key = digest_key("0" * 64)
+    doc = asyncio.run(load_document_async(path, key))
+    assert doc.key == key
+    assert "bid bond" in " ".join(doc.chunks.texts())
+    assert doc.embeddings.shape == (len(doc.chunks), stub_encoder.dim)
+    assert doc_cache.document_cache.get(key) is doc
@@ -0,0 +1,182 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import downloads
+from downloads import DownloadTooLarge, NotAPdf, ValidatorCache, Validators, fetch_pdf
+
+PDF = b"%PDF-1.4\n" + b"0123456789" * 1000 + b"\n%%EOF\n"
+
+
+class Route:
+    def __init__(self, body, etag=None, last_modified=None, content_length=True):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_length = content_length
+
+
+@pytest.fixture
+def server():
+    """Local HTTP server answering from a dict of path -> Route, honouring conditional GETs."""
+    routes, requests_seen = {}, []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append((self.path, dict(self.headers)))
+            route = routes.get(self.path)
+            if route is None:
+                self.send_error(404)
+                return
+            if route.etag and self.headers.get("If-None-Match") == route.etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            if route.content_length:
+                self.send_header("Content-Length", str(len(route.body)))
+            if route.etag:
+                self.send_header("ETag", route.etag)
+            if route.last_modified:
+                self.send_header("Last-Modified", route.last_modified)
+            self.end_headers()
+            self.wfile.write(route.body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{httpd.server_port}"
+    yield base, routes, requests_seen
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_validators(monkeypatch, tmp_path):
+    monkeypatch.setattr(downloads, "url_validators", ValidatorCache(8))
+    monkeypatch.setenv("UPLOAD_TMP_DIR", str(tmp_path))
+    return downloads.url_validators
+
+
+def test_download_is_hashed_and_spooled(server, tmp_path):
+    base, routes, _ = server
+    routes["/doc.pdf"] = Route(PDF)
+
+    download = fetch_pdf(f"{base}/doc.pdf")
+    assert not download.not_modified
+    assert download.path.parent == tmp_path
+    assert download.path.read_bytes() == PDF
+    assert download.sha256 == hashlib.sha256(PDF).hexdigest()
+    assert download.size == len(PDF)
+
+    download.remove()
+    download.remove()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_revalidation_with_etag(server, fresh_validators):
+    base, routes, seen = server
+    routes["/doc.pdf"] = Route(PDF, etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    first = fetch_pdf(f"{base}/doc.pdf", is_current=lambda sha256: True)
+    first.remove()
+
+    second = fetch_pdf(f"{base}/doc.pdf", is_current=lambda sha256: sha256 == first.sha256)
+    assert second.not_modified and second.sha256 == first.sha256
+    assert seen[-1][1]["If-None-Match"] == '"v1"'
+    assert seen[-1][1]["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert fresh_validators.stats() == {"urls": 1, "max_urls": 8, "downloads": 1, "not_modified": 1}
+
+
+def test_no_conditional_get_when_the_document_is_gone(server):
+    base, routes, seen = server
+    routes["/doc.pdf"] = Route(PDF, etag='"v1"')
+    fetch_pdf(f"{base}/doc.pdf").remove()
+
+    # The parsed copy was evicted: a 304 would leave us with nothing to answer from
+    download = fetch_pdf(f"{base}/doc.pdf", is_current=lambda sha256: False)
+    assert not download.not_modified
+    assert "If-None-Match" not in seen[-1][1]
+    download.remove()
+
+    download = fetch_pdf(f"{base}/doc.pdf")
+    assert "If-None-Match" not in seen[-1][1]
+    download.remove()
+
+
+def test_changed_document_is_downloaded_again(server):
+    base, routes, _ = server
+    routes["/doc.pdf"] = Route(PDF, etag='"v1"')
+    first = fetch_pdf(f"{base}/doc.pdf", is_current=lambda sha256: True)
+    first.remove()
+
+    changed = PDF + b"% appendix\n"
+    routes["/doc.pdf"] = Route(changed, etag='"v2"')
+    second = fetch_pdf(f"{base}/doc.pdf", is_current=lambda sha256: True)
+    assert not second.not_modified
+    assert second.sha256 == hashlib.sha256(changed).hexdigest()
+    assert downloads.url_validators.get(f"{base}/doc.pdf").etag == '"v2"'
+    second.remove()
+
+
+def test_validators_dropped_when_server_stops_sending_them(server):
+    base, routes, _ = server
+    url = f"{base}/doc.pdf"
+    routes["/doc.pdf"] = Route(PDF, etag='"v1"')
+    fetch_pdf(url).remove()
+    assert downloads.url_validators.get(url) is not None
+
+    routes["/doc.pdf"] = Route(PDF)
+    fetch_pdf(url).remove()
+    assert downloads.url_validators.get(url) is None
+
+
+def test_too_large_by_content_length(server, tmp_path):
+    base, routes, _ = server
+    routes["/big.pdf"] = Route(PDF)
+    with pytest.raises(DownloadTooLarge):
+        fetch_pdf(f"{base}/big.pdf", max_bytes=len(PDF) - 1)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_too_large_while_streaming(server, tmp_path, monkeypatch):
+    base, routes, _ = server
+    routes["/big.pdf"] = Route(PDF, content_length=False)
+    monkeypatch.setattr(downloads, "CHUNK_BYTES", 1024)
+    with pytest.raises(DownloadTooLarge):
+        fetch_pdf(f"{base}/big.pdf", max_bytes=4096)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_not_a_pdf(server, tmp_path):
+    base, routes, _ = server
+    routes["/page.html"] = Route(b"<html><body>Sign in</body></html>")
+    with pytest.raises(NotAPdf):
+        fetch_pdf(f"{base}/page.html")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_http_errors_are_raised(server):
+    base, _, _ = server
+    with pytest.raises(requests.HTTPError):
+        fetch_pdf(f"{base}/missing.pdf")
+
+
+def test_validator_cache_is_lru():
+    cache = ValidatorCache(max_entries=2)
+    for url in ("a", "b"):
+        cache.put(url, Validators(url, None, url))
+    cache.get("a")
+    cache.put("c", Validators("c", None, "c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a").etag == "a" and cache.get("c").etag == "c"
+    cache.discard("a")
+    cache.discard("a")
+    assert cache.stats()["urls"] == 1
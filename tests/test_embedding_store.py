@@ -0,0 +1,180 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from embedding_store import EmbeddingStore, open_default_store, text_key
+
+DIM = 8
+
+
+def batch(start, count):
+    texts = [f"chunk {i}" for i in range(start, start + count)]
+    vectors = np.arange(start * DIM, (start + count) * DIM, dtype=np.float32).reshape(count, DIM) / 1000
+    return [text_key(text) for text in texts], vectors
+
+
+def segment_files(store):
+    return sorted(name for name in os.listdir(store.path) if name.endswith(".vecs.npy"))
+
+
+def test_round_trip_and_reopen(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "org/model")
+    keys, vectors = batch(0, 5)
+    # Repeats within a batch are stored once
+    store.add(keys + keys[:2], np.concatenate([vectors, vectors[:2]]))
+    assert len(store) == 5
+
+    found, missing = store.get_many([keys[3], text_key("unknown"), keys[0]])
+    assert missing == [1]
+    np.testing.assert_array_equal(found[0], vectors[3])
+    np.testing.assert_array_equal(found[2], vectors[0])
+    assert not found[0].flags.writeable
+
+    # Stored keys are skipped, so a repeat add writes nothing
+    store.add(keys, vectors)
+    assert len(segment_files(store)) == 1
+
+    reopened = EmbeddingStore(str(tmp_path), "org/model")
+    assert os.path.basename(reopened.path) == "org_model-float32"
+    found, missing = reopened.get_many(keys)
+    assert missing == []
+    np.testing.assert_array_equal(np.stack(found), vectors)
+
+
+def test_float16_store(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "model", dtype="float16")
+    keys, vectors = batch(0, 4)
+    store.add(keys, vectors)
+
+    found, _ = EmbeddingStore(str(tmp_path), "model", dtype="float16").get_many(keys)
+    assert all(row.dtype == np.float16 for row in found)
+    np.testing.assert_allclose(np.stack(found).astype(np.float32), vectors, rtol=1e-3)
+
+    # Each precision is a store of its own
+    assert len(EmbeddingStore(str(tmp_path), "model")) == 0
+    with pytest.raises(ValueError):
+        EmbeddingStore(str(tmp_path), "model", dtype="int8")
+
+
+def test_read_only_store(tmp_path):
+    reader = EmbeddingStore(str(tmp_path), "model", read_only=True)
+    assert not os.path.exists(reader.path) and len(reader) == 0
+
+    keys, vectors = batch(0, 3)
+    reader.add(keys, vectors)
+    assert not os.path.exists(reader.path)
+    with pytest.raises(ValueError):
+        reader.compact()
+
+    # Sees what a writer adds, on the next lookup that misses
+    EmbeddingStore(str(tmp_path), "model").add(keys, vectors)
+    found, missing = reader.get_many(keys)
+    assert missing == []
+    np.testing.assert_array_equal(np.stack(found), vectors)
+
+
+def test_refresh_skips_the_listing_while_the_directory_is_unchanged(tmp_path):
+    reader = EmbeddingStore(str(tmp_path), "model")
+    writer = EmbeddingStore(str(tmp_path), "model")
+    settled = os.stat(reader.path).st_mtime_ns - 10 ** 10
+    os.utime(reader.path, ns=(settled, settled))
+    reader.refresh()
+
+    keys, vectors = batch(0, 2)
+    writer.add(keys, vectors)
+    # Pretend the rename did not bump the mtime: the reader does not list the directory again
+    os.utime(reader.path, ns=(settled, settled))
+    assert reader.get_many(keys)[1] == [0, 1]
+
+    os.utime(reader.path)
+    assert reader.get_many(keys)[1] == []
+
+
+def test_add_merges_all_but_the_largest_segment(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "model", max_segments=3)
+    keys, vectors = batch(0, 50)
+    store.add(keys, vectors)
+    (largest,) = segment_files(store)
+
+    added = [(keys, vectors)]
+    for start in range(50, 60):
+        added.append(batch(start, 1))
+        store.add(*added[-1])
+        assert len(segment_files(store)) <= 3 and len(store._segments) <= 3
+
+    # The bulk of the store was never rewritten
+    assert largest in segment_files(store)
+    for keys, vectors in added:
+        found, missing = store.get_many(keys)
+        assert missing == []
+        np.testing.assert_array_equal(np.stack(found), vectors)
+
+
+def test_compact_merges_everything_and_other_processes_drop_the_old_maps(tmp_path):
+    writer = EmbeddingStore(str(tmp_path), "model", max_segments=0)
+    reader = EmbeddingStore(str(tmp_path), "model", read_only=True)
+    keys, vectors = batch(0, 12)
+    for start in range(0, 12, 3):
+        writer.add(keys[start:start + 3], vectors[start:start + 3])
+    assert len(segment_files(writer)) == 4
+    reader.refresh()
+    assert len(reader._segments) == 4
+
+    writer.compact()
+    assert len(segment_files(writer)) == 1 and len(writer._segments) == 1
+
+    reader.refresh()
+    assert len(reader._segments) == 1
+    found, missing = reader.get_many(keys)
+    assert missing == []
+    np.testing.assert_array_equal(np.stack(found), vectors)
+
+
+def test_lookups_stay_correct_while_adding_and_compacting(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "model", max_segments=2)
+    known_keys, known_vectors = batch(0, 20)
+    for start in range(0, 20, 5):
+        store.add(known_keys[start:start + 5], known_vectors[start:start + 5])
+
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        try:
+            while not stop.is_set():
+                found, missing = store.get_many(known_keys)
+                assert missing == []
+                np.testing.assert_array_equal(np.stack(found), known_vectors)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    try:
+        for start in range(20, 80, 2):
+            store.add(*batch(start, 2))
+            if start % 10 == 0:
+                store.compact()
+    finally:
+        stop.set()
+        for thread in readers:
+            thread.join()
+
+    assert errors == []
+    assert len(store) == 80
+    assert len(segment_files(store)) <= 2
+
+
+def test_open_default_store(monkeypatch, tmp_path):
+    monkeypatch.setenv("EMBEDDING_STORE_DIR", "")
+    assert open_default_store("model") is None
+
+    monkeypatch.setenv("EMBEDDING_STORE_DIR", str(tmp_path))
+    monkeypatch.setenv("EMBEDDING_STORE_DTYPE", "float16")
+    monkeypatch.setenv("EMBEDDING_STORE_MAX_SEGMENTS", "4")
+    store = open_default_store("model")
+    assert store.dtype == np.float16 and store.max_segments == 4 and not store.read_only
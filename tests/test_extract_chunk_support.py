@@ -0,0 +1,137 @@
+import random
+import re
+
+import pytest
+
+from extract_chunk_support import ChunkSpan, chunk_text, iter_chunks
+
+WORDS = "bid bond proposal vendor delivery shall must county agency price term contract award notice".split()
+
+
+def reference_chunk_text(text, chunk_size=500, overlap=50):
+    # chunk_text before the offset-based rewrite: rebuilds the chunk string per sentence
+    sentences = re.split(r"(?<=[.?!])\s+", text)
+    chunks = []
+    current_chunk = ""
+    for sentence in sentences:
+        if len(current_chunk) + len(sentence) + 1 > chunk_size:
+            chunks.append(current_chunk.strip())
+            if overlap > 0 and chunks[-1]:
+                overlap_text = chunks[-1][-overlap:]
+                current_chunk = (overlap_text + " " + sentence).strip()
+            else:
+                current_chunk = sentence
+        else:
+            current_chunk = (current_chunk + " " + sentence).strip()
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+def normalized_text(sentences, seed=0, max_words=40):
+    # Extracted text is whitespace-normalized: single spaces between sentences
+    rng = random.Random(seed)
+    return " ".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, max_words))).capitalize() + rng.choice(".?!")
+        for _ in range(sentences)
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("chunk_size, overlap", [(500, 50), (200, 0), (120, 30), (1000, 100)])
+def test_same_chunks_as_the_old_chunker(seed, chunk_size, overlap):
+    text = normalized_text(200, seed)
+    expected = [chunk for chunk in reference_chunk_text(text, chunk_size, overlap) if chunk]
+    assert chunk_text(text, chunk_size, overlap) == expected
+
+
+def test_long_sentences_stay_whole():
+    text = normalized_text(30, seed=1, max_words=200)
+    expected = [chunk for chunk in reference_chunk_text(text, 100, 20) if chunk]
+    assert chunk_text(text, 100, 20) == expected
+
+
+def test_spans_point_into_the_text():
+    text = normalized_text(100, seed=2)
+    spans = list(iter_chunks(text, chunk_size=300, overlap=40))
+    assert spans[0].start == 0 and spans[-1].end == len(text)
+    for previous, span in zip(spans, spans[1:]):
+        assert previous.start < span.start <= previous.end
+    for span in spans:
+        chunk = text[span.start:span.end]
+        assert chunk == chunk.strip()
+    covered = set()
+    for span in spans:
+        covered.update(range(span.start, span.end))
+    # Only the single spaces between chunks may be left out
+    assert all(text[i] == " " for i in set(range(len(text))) - covered)
+
+
+def test_page_provenance():
+    pages = [normalized_text(10, seed=page) for page in range(3)]
+    text = " ".join(pages)
+    page_starts = [0]
+    for page in pages[:-1]:
+        page_starts.append(page_starts[-1] + len(page) + 1)
+
+    spans = list(iter_chunks(text, page_starts, chunk_size=200, overlap=20))
+    for span in spans:
+        first = max(i for i, start in enumerate(page_starts) if start <= span.start) + 1
+        last = max(i for i, start in enumerate(page_starts) if start <= span.end - 1) + 1
+        assert (span.page, span.page_end) == (first, last)
+    assert spans[0].page == 1 and spans[-1].page_end == 3
+    assert any(span.page != span.page_end for span in spans)
+
+
+def test_max_tokens_limit():
+    def words(s):
+        return len(s.split())
+
+    text = normalized_text(80, seed=3, max_words=60)
+    spans = list(iter_chunks(text, chunk_size=10_000, overlap=30, max_tokens=50, count_tokens=words))
+    assert all(words(text[span.start:span.end]) <= 50 for span in spans)
+
+    # Over-long sentences are split at spaces, never inside a word (overlaps may start mid-word)
+    for span in iter_chunks(text, chunk_size=10_000, overlap=0, max_tokens=50, count_tokens=words):
+        assert span.start == 0 or text[span.start - 1] == " "
+        assert span.end == len(text) or text[span.end] == " "
+
+
+def test_empty_and_tiny_texts():
+    assert list(iter_chunks("")) == []
+    assert list(iter_chunks("One sentence.")) == [ChunkSpan(0, 13, 1, 1)]
+    assert chunk_text("First. Second.", chunk_size=8, overlap=0) == ["First.", "Second."]
+
+
+@pytest.fixture
+def long_pdf(tmp_path):
+    fitz = pytest.importorskip("fitz")
+    pdf = fitz.open()
+    for page in range(1, 13):
+        p = pdf.new_page()
+        p.insert_text((72, 72), "ACME County RFP 2024")  # header repeated on every page
+        p.insert_text((72, 100), normalized_text(3, seed=page, max_words=8))
+        p.insert_text((72, 128), f"Unique line of section {page}.")
+        p.insert_text((72, 760), f"Page {page}")
+    path = tmp_path / "long.pdf"
+    pdf.save(path)
+    pdf.close()
+    return path
+
+
+def test_sharded_extraction_matches_sequential(monkeypatch, long_pdf):
+    import extract_chunk_support
+
+    monkeypatch.setattr(extract_chunk_support, "PDF_PARALLEL_MIN_PAGES", 1)
+    assert extract_chunk_support.uses_sharded_extraction(12, workers=2)
+
+    sequential = extract_chunk_support._extract_pdf_pages(long_pdf, workers=1)
+    assert extract_chunk_support._extract_pdf_pages(long_pdf, workers=2) == sequential
+    assert extract_chunk_support._extract_pdf_pages(long_pdf.read_bytes(), workers=2) == sequential
+
+    text, page_starts = sequential
+    assert len(page_starts) == 12
+    # Repeats are dropped across shards, not just within one
+    assert "ACME County" not in text and "Page 7" not in text
+    for page, start in enumerate(page_starts, 1):
+        assert text.find(f"Unique line of section {page}.") >= start
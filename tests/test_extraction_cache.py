@@ -0,0 +1,136 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import rfp_extractor
+import rfp_sections
+from extraction_cache import ExtractionCache, extraction_key, file_sha256
+from rfp_extractor import RFPExtractor
+from rfp_sections import Section
+
+HTML = "<html><body><h1>RFP 2024-17: Network Switches</h1><p>Proposals due May 3, 2024.</p></body></html>"
+
+
+class ScriptedClient:
+    """Stands in for llm_client.LLMClient, answering (or raising) from a script."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def create(self, messages, model=None, label="chat", **kwargs):
+        response = self.responses[min(self.calls, len(self.responses) - 1)]
+        self.calls += 1
+        if isinstance(response, Exception):
+            raise response
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=response))])
+
+
+def valid_json(fields=RFPExtractor.EXPECTED_FIELDS):
+    return json.dumps({field: "Not specified" for field in fields} | {"Bid Number": "2024-17"})
+
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / "rfp.html"
+    path.write_text(HTML)
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def extractor_with(cache, client):
+    extractor = RFPExtractor(api_key="test", cache=cache)
+    extractor.client = client
+    return extractor
+
+
+def test_successful_extraction_is_reused(document, cache):
+    client = ScriptedClient(valid_json())
+    first = extractor_with(cache, client).process_document(document, verbose=False)
+    second = extractor_with(cache, client).process_document(document, verbose=False)
+
+    assert client.calls == 1
+    assert second == first
+    assert first["extracted_fields"]["Bid Number"] == "2024-17"
+    assert cache.stats() == {"hits": 1, "misses": 1, "stored": 1, "entries": 1}
+
+
+def test_unparseable_response_is_not_cached(document, cache):
+    client = ScriptedClient("not json", valid_json())
+    first = extractor_with(cache, client).process_document(document, verbose=False)
+    second = extractor_with(cache, client).process_document(document, verbose=False)
+
+    assert set(first["extracted_fields"].values()) == {"Error extracting"}
+    assert second["extracted_fields"]["Bid Number"] == "2024-17"
+    assert client.calls == 2
+    assert len(cache) == 1
+
+
+def test_sectioned_unparseable_response_is_not_cached(document, cache, monkeypatch):
+    monkeypatch.setattr(rfp_sections, "RFP_LONG_MODE", "always")
+    client = ScriptedClient("not json")
+    result = extractor_with(cache, client).process_document(document, verbose=False)
+    extractor_with(cache, client).process_document(document, verbose=False)
+
+    # Merged as "Not specified", but still a failure that must be retried
+    assert set(result["extracted_fields"].values()) == {"Not specified"}
+    assert client.calls == 2
+    assert len(cache) == 0
+
+
+def test_sectioned_partial_failure_is_returned_but_not_cached(document, cache, monkeypatch):
+    monkeypatch.setattr(rfp_sections, "RFP_LONG_MODE", "always")
+    monkeypatch.setattr(rfp_extractor, "RFP_MAP_WORKERS", 1)
+    monkeypatch.setattr(rfp_extractor, "split_sections", lambda text: [Section(0, len(text) // 2),
+                                                                        Section(len(text) // 2, len(text))])
+
+    extractor = extractor_with(cache, ScriptedClient(RuntimeError("connection reset"), valid_json()))
+    rfp_data, complete = extractor.extract_rfp_information_by_sections(HTML)
+    assert not complete
+    assert rfp_data["Bid Number"] == "2024-17"
+
+    extractor = extractor_with(cache, ScriptedClient(RuntimeError("connection reset"), valid_json()))
+    result = extractor.process_document(document, verbose=False)
+    assert result["extracted_fields"]["Bid Number"] == "2024-17"
+    assert len(cache) == 0
+
+
+def test_sectioned_all_failed_raises(document, cache, monkeypatch):
+    monkeypatch.setattr(rfp_sections, "RFP_LONG_MODE", "always")
+    client = ScriptedClient(RuntimeError("connection reset"))
+    with pytest.raises(Exception, match="section calls failed"):
+        extractor_with(cache, client).process_document(document, verbose=False)
+    assert len(cache) == 0
+
+
+def test_key_depends_on_content_and_namespace(document, tmp_path):
+    copy = tmp_path / "renamed.html"
+    copy.write_text(HTML)
+    assert file_sha256(str(copy)) == file_sha256(str(document))
+
+    sha = file_sha256(str(document))
+    assert extraction_key(sha, "a") == extraction_key(sha, "a")
+    assert extraction_key(sha, "a") != extraction_key(sha, "b")
+
+    copy.write_text(HTML + " ")
+    assert file_sha256(str(copy)) != sha
+
+
+def test_namespace_changes_with_prompt_version(cache):
+    extractor = extractor_with(cache, ScriptedClient(valid_json()))
+    namespace = extractor.cache_namespace()
+    extractor.PROMPT_VERSION = "2"
+    assert extractor.cache_namespace() != namespace
+
+
+def test_purge(document, cache):
+    extractor_with(cache, ScriptedClient(valid_json())).process_document(document, verbose=False)
+    assert cache.purge() == 1
+    assert len(cache) == 0
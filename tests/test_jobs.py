@@ -0,0 +1,147 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import jobs
+from jobs import DONE, FAILED, QUEUED, JobItem, JobQueue, QueueFull
+
+
+def items(*questions_per_doc):
+    return [JobItem(i, f"doc{i}.pdf", f"source{i}", list(questions)) for i, questions in enumerate(questions_per_doc)]
+
+
+async def wait_for(job, timeout=5):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while job.remaining:
+        assert asyncio.get_running_loop().time() < deadline, "job did not finish"
+        await asyncio.sleep(0.005)
+
+
+class Pipeline:
+    """Fake document loader and answerer recording loads and LLM-side concurrency."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.loads = []
+        self.released = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def load_document(self, item):
+        self.loads.append(item.source)
+        await asyncio.sleep(0)
+        if item.source in self.fail:
+            raise RuntimeError(f"cannot open {item.source}")
+        return item.source
+
+    async def answer(self, doc, questions):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # Later groups finish first, so answers come back out of order
+        await asyncio.sleep(0.01 / len(questions[0]))
+        self.in_flight -= 1
+        return [f"{doc}: {question}" for question in questions]
+
+    def release(self, item):
+        self.released.append(item.source)
+
+    def queue(self, monkeypatch, **env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        return JobQueue(self.load_document, self.answer, self.release)
+
+
+def test_job_answers_every_question_in_order(monkeypatch):
+    pipeline = Pipeline()
+
+    async def run():
+        queue = pipeline.queue(monkeypatch, JOB_QUESTIONS_PER_CALL=2)
+        questions = ["q" * n for n in range(1, 8)]
+        job = queue.submit(items(questions, ["only"]))
+        assert job.status == QUEUED
+        await wait_for(job)
+        await queue.shutdown()
+        return job
+
+    job = asyncio.run(run())
+    assert job.status == DONE and job.finished is not None
+    first, second = job.items
+    assert first.answers == [f"source0: {'q' * n}" for n in range(1, 8)]
+    assert second.answers == ["source1: only"]
+    assert sorted(pipeline.loads) == ["source0", "source1"]
+    assert sorted(pipeline.released) == ["source0", "source1"]
+
+    results = job.results()
+    assert results["items"] == {"queued": 0, "running": 0, "done": 2, "failed": 0}
+    assert results["questions"] == 8
+    assert [item["document"] for item in results["results"]] == ["doc0.pdf", "doc1.pdf"]
+
+
+def test_llm_concurrency_is_bounded_across_jobs(monkeypatch):
+    pipeline = Pipeline()
+
+    async def run():
+        queue = pipeline.queue(monkeypatch, JOB_WORKERS=4, JOB_LLM_CONCURRENCY=2, JOB_QUESTIONS_PER_CALL=1)
+        submitted = [queue.submit(items(["a", "bb", "ccc"], ["dddd"])) for _ in range(3)]
+        for job in submitted:
+            await wait_for(job)
+        await queue.shutdown()
+
+    asyncio.run(run())
+    assert pipeline.max_in_flight == 2
+
+
+def test_failed_documents_do_not_fail_the_job(monkeypatch):
+    pipeline = Pipeline(fail={"source1"})
+
+    async def run():
+        queue = pipeline.queue(monkeypatch)
+        ok = queue.submit(items(["a"], ["b"]))
+        bad = queue.submit([JobItem(0, "broken.pdf", "source1", ["c"])])
+        await wait_for(ok)
+        await wait_for(bad)
+        await queue.shutdown()
+        return ok, bad
+
+    ok, bad = asyncio.run(run())
+    assert ok.status == DONE
+    assert [item.status for item in ok.items] == [DONE, FAILED]
+    assert ok.items[1].error == "cannot open source1" and ok.items[1].answers is None
+    assert bad.status == FAILED
+    assert sorted(pipeline.released) == ["source0", "source1", "source1"]
+
+
+def test_full_queue_refuses_jobs(monkeypatch):
+    pipeline = Pipeline()
+
+    async def run():
+        queue = pipeline.queue(monkeypatch, JOB_MAX_PENDING=3)
+        queue.submit(items(["a"], ["b"]))
+        with pytest.raises(QueueFull):
+            queue.submit(items(["c"], ["d"]))
+        assert queue.stats()["pending_documents"] == 2
+        await queue.shutdown()
+
+    asyncio.run(run())
+    # Items that never ran are released on shutdown
+    assert sorted(pipeline.released) == ["source0", "source1"]
+
+
+def test_finished_jobs_expire(monkeypatch):
+    pipeline = Pipeline()
+
+    async def run():
+        queue = pipeline.queue(monkeypatch, JOB_TTL=60)
+        job = queue.submit(items(["a"]))
+        await wait_for(job)
+        assert queue.get(job.id) is job
+
+        finished = job.finished
+        monkeypatch.setattr(jobs, "time", SimpleNamespace(time=lambda: finished + 61, perf_counter=time.perf_counter))
+        queue.submit(items(["b"]))
+        assert queue.get(job.id) is None
+        await queue.shutdown()
+
+    asyncio.run(run())
@@ -0,0 +1,194 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import groq
+import httpx
+import pytest
+
+import llm_client
+from llm_client import LLMClient, llm_stats
+
+REQUEST = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+MESSAGES = [{"role": "user", "content": "When are proposals due?"}]
+
+
+def status_error(cls, status, retry_after=None):
+    headers = {"retry-after": retry_after} if retry_after is not None else {}
+    return cls(f"HTTP {status}", response=httpx.Response(status, headers=headers, request=REQUEST), body=None)
+
+
+def completion(text="May 3", completion_tokens=3):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+        usage=SimpleNamespace(prompt_tokens=20, completion_tokens=completion_tokens),
+    )
+
+
+class Script:
+    """chat.completions.create raising or returning the scripted outcomes in turn."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, model, **kwargs):
+        outcome = self.outcomes[min(self.calls, len(self.outcomes) - 1)]
+        self.calls += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """An LLMClient with 4 retries whose sleeps are recorded, not slept, and full jitter at its ceiling."""
+    monkeypatch.setenv("GROQ_MAX_RETRIES", "4")
+    monkeypatch.setenv("GROQ_BACKOFF_BASE", "0.5")
+    monkeypatch.setenv("GROQ_BACKOFF_MAX", "20")
+    monkeypatch.setattr(llm_client, "_stats", {})
+    sleeps = []
+    monkeypatch.setattr(llm_client, "time", SimpleNamespace(sleep=sleeps.append, perf_counter=time.perf_counter))
+    monkeypatch.setattr(llm_client, "random", SimpleNamespace(uniform=lambda low, high: high))
+
+    client = LLMClient("test")
+    client.sleeps = sleeps
+
+    def script(*outcomes):
+        client._sync_client = Script(*outcomes)
+        return client._sync_client
+
+    client.script = script
+    return client
+
+
+RETRYABLE = {
+    "429": lambda: status_error(groq.RateLimitError, 429),
+    "500": lambda: status_error(groq.InternalServerError, 500),
+    "503": lambda: status_error(groq.InternalServerError, 503),
+    "connection": lambda: groq.APIConnectionError(request=REQUEST),
+    "timeout": lambda: groq.APITimeoutError(request=REQUEST),
+}
+
+NOT_RETRYABLE = {
+    "400": lambda: status_error(groq.BadRequestError, 400),
+    "401": lambda: status_error(groq.AuthenticationError, 401),
+    "404": lambda: status_error(groq.NotFoundError, 404),
+    "bug": lambda: ValueError("not an API error"),
+}
+
+
+@pytest.mark.parametrize("error", RETRYABLE.values(), ids=RETRYABLE.keys())
+def test_retryable_errors_are_retried(client, error):
+    script = client.script(error(), completion())
+    assert client.create(MESSAGES, label="answer").choices[0].message.content == "May 3"
+    assert script.calls == 2 and client.sleeps == [0.5]
+
+    stats = llm_stats()["answer"]
+    assert (stats["calls"], stats["retries"], stats["errors"], stats["completion_tokens"]) == (1, 1, 0, 3)
+
+
+@pytest.mark.parametrize("error", NOT_RETRYABLE.values(), ids=NOT_RETRYABLE.keys())
+def test_other_errors_fail_at_once(client, error):
+    expected = error()
+    script = client.script(expected, completion())
+    with pytest.raises(type(expected)):
+        client.create(MESSAGES, label="answer")
+    assert script.calls == 1 and client.sleeps == []
+    assert llm_stats()["answer"]["errors"] == 1
+
+
+def test_backoff_doubles_up_to_the_ceiling(client, monkeypatch):
+    client.backoff_max = 3
+    client.script(*[status_error(groq.InternalServerError, 500)] * 4, completion())
+    client.create(MESSAGES)
+    assert client.sleeps == [0.5, 1, 2, 3]
+
+    # Jitter draws from [0, ceiling]
+    bounds = []
+
+    def uniform(low, high):
+        bounds.append((low, high))
+        return 0
+
+    monkeypatch.setattr(llm_client, "random", SimpleNamespace(uniform=uniform))
+    client.script(status_error(groq.InternalServerError, 500), completion())
+    client.create(MESSAGES)
+    assert bounds == [(0, 0.5)] and client.sleeps[-1] == 0
+
+
+@pytest.mark.parametrize("retry_after, slept", [
+    # The server's hint wins over a shorter jitter, a longer jitter is kept
+    ("7", 7.0),
+    ("0.25", 0.5),
+    # The hint is capped at the backoff ceiling, and ignored when it is not a number of seconds
+    ("100", 20),
+    ("soon", 0.5),
+])
+def test_retry_after_takes_priority_over_jitter(client, retry_after, slept):
+    client.script(status_error(groq.RateLimitError, 429, retry_after), completion())
+    client.create(MESSAGES)
+    assert client.sleeps == [slept]
+
+
+def test_stats_on_final_failure(client):
+    script = client.script(status_error(groq.InternalServerError, 502))
+    with pytest.raises(groq.InternalServerError):
+        client.create(MESSAGES, label="answer")
+
+    assert script.calls == 5 and client.sleeps == [0.5, 1, 2, 4]
+    stats = llm_stats()["answer"]
+    assert (stats["calls"], stats["errors"], stats["retries"]) == (1, 1, 4)
+    assert stats["prompt_tokens"] > 0 and stats["completion_tokens"] == 0
+    # Failed calls add no latency samples
+    assert stats["max_s"] == 0.0
+
+
+def test_rate_limits_are_reported_to_the_limiter(client):
+    class Limiter:
+        def __init__(self):
+            self.events = []
+
+        def estimate(self, prompt_tokens):
+            return prompt_tokens + 10
+
+        def acquire(self, tokens):
+            self.events.append("acquire")
+
+        def rate_limited(self, retry_after):
+            self.events.append(("rate_limited", retry_after))
+
+        def record(self, completion_tokens):
+            self.events.append(("record", completion_tokens))
+
+    limiter = Limiter()
+    client.script(status_error(groq.RateLimitError, 429, "3"), status_error(groq.InternalServerError, 500),
+                  completion(completion_tokens=8))
+    client.create(MESSAGES, limiter=limiter)
+    assert limiter.events == ["acquire", ("rate_limited", 3.0), "acquire", "acquire", ("record", 8)]
+
+
+def test_async_calls_retry_the_same_way(monkeypatch):
+    monkeypatch.setenv("GROQ_MAX_RETRIES", "2")
+    monkeypatch.setenv("GROQ_BACKOFF_BASE", "0.001")
+    monkeypatch.setattr(llm_client, "_stats", {})
+    outcomes = [groq.APIConnectionError(request=REQUEST), status_error(groq.RateLimitError, 429), completion()]
+
+    async def create(messages, model, **kwargs):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def run():
+        client = LLMClient("test")
+        client._async_clients[asyncio.get_running_loop()] = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=create)),
+        )
+        return await client.acreate(MESSAGES, label="answer")
+
+    assert asyncio.run(run()).choices[0].message.content == "May 3"
+    assert outcomes == []
+    stats = llm_stats()["answer"]
+    assert (stats["calls"], stats["retries"], stats["errors"]) == (1, 2, 0)
@@ -0,0 +1,143 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import query
+from answer_cache import AnswerCache, MemoryAnswerBackend
+
+QUESTIONS = ["When are proposals due?", "Who is the contact?", "Is there a bid bond?", "How long is the term?"]
+
+
+class FakeStream:
+    """Async iterator over chat completion chunks, as the Groq SDK streams them."""
+
+    def __init__(self, pieces, events):
+        self.pieces = pieces
+        self.events = events
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        # A keep-alive chunk without choices comes first, as the API sometimes sends
+        yield SimpleNamespace(choices=[])
+        for piece in self.pieces:
+            self.events.append(f"chunk {piece!r}")
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None))])
+
+
+class FakeClient:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.events = []
+        self.prompts = []
+
+    async def acreate(self, messages, model, label, stream=False):
+        self.prompts.append(messages[0]["content"])
+        self.events.append(label)
+        if stream:
+            return FakeStream(self.pieces, self.events)
+        message = SimpleNamespace(content="".join(self.pieces))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Installs a fake client streaming the given pieces and an in-memory answer cache."""
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+
+    async def retrieve_context(client, chunks, embeddings, queries, index=None, mode="keywords"):
+        return "context"
+
+    monkeypatch.setattr(query, "_retrieve_context", retrieve_context)
+
+    def install(pieces, cached=None):
+        client = FakeClient(pieces)
+        cache = AnswerCache(MemoryAnswerBackend())
+        namespace = query._answer_namespace(query._retrieval_mode())
+        for i, answer in (cached or {}).items():
+            cache.store("doc", namespace, [QUESTIONS[i]], [answer])
+        monkeypatch.setattr(query, "get_client", lambda api_key: client)
+        monkeypatch.setattr(query, "answer_cache", cache)
+        return client, cache
+
+    return install
+
+
+def stream(questions, client=None):
+    async def run():
+        answers = []
+        async for answer in query.stream_answers(None, None, questions, doc_key="doc"):
+            if client is not None:
+                client.events.append(f"yield {answer!r}")
+            answers.append(answer)
+        return answers
+
+    return asyncio.run(run())
+
+
+def answer(questions):
+    return asyncio.run(query.answer_questions_async(None, None, questions, doc_key="doc"))["answers"]
+
+
+def cached_answers(cache, questions):
+    return cache.lookup("doc", query._answer_namespace(query._retrieval_mode()), questions)
+
+
+def test_cached_answers_are_yielded_around_the_streamed_ones(llm):
+    client, cache = llm(["Ma", "y 3 |", " bid bond of 5%", " | 2 y", "ears"], cached={1: "J. Smith"})
+
+    assert stream(QUESTIONS, client) == ["May 3", "J. Smith", "bid bond of 5%", "2 years"]
+    # Only the misses are asked, and each answer goes out as soon as its '|' arrives
+    assert "Who is the contact?" not in client.prompts[0]
+    assert client.events == [
+        "answer_stream", "chunk 'Ma'", "chunk 'y 3 |'", "yield 'May 3'", "yield 'J. Smith'",
+        "chunk ' bid bond of 5%'", "chunk ' | 2 y'", "yield 'bid bond of 5%'", "chunk 'ears'", "yield '2 years'",
+    ]
+    assert cached_answers(cache, QUESTIONS) == ["May 3", "J. Smith", "bid bond of 5%", "2 years"]
+
+
+def test_leading_cached_answers_are_yielded_before_the_llm_call(llm):
+    client, _ = llm(["Yes | 2 years"], cached={0: "May 3", 1: "J. Smith"})
+
+    assert stream(QUESTIONS, client) == ["May 3", "J. Smith", "Yes", "2 years"]
+    assert client.events[:3] == ["yield 'May 3'", "yield 'J. Smith'", "answer_stream"]
+
+
+def test_fully_cached_questions_make_no_llm_call(llm):
+    client, _ = llm([], cached={0: "May 3", 1: "J. Smith"})
+
+    assert stream(QUESTIONS[:2], client) == ["May 3", "J. Smith"]
+    assert client.prompts == []
+
+
+def test_leading_dash_is_dropped(llm):
+    llm(["-", " | May 3 | - | J. Smith"])
+
+    # Only a leading '-' is the LLM's artefact; a later one is an answer
+    assert stream(QUESTIONS[:3]) == ["May 3", "-", "J. Smith"]
+    llm(["-", " | May 3 | - | J. Smith"])
+    assert answer(QUESTIONS[:3]) == ["May 3", "-", "J. Smith"]
+
+
+def test_fewer_answers_than_asked_still_yield_the_cached_ones(llm):
+    _, cache = llm(["May 3 |"], cached={1: "J. Smith", 3: "2 years"})
+
+    assert stream(QUESTIONS) == ["May 3", "J. Smith", "2 years"]
+    # The answers cannot be attributed to questions, so none are cached
+    assert cached_answers(cache, QUESTIONS) == [None, "J. Smith", None, "2 years"]
+
+    llm(["May 3 |"], cached={1: "J. Smith", 3: "2 years"})
+    assert answer(QUESTIONS) == ["May 3", "J. Smith", "2 years"]
+
+
+def test_extra_answers_follow_the_cached_ones(llm):
+    _, cache = llm(["May 3 | and also | more"], cached={1: "J. Smith"})
+
+    assert stream(QUESTIONS[:2]) == ["May 3", "J. Smith", "and also", "more"]
+    assert cached_answers(cache, QUESTIONS[:2]) == [None, "J. Smith"]
+
+    llm(["May 3 | and also | more"], cached={1: "J. Smith"})
+    assert answer(QUESTIONS[:2]) == ["May 3", "J. Smith", "and also", "more"]
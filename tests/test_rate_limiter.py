@@ -0,0 +1,199 @@
+import json
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import groq
+import httpx
+import pytest
+
+import rate_limiter
+from llm_client import LLMClient
+from rate_limiter import RateLimiter, TokenBucket
+from rfp_extractor import RFPExtractor
+
+
+class FakeClock:
+    """monotonic() and sleep() for rate_limiter: sleeping only advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    return clock
+
+
+def test_bucket_refills_continuously(clock):
+    bucket = TokenBucket(60)
+    bucket.level = 0
+    bucket.refill(clock.now + 10, scale=1.0)
+    assert bucket.level == pytest.approx(10)
+    bucket.refill(clock.now + 20, scale=0.5)
+    assert bucket.level == pytest.approx(15)
+    bucket.refill(clock.now + 1000, scale=1.0)
+    assert bucket.level == 60
+
+
+def test_bucket_wait_time(clock):
+    bucket = TokenBucket(60)
+    assert bucket.wait_time(60, 1.0) == 0
+    bucket.level = 0
+    assert bucket.wait_time(6, 1.0) == pytest.approx(6)
+    assert bucket.wait_time(6, 0.5) == pytest.approx(12)
+    # Larger than the bucket: waits for a full bucket, not forever
+    assert bucket.wait_time(600, 1.0) == pytest.approx(60)
+
+
+def test_acquire_spreads_calls_over_the_minute(clock):
+    limiter = RateLimiter(rpm=6, tpm=1_000_000)
+    for _ in range(6):
+        limiter.acquire(100)
+    assert clock.slept == []
+
+    limiter.acquire(100)
+    assert clock.slept == [pytest.approx(10)]
+    assert limiter.stats()["waited_s"] == pytest.approx(10)
+
+
+def test_acquire_waits_for_tokens(clock):
+    limiter = RateLimiter(rpm=1000, tpm=6000)
+    limiter.acquire(6000)
+    limiter.acquire(600)
+    assert sum(clock.slept) == pytest.approx(6)
+
+    # Oversized requests take a full bucket instead of blocking forever
+    limiter.acquire(60_000)
+    assert limiter.tokens.level == pytest.approx(0)
+
+
+def test_rate_limited_backs_off_and_pauses(clock):
+    limiter = RateLimiter(rpm=60, tpm=60_000)
+    limiter.rate_limited(retry_after=5)
+    assert limiter.scale == 0.5
+    assert limiter.requests.level == 0 and limiter.tokens.level == 0
+
+    limiter.acquire(10)
+    # Paused for Retry-After; the half-rate refill of those 5 s covers the request
+    assert sum(clock.slept) == pytest.approx(5)
+
+    for _ in range(10):
+        limiter.rate_limited()
+    assert limiter.scale == rate_limiter.MIN_SCALE
+    assert limiter.stats()["rate_limited"] == 11
+
+
+def test_record_recovers_and_learns_completion_sizes(clock):
+    limiter = RateLimiter(rpm=60, tpm=60_000, completion_estimate=500)
+    limiter.rate_limited()
+    for _ in range(3):
+        limiter.record(1000)
+    assert limiter.scale == pytest.approx(0.5 + 3 * rate_limiter.RECOVERY_STEP)
+    assert limiter.completion_estimate == pytest.approx(1000 - 500 * 0.8 ** 3)
+    assert limiter.estimate(200) == int(200 + limiter.completion_estimate)
+
+    limiter.record(None)
+    for _ in range(20):
+        limiter.record(0)
+    assert limiter.scale == 1.0
+    assert limiter.completion_estimate == pytest.approx(1000 - 500 * 0.8 ** 3)
+
+    stats = limiter.stats()
+    assert stats["rpm"] == 60 and stats["tpm"] == 60_000
+    assert stats["completion_estimate"] == round(limiter.completion_estimate)
+
+
+def test_from_env(monkeypatch, clock):
+    monkeypatch.setenv("GROQ_RPM", "12")
+    monkeypatch.setenv("GROQ_TPM", "3400")
+    limiter = RateLimiter.from_env()
+    assert (limiter.requests.per_minute, limiter.tokens.per_minute) == (12, 3400)
+    assert RateLimiter.from_env(rpm=5).requests.per_minute == 5
+
+
+def test_client_reports_429s_and_completions(monkeypatch):
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    rate_limit = groq.RateLimitError(
+        "rate limited", response=httpx.Response(429, headers={"retry-after": "7"}, request=request), body=None,
+    )
+    completion = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=10, completion_tokens=42))
+    responses = [rate_limit, completion]
+
+    def create(**kwargs):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    client = LLMClient("test")
+    client._sync_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(client, "_backoff", lambda attempt, error: 0)
+
+    calls = []
+
+    class RecordingLimiter(RateLimiter):
+        def acquire(self, tokens):
+            calls.append(("acquire", tokens))
+
+        def rate_limited(self, retry_after=None):
+            calls.append(("rate_limited", retry_after))
+
+        def record(self, completion_tokens):
+            calls.append(("record", completion_tokens))
+
+    limiter = RecordingLimiter(rpm=30, tpm=30_000)
+    assert client.create([{"role": "user", "content": "hi"}], label="test", limiter=limiter) is completion
+    assert [name for name, _ in calls] == ["acquire", "rate_limited", "acquire", "record"]
+    assert calls[1] == ("rate_limited", 7.0)
+    assert calls[3] == ("record", 42)
+
+
+class SlowClient:
+    """Answers each document after a delay taken from its text, so documents finish out of order."""
+
+    def __init__(self):
+        self.limiters = set()
+        self.lock = threading.Lock()
+
+    def create(self, messages, model=None, label="chat", limiter=None, **kwargs):
+        with self.lock:
+            self.limiters.add(limiter)
+        prompt = messages[-1]["content"]
+        number = next(n for n in range(10) if f"RFP-{n} " in prompt)
+        time.sleep(0.02 * (5 - number))
+        fields = {field: "Not specified" for field in RFPExtractor.EXPECTED_FIELDS} | {"Bid Number": f"RFP-{number}"}
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(fields)))])
+
+
+def test_concurrent_batch_keeps_input_order(tmp_path):
+    paths = []
+    for number in range(5):
+        path = tmp_path / f"rfp{number}.html"
+        path.write_text(f"<html><body><p>Solicitation RFP-{number} for office supplies.</p></body></html>")
+        paths.append(str(path))
+    paths.insert(2, str(tmp_path / "missing.html"))
+
+    extractor = RFPExtractor(api_key="test")
+    extractor.client = SlowClient()
+    limiter = RateLimiter(rpm=1000, tpm=10_000_000)
+    results = extractor.process_multiple_documents(paths, max_workers=4, rate_limiter=limiter)
+
+    assert [result["document_name"] for result in results] == [Path(path).name for path in paths]
+    assert "error" in results[2]
+    bids = [result["extracted_fields"]["Bid Number"] for i, result in enumerate(results) if i != 2]
+    assert bids == [f"RFP-{n}" for n in range(5)]
+    # Every call of the batch went through the shared limiter, which is only set for the batch
+    assert extractor.client.limiters == {limiter}
+    assert extractor.rate_limiter is None
@@ -0,0 +1,136 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import rfp_inputs
+from extraction_cache import file_sha256
+from rfp_inputs import DONE, FAILED, FileState, Manifest, expand_inputs, is_settled
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in ("a.pdf", "b.HTML", "notes.txt", "sub/c.pdf", "sub/deep/d.htm", "sub/deep/e.docx"):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(name)
+    return tmp_path
+
+
+def names(files, root):
+    return [os.path.relpath(path, root) for path in files]
+
+
+def test_directory_lists_its_supported_files(tree):
+    assert names(expand_inputs([str(tree)]), tree) == ["a.pdf", "b.HTML"]
+    assert names(expand_inputs([str(tree)], recursive=True), tree) == [
+        "a.pdf", "b.HTML", "sub/c.pdf", "sub/deep/d.htm",
+    ]
+
+
+def test_glob_patterns(tree):
+    assert names(expand_inputs([str(tree / "*.pdf")]), tree) == ["a.pdf"]
+    assert names(expand_inputs([str(tree / "sub" / "*")]), tree) == ["sub/c.pdf"]
+    # Without recursive "**" matches one directory level, like "*"
+    assert names(expand_inputs([str(tree / "**" / "*.pdf")]), tree) == ["sub/c.pdf"]
+    assert names(expand_inputs([str(tree / "**" / "*.pdf")], recursive=True), tree) == ["a.pdf", "sub/c.pdf"]
+    assert expand_inputs([str(tree / "*.xlsx")]) == []
+
+
+def test_plain_paths_pass_through_and_duplicates_are_dropped(tree):
+    missing = str(tree / "missing.pdf")
+    files = expand_inputs([str(tree / "b.HTML"), str(tree), missing, str(tree / "*.pdf"), str(tree / "notes.txt")])
+    # First occurrence wins; plain paths are kept even when missing or unsupported
+    assert names(files, tree) == ["b.HTML", "a.pdf", "missing.pdf", "notes.txt"]
+
+
+def test_is_settled(monkeypatch, tree):
+    mtime = os.stat(tree / "a.pdf").st_mtime
+    monkeypatch.setattr(rfp_inputs, "time", SimpleNamespace(time=lambda: mtime + 5))
+    assert is_settled(str(tree / "a.pdf"), 5)
+    assert not is_settled(str(tree / "a.pdf"), 10)
+    assert not is_settled(str(tree / "missing.pdf"), 0)
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    return Manifest(str(tmp_path / "manifest.sqlite3"))
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    """Records the files check() reads to hash."""
+    read = []
+
+    def counting_sha256(path):
+        read.append(os.path.basename(path))
+        return file_sha256(path)
+
+    monkeypatch.setattr(rfp_inputs, "file_sha256", counting_sha256)
+    return read
+
+
+def test_new_and_changed_files_need_processing(manifest, hashes, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "rfp.pdf").write_bytes(b"first")
+
+    state = manifest.check("rfp.pdf")
+    assert state == FileState(str(tmp_path / "rfp.pdf"), 5, os.stat("rfp.pdf").st_mtime, file_sha256("rfp.pdf"))
+    manifest.record(state)
+
+    # Same size, new content and mtime
+    (tmp_path / "rfp.pdf").write_bytes(b"other")
+    os.utime("rfp.pdf", (state.mtime + 10, state.mtime + 10))
+    changed = manifest.check("rfp.pdf")
+    assert changed is not None and changed.sha256 != state.sha256
+    assert hashes == ["rfp.pdf", "rfp.pdf"]
+
+
+def test_unchanged_size_and_mtime_skip_without_reading(manifest, hashes, tmp_path):
+    path = tmp_path / "rfp.pdf"
+    path.write_bytes(b"content")
+    manifest.record(manifest.check(str(path)))
+
+    assert manifest.check(str(path)) is None
+    assert hashes == ["rfp.pdf"]
+
+
+def test_touched_file_with_the_same_hash_is_skipped(manifest, hashes, tmp_path):
+    path = tmp_path / "rfp.pdf"
+    path.write_bytes(b"content")
+    state = manifest.check(str(path))
+    manifest.record(state)
+
+    os.utime(path, (state.mtime + 60, state.mtime + 60))
+    assert manifest.check(str(path)) is None
+    # The new mtime is recorded, so the next scan does not read the file again
+    assert manifest.check(str(path)) is None
+    assert hashes == ["rfp.pdf", "rfp.pdf"]
+
+
+def test_failed_files_are_retried_unless_told_otherwise(manifest, hashes, tmp_path):
+    path = tmp_path / "rfp.pdf"
+    path.write_bytes(b"content")
+    state = manifest.check(str(path))
+    manifest.record(state, error="could not parse")
+    assert manifest.stats() == {DONE: 0, FAILED: 1}
+
+    assert manifest.check(str(path)) == state
+    assert manifest.check(str(path), retry_failed=False) is None
+
+    # A failed file that changed is processed again either way
+    path.write_bytes(b"fixed content")
+    changed = manifest.check(str(path), retry_failed=False)
+    assert changed is not None and changed.sha256 != state.sha256
+
+    manifest.record(changed)
+    assert manifest.stats() == {DONE: 1, FAILED: 0}
+    assert manifest.check(str(path)) is None
+
+
+def test_manifest_persists(tmp_path):
+    path = tmp_path / "rfp.pdf"
+    path.write_bytes(b"content")
+    Manifest(str(tmp_path / "manifest.sqlite3")).record(FileState(str(path), 7, os.stat(path).st_mtime, "x"))
+
+    assert Manifest(str(tmp_path / "manifest.sqlite3")).check(str(path)) is None
@@ -0,0 +1,169 @@
+import logging
+
+import numpy as np
+import pytest
+
+import embedding
+from rfp_sections import (
+    FIELD_GROUPS, FIELD_QUERIES, Section, is_missing, merge_fields, plan_calls, route_groups, split_sections,
+    use_sections,
+)
+
+FIELDS = [field for group in FIELD_GROUPS.values() for field in group]
+
+
+def document(n_sections, chars=1000):
+    # Sections of filler sentences; returns the text and the section boundaries
+    text, sections = "", []
+    for s in range(n_sections):
+        start = len(text)
+        k = 0
+        while len(text) - start < chars:
+            text += f"Sentence {k} of section {s} is plain filler text. "
+            k += 1
+        sections.append(Section(start, len(text)))
+    return text, sections
+
+
+@pytest.fixture
+def planted_search(monkeypatch):
+    """
+    Replaces the router's search: each field hits a chunk in each of the
+    sections planted for it, with the given score.
+    """
+    def plant(sections, planted):
+        def search_hybrid(queries, chunks, embeddings, top_k=5, **kwargs):
+            fields = {query: field for field, query in FIELD_QUERIES.items()}
+            hits = []
+            for query in queries:
+                ids, scores = [], []
+                for section, score in planted.get(fields[query], {}).items():
+                    start, end = sections[section]
+                    ids.append(next(i for i in range(len(chunks))
+                                    if start <= (chunks.starts[i] + chunks.ends[i]) // 2 < end))
+                    scores.append(score)
+                hits.append((np.array(ids, dtype=np.intp), np.array(scores, dtype=np.float32)))
+            return hits
+
+        monkeypatch.setattr(embedding, "search_hybrid", search_hybrid)
+        monkeypatch.setattr(embedding, "encode_texts", lambda texts: np.zeros((len(texts), 4), dtype=np.float32))
+
+    return plant
+
+
+def test_use_sections():
+    assert not use_sections(10, "auto") and use_sections(10 ** 6, "auto")
+    assert use_sections(10, "always") and not use_sections(10 ** 6, "off")
+    with pytest.raises(ValueError):
+        use_sections(10, "sometimes")
+
+
+def test_split_sections_cover_the_text_in_order():
+    text, _ = document(12)
+    sections = split_sections(text, section_tokens=300)
+    assert len(sections) > 3
+    assert sections[0].start == 0 and sections[-1].end == len(text.rstrip())
+    for previous, section in zip(sections, sections[1:]):
+        # Consecutive sections overlap a little and never leave a gap
+        assert previous.start < section.start <= previous.end
+
+
+def test_short_documents_route_every_group_to_every_section():
+    text, sections = document(3)
+    assert route_groups(text, sections, per_group=3) == {group: [0, 1, 2] for group in FIELD_GROUPS}
+
+
+def test_route_groups(planted_search):
+    text, sections = document(8)
+    planted_search(sections, {
+        "Bid Number": {4: 0.8},
+        # Section 3 mentions three schedule fields weakly, the pre-bid meeting is only in section 6
+        "Due Date": {5: 0.9},
+        "Pre Bid Meeting": {6: 0.35},
+        "Term of Bid": {3: 0.3},
+        "Delivery Date": {3: 0.3},
+        "Installation": {3: 0.3},
+        "Bid Submission Type": {7: 0.5},
+    })
+
+    routes = route_groups(text, sections, per_group=2)
+    assert routes == {
+        # The cover section first, then the best hit
+        "identification": [0, 4],
+        # Each field's own best section before the summed votes
+        "schedule": [5, 6],
+        # Too few hits: topped up from the start of the document
+        "submission": [7, 0],
+        "financial": [0, 1],
+        "product": [0, 1],
+    }
+
+    calls = plan_calls(routes)
+    assert list(calls) == [0, 1, 4, 5, 6, 7]
+    assert calls[0] == [*FIELD_GROUPS["identification"], *FIELD_GROUPS["submission"],
+                        *FIELD_GROUPS["financial"], *FIELD_GROUPS["product"]]
+    assert calls[1] == [*FIELD_GROUPS["financial"], *FIELD_GROUPS["product"]]
+    assert calls[5] == calls[6] == list(FIELD_GROUPS["schedule"])
+
+
+def test_route_groups_with_the_real_search(stub_encoder):
+    text, sections = document(6)
+    due = "Proposals are due on the closing date, the submission deadline is May 3 at 2 PM. "
+    start, end = sections[4]
+    # Mid-section, so the chunks holding it do not straddle a section boundary
+    at = text.index(". ", (start + end) // 2) + 2
+    text = text[:at] + due + text[at:]
+    sections = sections[:4] + [Section(start, end + len(due))] + [
+        Section(s + len(due), e + len(due)) for s, e in sections[5:]
+    ]
+
+    routes = route_groups(text, sections, per_group=2)
+    assert routes["schedule"][0] == 4
+    assert routes["identification"][0] == 0
+    assert all(len(ranked) == 2 for ranked in routes.values())
+
+
+def test_is_missing():
+    for value in (None, "", "  ", "N/A", "Not specified.", "not found", "Unknown", "error extracting"):
+        assert is_missing(value)
+    for value in ("May 3", "None required", 0, ["a"]):
+        assert not is_missing(value)
+
+
+def test_merge_fields(caplog):
+    routes = {"identification": [2, 0], "schedule": [1, 3], "submission": [0], "financial": [], "product": [3]}
+    answers = {
+        0: {"Bid Number": "RFP-17", "Bid Summary": "Network switches",
+            "Any Additional Documentation Required": ["W-9", "References"]},
+        1: {"Due Date": "N/A", "Term of Bid": "3 years"},
+        2: {"Bid Number": "RFP 2024-17", "Title": "Not specified", "Bid Summary": "Supply and install switches",
+            "contact_info": {"name": "J. Smith"}},
+        3: {"Due Date": "May 3, 2024", "Term of Bid": "three years", "Product": "network switches",
+            "Product Specification": "48 ports"},
+        # Answers for fields not routed to a section are ignored
+        4: {"Payment Terms": "Net 30"},
+    }
+
+    with caplog.at_level(logging.INFO, logger="rfp_sections"):
+        merged = merge_fields(FIELDS, routes, answers)
+
+    assert list(merged) == FIELDS
+    # Missing values are skipped for the next-ranked section
+    assert merged["Due Date"] == "May 3, 2024"
+    assert merged["Title"] == "Not specified"
+    # Best-ranked section wins; the other value is logged as a conflict
+    assert merged["Bid Number"] == "RFP 2024-17"
+    assert merged["Term of Bid"] == "3 years"
+    assert "RFP-17" in caplog.text and "three years" in caplog.text
+    # List fields join the distinct values, best-ranked section first
+    assert merged["Bid Summary"] == "Supply and install switches; Network switches"
+    assert merged["Any Additional Documentation Required"] == "W-9; References"
+    assert merged["Product Specification"] == "48 ports"
+    assert merged["contact_info"] == str({"name": "J. Smith"})
+    assert merged["Payment Terms"] == "Not specified"
+
+
+def test_merge_fields_dedups_list_values_ignoring_case():
+    routes = {"identification": [0, 1, 2]}
+    answers = {0: {"Bid Summary": "Switches"}, 1: {"Bid Summary": " switches "}, 2: {"Bid Summary": "Cabling"}}
+    assert merge_fields(["Bid Summary"], routes, answers) == {"Bid Summary": "Switches; Cabling"}
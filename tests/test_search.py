@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+import embedding
+from bm25 import BM25Index, fuse_hits
+from chunk_table import ChunkTable
+from extract_chunk_support import ChunkSpan
+
+pytestmark = pytest.mark.usefixtures("stub_encoder")
+
+
+def unit_rows(n, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def table_of(texts):
+    text = " ".join(texts)
+    spans, start = [], 0
+    for chunk in texts:
+        spans.append(ChunkSpan(start, start + len(chunk), 1, 1))
+        start += len(chunk) + 1
+    return ChunkTable.from_spans(text, spans)
+
+
+def table_with_bm25(chunks):
+    chunks.bm25 = BM25Index(chunks.texts())
+    return chunks
+
+
+@pytest.fixture
+def fixed_queries(monkeypatch):
+    """encode_queries answering with given vectors, so searches do not depend on the model."""
+    def use(vectors):
+        monkeypatch.setattr(embedding, "encode_queries", lambda queries: vectors[:len(queries)])
+    return use
+
+
+@pytest.mark.parametrize("top_k", [1, 3, 10, 50])
+def test_top_k_matches_full_sort(top_k):
+    scores = np.random.default_rng(1).normal(size=(4, 40)).astype(np.float32)
+    expected = np.argsort(-scores, axis=1, kind="stable")[:, :top_k]
+    np.testing.assert_array_equal(embedding._top_k(scores, top_k), expected)
+
+
+def test_top_k_edge_cases():
+    scores = np.random.default_rng(2).normal(size=(2, 3))
+    assert embedding._top_k(scores, 10).shape == (2, 3)
+    assert embedding._top_k(scores, 0).shape == (2, 0)
+    assert embedding._top_k(np.empty((1, 0)), 5).shape == (1, 0)
+
+
+def test_normalize_handles_zero_rows():
+    vectors = np.array([[3.0, 4.0], [0.0, 0.0]])
+    normalized = embedding._normalize(vectors)
+    assert normalized.dtype == np.float32
+    np.testing.assert_allclose(normalized, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_encode_texts_is_normalized():
+    vectors = embedding.encode_texts(["bid bond of five percent", "proposals are due on May 3"])
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-5)
+
+
+def test_search_hits_matches_cosine_ranking(fixed_queries):
+    embeddings = unit_rows(50)
+    queries = unit_rows(3, seed=7)
+    fixed_queries(queries)
+
+    hits = embedding.search_hits(["a", "b", "c"], embeddings, top_k=5)
+    assert len(hits) == 3
+    for query, (ids, scores) in zip(queries, hits):
+        cosine = embeddings @ query
+        np.testing.assert_array_equal(ids, np.argsort(-cosine)[:5])
+        np.testing.assert_allclose(scores, cosine[ids], rtol=1e-6)
+
+
+def test_search_many_is_the_batched_search(fixed_queries):
+    texts = [f"chunk {i}" for i in range(20)]
+    chunks = table_of(texts)
+    embeddings = unit_rows(20)
+    queries = unit_rows(2, seed=3)
+    fixed_queries(queries)
+
+    batched = embedding.search_many(["q1", "q2"], chunks, embeddings, top_k=4)
+    for query, result in zip(queries, batched):
+        assert result == [texts[i] for i in np.argsort(-(embeddings @ query))[:4]]
+    assert embedding.search("q1", chunks, embeddings, top_k=4) == batched[0]
+
+
+def test_search_with_index_scores_only_candidates(fixed_queries):
+    class FixedIndex:
+        def search(self, query_embeddings, top_k):
+            return [np.array([7, 2]) for _ in query_embeddings]
+
+    embeddings = unit_rows(10)
+    fixed_queries(unit_rows(1, seed=5))
+    (ids, scores), = embedding.search_hits(["q"], embeddings, top_k=2, index=FixedIndex())
+    np.testing.assert_array_equal(ids, [7, 2])
+    np.testing.assert_allclose(scores, embeddings[[7, 2]] @ unit_rows(1, seed=5)[0], rtol=1e-6)
+
+
+def test_empty_queries():
+    assert embedding.search_hits([], unit_rows(3)) == []
+    assert embedding.search_many([], table_of(["a", "b", "c"]), unit_rows(3)) == []
+
+
+def test_search_hybrid_without_lexical_index_is_the_dense_search(fixed_queries):
+    chunks = table_of([f"chunk {i}" for i in range(20)])
+    embeddings = unit_rows(20)
+    fixed_queries(unit_rows(2, seed=4))
+    assert chunks.bm25 is None
+
+    dense = embedding.search_hits(["q1", "q2"], embeddings, top_k=3)
+    for hits in (
+        embedding.search_hybrid(["q1", "q2"], chunks, embeddings, top_k=3),
+        # Fusion turned off falls back the same way
+        embedding.search_hybrid(["q1", "q2"], table_with_bm25(chunks), embeddings, top_k=3, bm25_weight=0),
+    ):
+        for (ids, scores), (dense_ids, dense_scores) in zip(hits, dense):
+            np.testing.assert_array_equal(ids, dense_ids)
+            np.testing.assert_array_equal(scores, dense_scores)
+
+
+def test_search_hybrid_fuses_dense_and_lexical_hits(fixed_queries):
+    texts = [f"filler text {i}" for i in range(19)] + ["the bid bond is five percent"]
+    chunks = table_with_bm25(table_of(texts))
+    embeddings = unit_rows(20)
+    fixed_queries(unit_rows(1, seed=4))
+
+    (ids, scores), = embedding.search_hybrid(["bid bond"], chunks, embeddings, top_k=3, bm25_weight=0.5)
+    # Each side ranks top_k * 4 deep before fusion
+    dense = embedding.search_hits(["bid bond"], embeddings, top_k=12)
+    expected = fuse_hits(dense, chunks.bm25.search(["bid bond"], 12), 3, 0.5)[0]
+    np.testing.assert_array_equal(ids, expected[0])
+    np.testing.assert_allclose(scores, expected[1])
+    # Found by both sides, the only lexical match outranks the dense-only hits
+    assert 19 in dense[0][0][1:] and ids[0] == 19
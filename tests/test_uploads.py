@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+
+import pytest
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+
+import uploads
+from uploads import FORM_OVERHEAD_BYTES, UploadLimitMiddleware, UploadTooLarge, spool_upload
+
+LIMIT = 4096
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setenv("UPLOAD_TMP_DIR", str(tmp_path))
+    monkeypatch.setattr(uploads, "CHUNK_BYTES", 1000)
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, limits={"/upload": LIMIT})
+    app.spooled = []
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        try:
+            spooled = await spool_upload(file, LIMIT)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        app.spooled.append(spooled)
+        return {"sha256": spooled.sha256, "size": spooled.size, "content": spooled.path.read_bytes().decode()}
+
+    @app.post("/other")
+    async def other(file: UploadFile = File(...)):
+        return {"size": file.size}
+
+    return TestClient(app)
+
+
+def test_upload_is_copied_and_hashed(client, tmp_path):
+    content = b"%PDF" * 700
+    response = client.post("/upload", files={"file": ("a.pdf", content, "application/pdf")})
+    assert response.status_code == 200
+    assert response.json() == {
+        "sha256": hashlib.sha256(content).hexdigest(), "size": len(content), "content": content.decode(),
+    }
+
+    spooled = client.app.spooled[0]
+    assert spooled.path.parent == tmp_path
+    spooled.remove()
+    spooled.remove()
+    assert not spooled.path.exists()
+
+
+def test_declared_length_over_the_cap_is_refused_before_reading(client):
+    body = b"x" * (LIMIT + FORM_OVERHEAD_BYTES + 1)
+    response = client.post("/upload", content=body, headers={"content-type": "multipart/form-data; boundary=b"})
+    assert response.status_code == 413
+    assert response.json() == {"detail": str(UploadTooLarge(LIMIT))}
+    assert client.app.spooled == []
+
+
+def test_other_routes_are_not_capped(client):
+    content = b"x" * (LIMIT + FORM_OVERHEAD_BYTES + 1)
+    response = client.post("/other", files={"file": ("a.pdf", content, "application/pdf")})
+    assert response.status_code == 200 and response.json() == {"size": len(content)}
+
+
+def test_file_over_the_limit_within_the_form_allowance_is_refused(client):
+    # The body fits the form allowance, the file itself does not
+    response = client.post("/upload", files={"file": ("a.pdf", b"x" * (LIMIT + 1), "application/pdf")})
+    assert response.status_code == 413
+    assert client.app.spooled == []
+
+
+def test_body_without_length_is_cut_off_once_over_the_cap():
+    served = []
+
+    async def app(scope, receive, send):
+        while True:
+            message = await receive()
+            served.append(len(message["body"]))
+            if not message.get("more_body"):
+                break
+
+    async def run():
+        pieces = [{"type": "http.request", "body": b"x" * 65536, "more_body": True} for _ in range(100)]
+        sent = []
+
+        async def receive():
+            return pieces.pop()
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "path": "/upload", "headers": [(b"transfer-encoding", b"chunked")]}
+        middleware = UploadLimitMiddleware(app, {"/upload": LIMIT})
+        with pytest.raises(HTTPException) as raised:
+            await middleware(scope, receive, send)
+        return raised.value, sent
+
+    error, sent = asyncio.run(run())
+    assert error.status_code == 413
+    # Nothing past the cap reached the app, and nothing was sent for it
+    assert sum(served) <= LIMIT + FORM_OVERHEAD_BYTES and sent == []
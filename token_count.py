@@ -0,0 +1,145 @@
+"""
+Local prompt token accounting for the Groq models we call.
+
+Prompts are measured with the model's own tokenizer (via the `tokenizers`
+package) before they are sent, so oversized prompts are fitted here
+instead of being rejected by the API, and every call's size is logged.
+Tokenizers come from ungated mirrors of the model repos (the meta-llama
+repos need accepted license terms and an HF token), or from a local
+tokenizer.json via LLM_TOKENIZER, e.g. on hosts without Hub access. When a
+tokenizer cannot be loaded a conservative character-based estimate is used
+instead, and a warning is logged.
+
+Configuration via environment:
+  LLM_TOKENIZER          tokenizer.json path or Hugging Face repo id overriding the table below
+  LLM_MAX_PROMPT_TOKENS  cap on prompt tokens below the model limit, e.g. for TPM quotas (default: none)
+"""
+
+import logging
+import os
+import threading
+from typing import Callable, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ModelLimits(NamedTuple):
+    context: int      # prompt + completion tokens per request
+    max_output: int   # completion tokens the API allows
+    tokenizer: str    # Hugging Face repo with the model's tokenizer.json (ungated, no token needed)
+
+
+MODEL_LIMITS = {
+    "meta-llama/llama-4-scout-17b-16e-instruct": ModelLimits(131072, 8192, "unsloth/Llama-4-Scout-17B-16E-Instruct"),
+    "meta-llama/llama-4-maverick-17b-128e-instruct": ModelLimits(131072, 8192, "unsloth/Llama-4-Maverick-17B-128E-Instruct"),
+    "llama-3.3-70b-versatile": ModelLimits(131072, 32768, "unsloth/Llama-3.3-70B-Instruct"),
+    "llama-3.1-8b-instant": ModelLimits(131072, 131072, "unsloth/Meta-Llama-3.1-8B-Instruct"),
+}
+
+# Unknown models get a small window rather than an optimistic one
+FALLBACK_LIMITS = ModelLimits(8192, 1024, "")
+
+# Chat template tokens added per message (role header and end-of-turn markers)
+MESSAGE_OVERHEAD = 8
+
+# Estimate when no tokenizer is available; deliberately low so estimates err on the large side
+CHARS_PER_TOKEN = 3
+
+
+def model_limits(model: str) -> ModelLimits:
+    return MODEL_LIMITS.get(model, FALLBACK_LIMITS)
+
+
+def prompt_limit(model: str, reserve_output: int = 1024) -> int:
+    """Most prompt tokens a request to model may use while leaving reserve_output for the answer."""
+    limits = model_limits(model)
+    limit = limits.context - min(reserve_output, limits.max_output)
+    cap = os.environ.get("LLM_MAX_PROMPT_TOKENS")
+    return min(limit, int(cap)) if cap else limit
+
+
+_tokenizers: dict[str, Optional[object]] = {}
+_tokenizers_lock = threading.Lock()
+# Per-name locks of tokenizers being loaded, so each is downloaded once
+_loading: dict[str, threading.Lock] = {}
+
+
+def _read_tokenizer(name: str):
+    if not name:
+        return None
+    try:
+        from tokenizers import Tokenizer
+
+        if os.path.exists(name):
+            tokenizer = Tokenizer.from_file(name)
+        else:
+            tokenizer = Tokenizer.from_pretrained(name)
+        tokenizer.no_truncation()
+        return tokenizer
+    except Exception as e:
+        logger.warning("Tokenizer %s unavailable (%s); estimating tokens from characters", name, e)
+        return None
+
+
+def _load_tokenizer(name: str):
+    with _tokenizers_lock:
+        if name in _tokenizers:
+            return _tokenizers[name]
+        loading = _loading.setdefault(name, threading.Lock())
+    # The download runs outside the global lock: only callers waiting for this
+    # tokenizer block on it, counting with other tokenizers goes on
+    with loading:
+        with _tokenizers_lock:
+            if name in _tokenizers:
+                return _tokenizers[name]
+        tokenizer = _read_tokenizer(name)
+        with _tokenizers_lock:
+            _tokenizers[name] = tokenizer
+            _loading.pop(name, None)
+        return tokenizer
+
+
+def _tokenizer_for(model: str):
+    return _load_tokenizer(os.environ.get("LLM_TOKENIZER") or model_limits(model).tokenizer)
+
+
+def count_tokens(text: str, model: str) -> int:
+    tokenizer = _tokenizer_for(model)
+    if tokenizer is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def token_counter(model: str) -> Callable[[str], int]:
+    return lambda text: count_tokens(text, model)
+
+
+def count_message_tokens(messages: list[dict], model: str) -> int:
+    return sum(count_tokens(message["content"], model) + MESSAGE_OVERHEAD for message in messages)
+
+
+def fit_text(text: str, max_tokens: int, model: str) -> str:
+    """
+    Longest prefix of text with at most max_tokens tokens, cut at a token
+    boundary (logged when anything is dropped).
+    """
+    if max_tokens <= 0:
+        return ""
+    tokenizer = _tokenizer_for(model)
+    if tokenizer is None:
+        fitted = text[:max_tokens * CHARS_PER_TOKEN]
+    else:
+        encoding = tokenizer.encode(text, add_special_tokens=False)
+        if len(encoding.ids) <= max_tokens:
+            return text
+        fitted = text[:encoding.offsets[max_tokens - 1][1]]
+    if len(fitted) < len(text):
+        logger.warning("Prompt text fitted to %d tokens: kept %d of %d characters", max_tokens, len(fitted), len(text))
+    return fitted
+
+
+class PromptTooLarge(ValueError):
+    def __init__(self, tokens: int, limit: int, model: str):
+        super().__init__(f"Prompt of {tokens} tokens exceeds the {limit} token limit of {model}")
+        self.tokens = tokens
+        self.limit = limit
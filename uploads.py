@@ -0,0 +1,129 @@
+"""
+Size limits and disk spooling for uploaded PDFs.
+
+Starlette receives and parses the whole multipart body before an endpoint
+runs, so the size cap is enforced as the body arrives, by
+UploadLimitMiddleware, not by the endpoint. Starlette's own spool of a file
+part is an unnamed temp file; spool_upload copies it in fixed-size pieces to
+a named file the parse workers can open by path, hashing it on the way so the
+document cache key is known without a second pass.
+
+Configuration via environment:
+  UPLOAD_MAX_MB        largest accepted upload (default: 100)
+  UPLOAD_BATCH_MAX_MB  largest request of a batch upload, all files together (default: 1024)
+  UPLOAD_CHUNK_KB      piece size read per await (default: 1024)
+  UPLOAD_TMP_DIR       where spooled uploads live (default: system temp dir)
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+MAX_UPLOAD_BYTES = int(os.environ.get("UPLOAD_MAX_MB", "100")) * 1024 * 1024
+MAX_BATCH_UPLOAD_BYTES = int(os.environ.get("UPLOAD_BATCH_MAX_MB", "1024")) * 1024 * 1024
+# Room for the other form fields (questions_json) and the multipart framing
+FORM_OVERHEAD_BYTES = 1024 * 1024
+CHUNK_BYTES = int(os.environ.get("UPLOAD_CHUNK_KB", "1024")) * 1024
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit // (1024 * 1024)} MB limit")
+        self.limit = limit
+
+
+class SpooledUpload:
+    """A PDF spooled to a temp file; remove() it once parsing is done."""
+
+    __slots__ = ("path", "sha256", "size")
+
+    def __init__(self, path: Path, sha256: str, size: int):
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware capping the request body of the upload routes while it
+    is received. A Content-Length over the cap is refused before the body is
+    read; a body that grows past it anyway (chunked, or longer than declared)
+    fails the form parse with a 413 as soon as it does.
+
+    Args:
+        app: The ASGI app to wrap
+        limits: Largest accepted upload per route path; the body may exceed it
+            by FORM_OVERHEAD_BYTES for the other form fields
+    """
+
+    def __init__(self, app, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+        max_body = limit + FORM_OVERHEAD_BYTES
+
+        declared = Headers(scope=scope).get("content-length", "")
+        if declared.isdigit() and int(declared) > max_body:
+            response = JSONResponse({"detail": str(UploadTooLarge(limit))}, status_code=413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def receive_counted():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body:
+                    # FastAPI re-raises HTTPExceptions from the form parse instead of turning them into a 400
+                    raise HTTPException(status_code=413, detail=str(UploadTooLarge(limit)))
+            return message
+
+        await self.app(scope, receive_counted, send)
+
+
+async def spool_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> SpooledUpload:
+    """
+    Copy an upload to a named temp file piece by piece, hashing as it goes.
+
+    The request body was already capped by UploadLimitMiddleware; this checks
+    the size of the one file, which matters for batch uploads.
+
+    Raises:
+        UploadTooLarge: if the file is larger than max_bytes
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, name = tempfile.mkstemp(suffix=".pdf", dir=os.environ.get("UPLOAD_TMP_DIR"))
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                piece = await upload.read(CHUNK_BYTES)
+                if not piece:
+                    break
+                size += len(piece)
+                digest.update(piece)
+                out.write(piece)
+    except BaseException:
+        os.remove(name)
+        raise
+
+    return SpooledUpload(Path(name), digest.hexdigest(), size)